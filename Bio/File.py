@@ -22,12 +22,19 @@ import os
 import contextlib
 import StringIO
 import itertools
+import array
+import mmap
+import struct
+import sys
+import zlib
 
 try:
     from collections import UserDict as _dict_base
 except ImportError:
     from UserDict import DictMixin as _dict_base
 
+from Bio._py3k import _string_to_bytes, _bytes_to_string
+
 try:
     from sqlite3 import dbapi2 as _sqlite
     from sqlite3 import IntegrityError as _IntegrityError
@@ -79,11 +86,16 @@ def as_handle(handleish, mode='r', **kwargs):
     else:
         yield handleish
 
-def _open_for_random_access(filename):
+def _open_for_random_access(filename, use_mmap=False):
     """Open a file in binary mode, spot if it is BGZF format etc (PRIVATE).
 
     This funcationality is used by the Bio.SeqIO and Bio.SearchIO index
     and index_db functions.
+
+    With use_mmap=True an uncompressed file is memory mapped, and the
+    read only mmap object is returned in place of the handle (it too
+    has read, readline, seek, tell and close methods). This avoids a
+    system call and refilling the handle's buffer on every seek.
     """
     handle = open(filename, "rb")
     import bgzf
@@ -93,6 +105,12 @@ def _open_for_random_access(filename):
         assert "BGZF" in str(e)
         #Not a BGZF file after all, rewind to start:
         handle.seek(0)
+    if use_mmap and os.path.getsize(filename):
+        #Can't map an empty file, so leave that as a normal handle
+        try:
+            return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            handle.close()
     return handle
 
 
@@ -211,6 +229,299 @@ class _IndexedSeqFileProxy(object):
         raise NotImplementedError("Not available for this file format.")
 
 
+def _offset_array():
+    """Returns an empty array of unsigned 64 bit integers (PRIVATE).
+
+    Typecode "Q" is only available on Python 3.3 or later, while on most
+    64 bit Unix builds of Python 2 typecode "L" is 64 bits. If neither
+    is usable (e.g. 32 bit builds), falls back on a plain Python list.
+    """
+    for typecode in "QL":
+        try:
+            values = array.array(typecode)
+        except ValueError:
+            continue
+        if values.itemsize >= 8:
+            return values
+    return []
+
+
+class _CompactOffsetTable(object):
+    """Memory efficient read only mapping of string keys to offsets (PRIVATE).
+
+    This is an alternative to a Python dictionary for the key to offset
+    lookup in _IndexedSeqFileDict. Rather than a string and an integer
+    object for each record, the keys are concatenated into a single bytes
+    string, with an array of key start positions, an array of offsets,
+    and an open addressing hash table (of record numbers) using CRC32
+    checksums of the keys. This costs roughly the length of the key plus
+    about 25 bytes per record, compared to roughly the length of the key
+    plus 100 bytes or more per record using a dict (with a string object
+    for each key and an integer object for each offset).
+
+    The keys must be strings. Iteration follows the order the keys were
+    given in (i.e. the order of the records in the file).
+
+    Duplicate keys are not allowed. If this happens, a ValueError
+    exception is raised.
+    """
+    def __init__(self, key_offset_iter):
+        blob = array.array("B")
+        if hasattr(blob, "frombytes"):
+            #Python 3.2 or later
+            append_bytes = blob.frombytes
+        else:
+            append_bytes = blob.fromstring
+        starts = _offset_array()
+        offsets = _offset_array()
+        start = 0
+        for key, offset in key_offset_iter:
+            if not isinstance(key, basestring):
+                raise TypeError("Compact index requires string keys, "
+                                "not %r" % (key,))
+            key = _string_to_bytes(key)
+            starts.append(start)
+            offsets.append(offset)
+            append_bytes(key)
+            start += len(key)
+        starts.append(start)
+        if hasattr(blob, "tobytes"):
+            self._keys = blob.tobytes()
+        else:
+            self._keys = blob.tostring()
+        del blob
+        self._starts = starts
+        self._offsets = offsets
+        self._build_hash_table()
+
+    def _build_hash_table(self):
+        """Populate the hash table of record numbers (PRIVATE)."""
+        count = len(self._offsets)
+        #Keep the load factor at most two thirds (as in Python's dict)
+        size = 8
+        while 2 * size < 3 * count:
+            size *= 2
+        mask = size - 1
+        #Record numbers in an array of signed ints, -1 for empty slots
+        slots = array.array("i", [-1]) * size
+        keys = self._keys
+        starts = self._starts
+        crc32 = zlib.crc32
+        for i in xrange(count):
+            key = keys[starts[i]:starts[i + 1]]
+            slot = crc32(key) & mask
+            while slots[slot] != -1:
+                j = slots[slot]
+                if keys[starts[j]:starts[j + 1]] == key:
+                    raise ValueError("Duplicate key '%s'"
+                                     % _bytes_to_string(key))
+                slot = (slot + 1) & mask
+            slots[slot] = i
+        self._mask = mask
+        self._slots = slots
+
+    def _find(self, key):
+        """Returns the record number for this key, or -1 (PRIVATE)."""
+        if not isinstance(key, basestring):
+            return -1
+        key = _string_to_bytes(key)
+        keys = self._keys
+        starts = self._starts
+        slots = self._slots
+        mask = self._mask
+        slot = zlib.crc32(key) & mask
+        i = slots[slot]
+        while i != -1:
+            if keys[starts[i]:starts[i + 1]] == key:
+                return i
+            slot = (slot + 1) & mask
+            i = slots[slot]
+        return -1
+
+    def __contains__(self, key):
+        return self._find(key) != -1
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i == -1:
+            raise KeyError(key)
+        return self._offsets[i]
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __iter__(self):
+        keys = self._keys
+        starts = self._starts
+        for i in xrange(len(self._offsets)):
+            yield _bytes_to_string(keys[starts[i]:starts[i + 1]])
+
+    def keys(self):
+        return list(self)
+
+
+class _MappedArray(object):
+    """Read only array of integers held in a memory mapped file (PRIVATE)."""
+    def __init__(self, data, start, length, format):
+        self._data = data
+        self._start = start
+        self._length = length
+        self._size = struct.calcsize(format)
+        self._unpack_from = struct.Struct(format).unpack_from
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._length:
+            raise IndexError(i)
+        return self._unpack_from(self._data, self._start + i * self._size)[0]
+
+    def __len__(self):
+        return self._length
+
+
+class _MappedOffsetTable(_CompactOffsetTable):
+    """A _CompactOffsetTable loaded from an _OffsetTableCache file (PRIVATE).
+
+    Rather than reading the arrays into memory, the cache file is memory
+    mapped and the arrays are accessed in place (so the operating system
+    only loads the pages actually used).
+    """
+    def __init__(self, data, starts_start, count, slots_start, slot_count):
+        self._data = data
+        #The key starts in the file are absolute positions, so slicing the
+        #memory mapped file directly gives us the keys:
+        self._keys = data
+        self._starts = _MappedArray(data, starts_start, count + 1, "<Q")
+        self._offsets = _MappedArray(data, starts_start + 8 * (count + 1),
+                                     count, "<Q")
+        self._slots = _MappedArray(data, slots_start, slot_count, "<i")
+        self._mask = slot_count - 1
+
+    def close(self):
+        self._data.close()
+
+
+class _OffsetTableCache(object):
+    """Sidecar file caching the offsets found indexing a file (PRIVATE).
+
+    This is used by Bio.SeqIO.index(..., cache=...) to save the result of
+    scanning a file in the _CompactOffsetTable layout, and to memory map
+    this on later calls. The cache file records the absolute path, size
+    and modification time of the indexed file, the file format, and an
+    optional label (e.g. naming the key function). If any of these do not
+    match, the cache is considered stale and the file must be re-scanned.
+
+    The cache file is little endian binary data, starting with an eight
+    byte magic string and a fixed size header, then the label string, the
+    concatenated keys, the key start positions (unsigned 64 bit integers,
+    absolute positions within the cache file, with a final entry marking
+    the end of the last key), the record offsets (unsigned 64 bit), and
+    finally the hash table slots (signed 32 bit record numbers, -1 for an
+    empty slot). Sections are padded to multiples of eight bytes.
+    """
+    _magic = _string_to_bytes("BIOIDX\x00\x01")
+    #magic, label length, file size, file mtime, record count,
+    #total key length, slot count
+    _header = struct.Struct("<8sIQdQQQ")
+
+    def __init__(self, cache_filename, filename, format, label=""):
+        self._cache_filename = cache_filename
+        self._filename = filename
+        self._label = _string_to_bytes("%s\x00%s\x00%s"
+                                       % (os.path.abspath(filename),
+                                          format, label))
+
+    def _stat(self):
+        """Returns size and modification time of the indexed file (PRIVATE)."""
+        info = os.stat(self._filename)
+        return info.st_size, float(info.st_mtime)
+
+    def load(self):
+        """Returns a _MappedOffsetTable, or None if cache missing or stale."""
+        try:
+            handle = open(self._cache_filename, "rb")
+        except IOError:
+            return None
+        try:
+            header = handle.read(self._header.size)
+            if len(header) != self._header.size:
+                return None
+            magic, label_len, size, mtime, count, keys_len, slot_count \
+                = self._header.unpack(header)
+            if magic != self._magic or (size, mtime) != self._stat() \
+            or handle.read(label_len) != self._label:
+                return None
+            keys_start = _pad8(self._header.size + label_len)
+            slots_start = _pad8(keys_start + keys_len) + 16 * count + 8
+            if os.path.getsize(self._cache_filename) \
+            < slots_start + 4 * slot_count:
+                return None
+            data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            handle.close()
+        return _MappedOffsetTable(data, _pad8(keys_start + keys_len), count,
+                                  slots_start, slot_count)
+
+    def save(self, table):
+        """Write a _CompactOffsetTable to the cache file (if possible)."""
+        size, mtime = self._stat()
+        count = len(table)
+        keys = table._keys
+        keys_start = _pad8(self._header.size + len(self._label))
+        tmp_filename = self._cache_filename + ".tmp"
+        try:
+            handle = open(tmp_filename, "wb")
+            try:
+                handle.write(self._header.pack(self._magic, len(self._label),
+                                               size, mtime, count, len(keys),
+                                               len(table._slots)))
+                handle.write(self._label)
+                _write_padding(handle)
+                handle.write(keys)
+                _write_padding(handle)
+                _write_integers(handle, "Q", (keys_start + start
+                                              for start in table._starts))
+                _write_integers(handle, "Q", table._offsets)
+                _write_integers(handle, "i", table._slots)
+            finally:
+                handle.close()
+            if os.path.isfile(self._cache_filename):
+                #Needed on Windows where rename won't replace a file
+                os.remove(self._cache_filename)
+            os.rename(tmp_filename, self._cache_filename)
+        except (IOError, OSError), err:
+            import warnings
+            warnings.warn("Could not save index cache %s: %s"
+                          % (self._cache_filename, err))
+            if os.path.isfile(tmp_filename):
+                os.remove(tmp_filename)
+
+
+def _pad8(position):
+    """Round up a file position to a multiple of eight bytes (PRIVATE)."""
+    return (position + 7) // 8 * 8
+
+
+def _write_padding(handle):
+    """Pad a file being written to a multiple of eight bytes (PRIVATE)."""
+    position = handle.tell()
+    handle.write(_string_to_bytes("\x00" * (_pad8(position) - position)))
+
+
+def _write_integers(handle, typecode, values):
+    """Write integers to a file as little endian binary data (PRIVATE)."""
+    if isinstance(values, array.array) and sys.byteorder == "little" \
+    and values.itemsize == struct.calcsize(typecode):
+        #Fast path, already in the desired layout
+        values.tofile(handle)
+        return
+    values = iter(values)
+    while True:
+        chunk = list(itertools.islice(values, 65536))
+        if not chunk:
+            break
+        handle.write(struct.pack("<%i%s" % (len(chunk), typecode), *chunk))
+
+
 class _IndexedSeqFileDict(_dict_base):
     """Read only dictionary interface to a sequential record file.
 
@@ -234,19 +545,44 @@ class _IndexedSeqFileDict(_dict_base):
 
     Note that this dictionary is essentially read only. You cannot
     add or change values, pop values, nor clear the dictionary.
+
+    With compact=True the keys and offsets are held in a _CompactOffsetTable
+    rather than a Python dictionary, which needs much less memory for large
+    files with many short records (e.g. FASTQ), at the cost of slightly
+    slower lookups. This requires string keys.
+
+    Given an _OffsetTableCache, this is checked first and if up to date
+    the memory mapped offset table is used without scanning the file at
+    all. Otherwise the file is scanned to build a compact offset table,
+    which is then saved to the cache.
     """
     def __init__(self, random_access_proxy, key_function,
-                 repr, obj_repr):
+                 repr, obj_repr, compact=False, cache=None):
         #Use key_function=None for default value
         self._proxy = random_access_proxy
         self._key_function = key_function
         self._repr = repr
         self._obj_repr = obj_repr
+        if cache is not None:
+            self._offsets = cache.load()
+            if self._offsets is not None:
+                return
+            compact = True
         if key_function:
             offset_iter = (
                 (key_function(k), o, l) for (k, o, l) in random_access_proxy)
         else:
             offset_iter = random_access_proxy
+        if compact:
+            try:
+                self._offsets = _CompactOffsetTable(
+                    (key, offset) for key, offset, length in offset_iter)
+            except (ValueError, TypeError):
+                self._proxy._handle.close()
+                raise
+            if cache is not None:
+                cache.save(self._offsets)
+            return
         offsets = {}
         for key, offset, length in offset_iter:
             #Note - we don't store the length because I want to minimise the
@@ -379,6 +715,76 @@ class _IndexedSeqFileDict(_dict_base):
         #Pass the offset to the proxy
         return self._proxy.get_raw(self._offsets[key])
 
+    def get_many(self, keys, keep_order=False):
+        """Iterate over (key, record) tuples for many keys at once.
+
+        Rather than jumping about the file in the order the keys are given
+        (as with repeated use of get), the offsets of all the keys are
+        looked up first, and the records are then read in the order they
+        appear in the file. This turns lots of random access into (nearly)
+        sequential reading, which can be much faster on spinning disks or
+        network file systems.
+
+        By default the records are returned in file order. With
+        keep_order=True they are returned in the order of the keys given,
+        but note this means holding all the records in memory at once.
+
+        If any of the keys are not found, a KeyError exception is raised
+        before anything is read.
+        """
+        return self._get_many(keys, False, keep_order)
+
+    def get_raw_many(self, keys, keep_order=False):
+        """Iterate over (key, raw string) tuples for many keys at once.
+
+        This is to get_raw as get_many is to get, reading the records
+        in file order unless keep_order=True is used.
+        """
+        return self._get_many(keys, True, keep_order)
+
+    def _get_many(self, keys, raw, keep_order):
+        """Generator used by get_many and get_raw_many (PRIVATE)."""
+        wanted = self._lookup_many(keys)
+        wanted.sort()
+        if keep_order:
+            results = [None] * len(wanted)
+        for file_number, offset, length, index, key in wanted:
+            if raw:
+                value = self._get_raw_at(file_number, offset, length)
+            else:
+                value = self._get_at(file_number, offset, key)
+            if keep_order:
+                results[index] = key, value
+            else:
+                yield key, value
+        if keep_order:
+            for result in results:
+                yield result
+
+    def _lookup_many(self, keys):
+        """List of (file, offset, length, index, key) for the keys (PRIVATE).
+
+        The list is sorted to give the order to read the records in.
+        """
+        offsets = self._offsets
+        return [(0, offsets[key], None, index, key)
+                for index, key in enumerate(keys)]
+
+    def _get_at(self, file_number, offset, key):
+        """Parse the record at this offset, checking the key (PRIVATE)."""
+        record = self._proxy.get(offset)
+        if self._key_function:
+            key2 = self._key_function(record.id)
+        else:
+            key2 = record.id
+        if key != key2:
+            raise ValueError("Key did not match (%s vs %s)" % (key, key2))
+        return record
+
+    def _get_raw_at(self, file_number, offset, length):
+        """Return the raw record at this offset (PRIVATE)."""
+        return self._proxy.get_raw(offset)
+
     def __setitem__(self, key, value):
         """Would allow setting or replacing records, but not implemented."""
         raise NotImplementedError("An indexed a sequence file is read only.")
@@ -418,6 +824,53 @@ class _IndexedSeqFileDict(_dict_base):
         all open handles to that file.
         """
         self._proxy._handle.close()
+        if isinstance(self._offsets, _MappedOffsetTable):
+            self._offsets.close()
+
+
+def _file_stat(filename):
+    """Returns file size and modification time as strings (PRIVATE).
+
+    These are stored in the meta_data table of an SQLite index, so that
+    we can tell if a file has been changed since it was indexed.
+    """
+    info = os.stat(filename)
+    #Use repr to preserve the full precision of the float
+    return str(info.st_size), repr(float(info.st_mtime))
+
+
+def _scan_file(task):
+    """Returns list of (key, offset, length) tuples for a file (PRIVATE).
+
+    This is run in the worker processes for parallel indexing, where the
+    task is a tuple of the (picklable) proxy factory, format and filename.
+    """
+    proxy_factory, format, filename = task
+    random_access_proxy = proxy_factory(format, filename)
+    try:
+        return list(random_access_proxy)
+    finally:
+        random_access_proxy._handle.close()
+
+
+def _parallel_scan(proxy_factory, format, filenames, processes):
+    """Scan files using a process pool, returns pool and results (PRIVATE).
+
+    The results are an iterator giving a list of (key, offset, length)
+    tuples for each file, in the same order as the filenames. The caller
+    should close or terminate the pool when done.
+    """
+    try:
+        import multiprocessing
+    except ImportError:
+        #Python 2.5
+        from Bio import MissingPythonDependencyError
+        raise MissingPythonDependencyError("Parallel indexing requires "
+                                           "multiprocessing, which is "
+                                           "included in Python 2.6+")
+    pool = multiprocessing.Pool(min(processes, len(filenames)))
+    tasks = [(proxy_factory, format, filename) for filename in filenames]
+    return pool, pool.imap(_scan_file, tasks)
 
 
 class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
@@ -433,13 +886,30 @@ class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
     There are OS limits on the number of files that can be open at once,
     so a pool are kept. If a record is required from a closed file, then
     one of the open handles is closed first.
+
+    When creating a new index of several files, using processes greater
+    than one will scan the files in parallel using a multiprocessing pool
+    of this size (requires Python 2.6 or later). This requires the
+    proxy_factory to be picklable, i.e. not a closure. Any key_function
+    is applied in the main process, so that can be a lambda function.
+
+    The size and modification time of each file is recorded in the
+    meta_data table. When reusing an existing index with refresh=True,
+    the given filenames need not match those in the index. Any files
+    no longer listed are dropped from the index, any new or modified
+    files are (re)scanned, and any unchanged files are left as they are.
+    If no filenames are given, the indexed files are refreshed, dropping
+    any which no longer exist. This is done as a single transaction, so if there is a problem (e.g.
+    a duplicate key) the existing index is left unchanged.
     """
     def __init__(self, index_filename, filenames,
                  proxy_factory, format,
-                 key_function, repr, max_open=10):
+                 key_function, repr, max_open=10, processes=1,
+                 refresh=False):
         self._proxy_factory = proxy_factory
         self._repr = repr
-        random_access_proxies = {}
+        self._proxies = {}
+        self._max_open = max_open
         #TODO? - Don't keep filename list in memory (just in DB)?
         #Should save a chunk of memory if dealing with 1000s of files.
         #Furthermore could compare a generator to the DB on reloading
@@ -480,11 +950,14 @@ class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
                 self._filenames = [row[0] for row in
                                    con.execute("SELECT name FROM file_data "
                                                "ORDER BY file_number;").fetchall()]
-                if filenames and len(filenames) != len(self._filenames):
+                if refresh:
+                    #Will compare the filenames in _refresh instead
+                    pass
+                elif filenames and len(filenames) != len(self._filenames):
                     con.close()
                     raise ValueError("Index file says %i files, not %i"
                                      % (len(self._filenames), len(filenames)))
-                if filenames and filenames != self._filenames:
+                elif filenames and filenames != self._filenames:
                     con.close()
                     raise ValueError("Index file has different filenames")
             except _OperationalError, err:
@@ -494,6 +967,13 @@ class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
             if not proxy_factory(self._format):
                 con.close()
                 raise ValueError("Unsupported format '%s'" % self._format)
+            if refresh:
+                if filenames is None:
+                    #Keep the indexed files which still exist, dropping
+                    #any which have been deleted
+                    filenames = [filename for filename in self._filenames
+                                 if os.path.isfile(filename)]
+                self._refresh(filenames, key_function, processes)
         else:
             self._filenames = filenames
             self._format = format
@@ -517,24 +997,73 @@ class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
             con.execute("INSERT INTO meta_data (key, value) VALUES (?,?);",
                         ("format", format))
             #TODO - Record the alphabet?
-            #TODO - Record the file size and modified date?
             con.execute(
                 "CREATE TABLE file_data (file_number INTEGER, name TEXT);")
             con.execute("CREATE TABLE offset_data (key TEXT, file_number INTEGER, offset INTEGER, length INTEGER);")
-            count = 0
-            for i, filename in enumerate(filenames):
+            count = self._load_files(list(enumerate(filenames)),
+                                     key_function, processes, commit=True)
+            self._save_file_stats()
+            con.commit()
+            self._length = count
+            #print "About to index %i entries" % count
+            try:
+                con.execute("CREATE UNIQUE INDEX IF NOT EXISTS "
+                            "key_index ON offset_data(key);")
+            except _IntegrityError, err:
+                self.close()
+                con.close()
+                raise ValueError("Duplicate key? %s" % err)
+            con.execute("PRAGMA locking_mode=NORMAL")
+            con.execute("UPDATE meta_data SET value = ? WHERE key = ?;",
+                        (count, "count"))
+            con.commit()
+            #print "Index created"
+        self._index_filename = index_filename
+        self._key_function = key_function
+
+    def _load_files(self, numbered_filenames, key_function, processes,
+                    commit=False):
+        """Scan files and add their offsets to the database (PRIVATE).
+
+        Takes a list of (file_number, filename) tuples, and returns the
+        number of records added. With commit=True each file is committed
+        as its own transaction (used when creating a new database, which
+        is marked as unfinished until the end), otherwise the caller must
+        commit (or roll back) the transaction.
+        """
+        con = self._con
+        format = self._format
+        proxy_factory = self._proxy_factory
+        random_access_proxies = self._proxies
+        if processes > 1 and len(numbered_filenames) > 1:
+            pool, offset_lists = _parallel_scan(proxy_factory, format,
+                                                [filename for i, filename
+                                                 in numbered_filenames],
+                                                processes)
+        else:
+            pool = None
+        count = 0
+        try:
+            for i, filename in numbered_filenames:
                 con.execute(
                     "INSERT INTO file_data (file_number, name) VALUES (?,?);",
                     (i, filename))
-                random_access_proxy = proxy_factory(format, filename)
+                if pool is not None:
+                    #Already scanned by a worker process, the proxy
+                    #will be opened on demand
+                    random_access_proxy = None
+                    raw_offset_iter = offset_lists.next()
+                else:
+                    random_access_proxy = proxy_factory(format, filename)
+                    raw_offset_iter = random_access_proxy
                 if key_function:
                     offset_iter = ((key_function(
-                        k), i, o, l) for (k, o, l) in random_access_proxy)
+                        k), i, o, l) for (k, o, l) in raw_offset_iter)
                 else:
                     offset_iter = (
-                        (k, i, o, l) for (k, o, l) in random_access_proxy)
+                        (k, i, o, l) for (k, o, l) in raw_offset_iter)
                 while True:
-                    batch = list(itertools.islice(offset_iter, 100))
+                    batch = list(itertools.islice(offset_iter, 10000))
                     if not batch:
                         break
                     #print "Inserting batch of %i offsets, %s ... %s" \
@@ -542,31 +1071,97 @@ class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
                     con.executemany(
                         "INSERT INTO offset_data (key,file_number,offset,length) VALUES (?,?,?,?);",
                         batch)
-                    con.commit()
                     count += len(batch)
-                if len(random_access_proxies) < max_open:
+                if random_access_proxy is None:
+                    pass
+                elif len(random_access_proxies) < self._max_open:
                     random_access_proxies[i] = random_access_proxy
                 else:
                     random_access_proxy._handle.close()
-            self._length = count
-            #print "About to index %i entries" % count
-            try:
-                con.execute("CREATE UNIQUE INDEX IF NOT EXISTS "
-                            "key_index ON offset_data(key);")
-            except _IntegrityError, err:
-                self._proxies = random_access_proxies
-                self.close()
-                con.close()
-                raise ValueError("Duplicate key? %s" % err)
-            con.execute("PRAGMA locking_mode=NORMAL")
+                if commit:
+                    con.commit()
+        finally:
+            if pool is not None:
+                #Will kill any workers still running if there was an error
+                pool.terminate()
+        return count
+
+    def _save_file_stats(self):
+        """Record the size and modification time of each file (PRIVATE)."""
+        con = self._con
+        con.execute("DELETE FROM meta_data WHERE key LIKE 'file_size_%' "
+                    "OR key LIKE 'file_mtime_%';")
+        for i, filename in enumerate(self._filenames):
+            size, mtime = _file_stat(filename)
+            con.execute("INSERT INTO meta_data (key, value) VALUES (?,?);",
+                        ("file_size_%i" % i, size))
+            con.execute("INSERT INTO meta_data (key, value) VALUES (?,?);",
+                        ("file_mtime_%i" % i, mtime))
+
+    def _refresh(self, filenames, key_function, processes):
+        """Update an existing index for new, modified or removed files (PRIVATE)."""
+        con = self._con
+        stats = dict(con.execute("SELECT key, value FROM meta_data WHERE "
+                                 "key LIKE 'file_size_%' OR "
+                                 "key LIKE 'file_mtime_%';").fetchall())
+        wanted = dict((filename, i) for i, filename in enumerate(filenames))
+        dropped = []
+        moved = []
+        kept = set()
+        for old, filename in enumerate(self._filenames):
+            if filename in wanted and os.path.isfile(filename) \
+            and (stats.get("file_size_%i" % old),
+                 stats.get("file_mtime_%i" % old)) == _file_stat(filename):
+                kept.add(filename)
+                if wanted[filename] != old:
+                    moved.append((old, wanted[filename]))
+            else:
+                dropped.append(old)
+        added = [(i, filename) for i, filename in enumerate(filenames)
+                 if filename not in kept]
+        if not (dropped or moved or added):
+            #Nothing to do
+            return
+        self.close()
+        try:
+            count = self._length
+            for old in dropped:
+                count -= con.execute("DELETE FROM offset_data WHERE "
+                                     "file_number=?;", (old,)).rowcount
+                con.execute("DELETE FROM file_data WHERE file_number=?;",
+                            (old,))
+            #Renumber the files to match their new order, going via
+            #negative numbers to avoid any clashes:
+            for table in ["offset_data", "file_data"]:
+                for j in xrange(0, len(moved), 400):
+                    chunk = moved[j:j + 400]
+                    params = []
+                    for old, new in chunk:
+                        params.extend([old, -1 - new])
+                    params.extend([old for old, new in chunk])
+                    con.execute("UPDATE %s SET file_number = CASE file_number "
+                                "%s END WHERE file_number IN (%s);"
+                                % (table, " ".join(["WHEN ? THEN ?"] * len(chunk)),
+                                   ",".join("?" * len(chunk))), params)
+                con.execute("UPDATE %s SET file_number = -1 - file_number "
+                            "WHERE file_number < 0;" % table)
+            self._filenames = filenames
+            count += self._load_files(added, key_function, processes)
+            self._save_file_stats()
             con.execute("UPDATE meta_data SET value = ? WHERE key = ?;",
                         (count, "count"))
             con.commit()
-            #print "Index created"
-        self._proxies = random_access_proxies
-        self._max_open = max_open
-        self._index_filename = index_filename
-        self._key_function = key_function
+        except _IntegrityError, err:
+            con.rollback()
+            self.close()
+            con.close()
+            raise ValueError("Duplicate key? %s" % err)
+        except:
+            con.rollback()
+            self.close()
+            con.close()
+            raise
+        self._length = count
 
     def __repr__(self):
         return self._repr
@@ -671,6 +1266,68 @@ class _SQLiteManySeqFilesDict(_IndexedSeqFileDict):
             else:
                 return proxy.get_raw(offset)
 
+    def _lookup_many(self, keys):
+        """List of (file, offset, length, index, key) for the keys (PRIVATE).
+
+        Uses a temporary table of the wanted keys, so that all the offsets
+        can be looked up with a single query.
+        """
+        keys = list(keys)
+        con = self._con
+        con.execute("CREATE TEMP TABLE wanted_keys "
+                    "(key TEXT, key_index INTEGER);")
+        try:
+            con.executemany("INSERT INTO wanted_keys (key, key_index) "
+                            "VALUES (?,?);",
+                            ((key, index) for index, key in enumerate(keys)))
+            wanted = con.execute(
+                "SELECT file_number, offset, length, key_index "
+                "FROM wanted_keys LEFT JOIN offset_data "
+                "ON wanted_keys.key = offset_data.key "
+                "ORDER BY file_number, offset, key_index;").fetchall()
+        finally:
+            con.execute("DROP TABLE temp.wanted_keys;")
+        for file_number, offset, length, index in wanted:
+            if offset is None:
+                raise KeyError(keys[index])
+        return [(file_number, offset, length, index, keys[index])
+                for file_number, offset, length, index in wanted]
+
+    def _get_proxy(self, file_number):
+        """Returns the proxy for this file, opening it if needed (PRIVATE)."""
+        proxies = self._proxies
+        if file_number in proxies:
+            return proxies[file_number]
+        if len(proxies) >= self._max_open:
+            #Close an old handle...
+            proxies.popitem()[1]._handle.close()
+        #Open a new handle...
+        proxy = self._proxy_factory(self._format, self._filenames[file_number])
+        proxies[file_number] = proxy
+        return proxy
+
+    def _get_at(self, file_number, offset, key):
+        """Parse the record at this offset, checking the key (PRIVATE)."""
+        record = self._get_proxy(file_number).get(offset)
+        if self._key_function:
+            key2 = self._key_function(record.id)
+        else:
+            key2 = record.id
+        if key != key2:
+            raise ValueError("Key did not match (%s vs %s)" % (key, key2))
+        return record
+
+    def _get_raw_at(self, file_number, offset, length):
+        """Return the raw record at this offset (PRIVATE)."""
+        proxy = self._get_proxy(file_number)
+        if length:
+            #Shortcut if we have the length
+            h = proxy._handle
+            h.seek(offset)
+            return h.read(length)
+        else:
+            return proxy.get_raw(offset)
+
     def close(self):
         """Close any open file handles."""
         proxies = self._proxies
@@ -131,7 +131,8 @@ class InsdcScanner(object):
         self.line = line
         return header_lines
 
-    def parse_features(self, skip=False):
+    def parse_features(self, skip=False, feature_types=None,
+                       feature_qualifiers=None):
         """Return list of tuples for the features (if present)
 
         Each feature is returned as a tuple (key, location, qualifiers)
@@ -139,6 +140,12 @@ class InsdcScanner(object):
         "complement(join(490883..490885,1..879))") while qualifiers
         is a list of two string tuples (feature qualifier keys and values).
 
+        If feature_types is given (e.g. ["CDS", "rRNA"]), only features
+        of those types are returned, and if feature_qualifiers is given
+        (e.g. ["translation"]), only features with all those qualifiers.
+        Other features are skipped without parsing their location and
+        qualifiers, as is every feature with skip=True.
+
         Assumes you have already read to the start of the features table.
         """
         if self.line.rstrip() not in self.FEATURE_START_MARKERS:
@@ -195,6 +202,9 @@ class InsdcScanner(object):
                 else:
                     feature_key = line[2:self.FEATURE_QUALIFIER_INDENT].strip()
                     feature_lines = [line[self.FEATURE_QUALIFIER_INDENT:]]
+                if feature_types is not None and feature_key not in feature_types:
+                    line = self._skip_feature()
+                    continue
                 line = self.handle.readline()
                 while line[:self.FEATURE_QUALIFIER_INDENT] == self.FEATURE_QUALIFIER_SPACER \
                         or line.rstrip() == "":  # cope with blank lines in the midst of a feature
@@ -202,10 +212,40 @@ class InsdcScanner(object):
                     #white space (e.g. out of spec files with too much intentation)
                     feature_lines.append(line[self.FEATURE_QUALIFIER_INDENT:].strip())
                     line = self.handle.readline()
+                if feature_qualifiers and \
+                        not self._has_qualifiers(feature_lines, feature_qualifiers):
+                    continue
                 features.append(self.parse_feature(feature_key, feature_lines))
         self.line = line
         return features
 
+    def _skip_feature(self):
+        """Read past the remaining lines of a feature, returns the next line (PRIVATE).
+
+        Used for features filtered out by type in parse_features, only the
+        start of each line is looked at.
+        """
+        line = self.handle.readline()
+        while line and (line[:self.FEATURE_QUALIFIER_INDENT] == self.FEATURE_QUALIFIER_SPACER
+                        or line.rstrip() == ""):
+            line = self.handle.readline()
+        return line
+
+    def _has_qualifiers(self, feature_lines, feature_qualifiers):
+        """Does the feature have all these qualifiers (PRIVATE)?
+
+        Looks for lines starting /name= (or just /name) in the unparsed
+        feature lines, as used in parse_features.
+        """
+        for name in feature_qualifiers:
+            prefix = "/" + name
+            for line in feature_lines[1:]:
+                if line == prefix or line.startswith(prefix + "="):
+                    break
+            else:
+                return False
+        return True
+
     def parse_feature(self, feature_key, lines):
         """Expects a feature as a list of strings, returns a tuple (key, location, qualifiers)
 
@@ -383,7 +423,8 @@ class InsdcScanner(object):
         """
         pass
 
-    def feed(self, handle, consumer, do_features=True):
+    def feed(self, handle, consumer, do_features=True, feature_types=None,
+             feature_qualifiers=None):
         """Feed a set of data into the consumer.
 
         This method is intended for use with the "old" code in Bio.GenBank
@@ -393,6 +434,11 @@ class InsdcScanner(object):
         consumer - The consumer that should be informed of events.
         do_features - Boolean, should the features be parsed?
                       Skipping the features can be much faster.
+        feature_types - Optional list of feature types (e.g. ["CDS"]),
+                        other features are skipped.
+        feature_qualifiers - Optional list of qualifier names (e.g.
+                             ["translation"]), features without all
+                             of these are skipped.
 
         Return values:
         true  - Passed a record
@@ -416,7 +462,9 @@ class InsdcScanner(object):
 
         #Features (common to both EMBL and GenBank):
         if do_features:
-            self._feed_feature_table(consumer, self.parse_features(skip=False))
+            self._feed_feature_table(consumer,
+                                     self.parse_features(False, feature_types,
+                                                         feature_qualifiers))
         else:
             self.parse_features(skip=True)  # ignore the data
 
@@ -433,9 +481,13 @@ class InsdcScanner(object):
         #And we are done
         return True
 
-    def parse(self, handle, do_features=True):
+    def parse(self, handle, do_features=True, feature_types=None,
+              feature_qualifiers=None):
         """Returns a SeqRecord (with SeqFeatures if do_features=True)
 
+        The optional feature_types and feature_qualifiers arguments can be
+        used to select which features are parsed, see parse_features().
+
         See also the method parse_records() for use on multi-record files.
         """
         from Bio.GenBank import _FeatureConsumer
@@ -444,23 +496,28 @@ class InsdcScanner(object):
         consumer = _FeatureConsumer(use_fuzziness=1,
                                     feature_cleaner=FeatureValueCleaner())
 
-        if self.feed(handle, consumer, do_features):
+        if self.feed(handle, consumer, do_features, feature_types,
+                     feature_qualifiers):
             return consumer.data
         else:
             return None
 
-    def parse_records(self, handle, do_features=True):
+    def parse_records(self, handle, do_features=True, feature_types=None,
+                      feature_qualifiers=None):
         """Returns a SeqRecord object iterator
 
         Each record (from the ID/LOCUS line to the // line) becomes a SeqRecord
 
-        The SeqRecord objects include SeqFeatures if do_features=True
+        The SeqRecord objects include SeqFeatures if do_features=True, or
+        just the selected features if feature_types and/or feature_qualifiers
+        are given (see parse_features).
 
         This method is intended for use in Bio.SeqIO
         """
         #This is a generator function
         while True:
-            record = self.parse(handle, do_features)
+            record = self.parse(handle, do_features, feature_types,
+                                feature_qualifiers)
             if record is None:
                 break
             if record.id is None:
@@ -488,7 +545,8 @@ class InsdcScanner(object):
         while self.find_start():
             #Got an EMBL or GenBank record...
             self.parse_header()  # ignore header lines!
-            feature_tuples = self.parse_features()
+            #Only need the CDS features, don't parse the others
+            feature_tuples = self.parse_features(feature_types=["CDS"])
             #self.parse_footer() # ignore footer lines!
             while True:
                 line = self.handle.readline()
@@ -825,7 +883,8 @@ class _ImgtScanner(EmblScanner):
                              "FH   Key                 Location/Qualifiers",
                              "FH"]
 
-    def parse_features(self, skip=False):
+    def parse_features(self, skip=False, feature_types=None,
+                       feature_qualifiers=None):
         """Return list of tuples for the features (if present)
 
         Each feature is returned as a tuple (key, location, qualifiers)
@@ -833,6 +892,9 @@ class _ImgtScanner(EmblScanner):
         "complement(join(490883..490885,1..879))") while qualifiers
         is a list of two string tuples (feature qualifier keys and values).
 
+        The optional feature_types and feature_qualifiers arguments select
+        which features are returned, as in the InsdcScanner.
+
         Assumes you have already read to the start of the features table.
         """
         if self.line.rstrip() not in self.FEATURE_START_MARKERS:
@@ -882,6 +944,9 @@ class _ImgtScanner(EmblScanner):
                     #start in column 26 (one-based).
                     feature_key = line[2:25].strip()
                     location_start = line[25:].strip()
+                if feature_types is not None and feature_key not in feature_types:
+                    line = self._skip_feature()
+                    continue
                 feature_lines = [location_start]
                 line = self.handle.readline()
                 while line[:self.FEATURE_QUALIFIER_INDENT] == self.FEATURE_QUALIFIER_SPACER \
@@ -891,6 +956,9 @@ class _ImgtScanner(EmblScanner):
                     assert line[:2] == "FT"
                     feature_lines.append(line[self.FEATURE_QUALIFIER_INDENT:].strip())
                     line = self.handle.readline()
+                if feature_qualifiers and \
+                        not self._has_qualifiers(feature_lines, feature_qualifiers):
+                    continue
                 feature_key, location, qualifiers = \
                     self.parse_feature(feature_key, feature_lines)
                 #Try to handle known problems with IMGT locations here:
@@ -540,6 +540,10 @@ class BlastTabIndexer(SearchIndexer):
         # mark of the last line
         end_mark = _as_bytes('# BLAST processed')
 
+        # lengths are summed rather than taken from the difference of
+        # offsets, which need not be byte positions (e.g. with BGZF)
+        length = 0
+
         while True:
             end_offset = handle.tell()
             line = handle.readline()
@@ -550,10 +554,12 @@ class BlastTabIndexer(SearchIndexer):
             elif line.startswith(qid_mark):
                 qresult_key = line[len(qid_mark):].split()[0]
             elif line == query_mark or line.startswith(end_mark):
-                yield qresult_key, start_offset, end_offset - start_offset
+                yield qresult_key, start_offset, length
                 start_offset = end_offset
+                length = 0
             elif not line:
                 break
+            length += len(line)
 
     def _qresult_index(self):
         """Indexer for noncommented BLAST tabular files."""
@@ -564,6 +570,10 @@ class BlastTabIndexer(SearchIndexer):
         key_idx = self._key_idx
         tab_char = _as_bytes('\t')
 
+        # lengths are summed rather than taken from the difference of
+        # offsets, which need not be byte positions (e.g. with BGZF)
+        length = 0
+
         while True:
             # get end offset here since we only know a qresult ends after
             # encountering the next one
@@ -580,9 +590,11 @@ class BlastTabIndexer(SearchIndexer):
                     curr_key = _as_bytes('')
 
                 if curr_key != qresult_key:
-                    yield qresult_key, start_offset, end_offset - start_offset
+                    yield qresult_key, start_offset, length
                     qresult_key = curr_key
                     start_offset = end_offset
+                    length = 0
+            length += len(line)
 
             # break if we've reached EOF
             if not line:
@@ -536,9 +536,11 @@ class BlatPslIndexer(SearchIndexer):
                 raise StopIteration
 
         # and index the qresults
+        # (lengths are summed rather than taken from the difference of
+        # offsets, which need not be byte positions e.g. with BGZF)
+        line_offset = start_offset
+        length = 0
         while True:
-            end_offset = handle.tell()
-
             cols = line.strip().split(tab_char)
             if qresult_key is None:
                 qresult_key = list(filter(None, cols))[query_id_idx]
@@ -546,15 +548,16 @@ class BlatPslIndexer(SearchIndexer):
                 curr_key = list(filter(None, cols))[query_id_idx]
 
                 if curr_key != qresult_key:
-                    yield _bytes_to_string(qresult_key), start_offset, \
-                            end_offset - start_offset
+                    yield _bytes_to_string(qresult_key), start_offset, length
                     qresult_key = curr_key
-                    start_offset = end_offset - len(line)
+                    start_offset = line_offset
+                    length = 0
 
+            length += len(line)
+            line_offset = handle.tell()
             line = handle.readline()
             if not line:
-                yield _bytes_to_string(qresult_key), start_offset, \
-                        end_offset - start_offset
+                yield _bytes_to_string(qresult_key), start_offset, length
                 break
 
     def get_raw(self, offset):
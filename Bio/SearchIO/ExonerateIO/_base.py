@@ -402,26 +402,32 @@ class _BaseExonerateIndexer(SearchIndexer):
         handle = self._handle
         handle.seek(0)
         qresult_key = None
+        # lengths are summed rather than taken from the difference of
+        # offsets, which need not be byte positions (e.g. with BGZF)
+        length = 0
 
         while True:
             start_offset = handle.tell()
             line = handle.readline()
             if line.startswith(self._query_mark):
+                # get_qresult_id moves the handle, so come back afterwards
+                end_offset = handle.tell()
                 if qresult_key is None:
                     qresult_key = self.get_qresult_id(start_offset)
                     qresult_offset = start_offset
+                    length = 0
                 else:
                     curr_key = self.get_qresult_id(start_offset)
                     if curr_key != qresult_key:
-                        yield qresult_key, qresult_offset, \
-                                start_offset - qresult_offset
+                        yield qresult_key, qresult_offset, length
                         qresult_key = curr_key
                         qresult_offset = start_offset
-                        handle.seek(qresult_offset)
+                        length = 0
+                handle.seek(end_offset)
             elif not line:
-                yield qresult_key, qresult_offset, \
-                        start_offset - qresult_offset
+                yield qresult_key, qresult_offset, length
                 break
+            length += len(line)
 
 
 # if not used as a module, run the doctest
@@ -184,11 +184,11 @@ class ExonerateVulgarIndexer(_BaseExonerateIndexer):
         qresult_raw = _as_bytes('')
 
         while True:
+            cur_pos = handle.tell()
             line = handle.readline()
             if not line:
                 break
             elif line.startswith(self._query_mark):
-                cur_pos = handle.tell() - len(line)
                 if qresult_key is None:
                     qresult_key = self.get_qresult_id(cur_pos)
                 else:
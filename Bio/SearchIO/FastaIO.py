@@ -501,23 +501,29 @@ class FastaM10Indexer(SearchIndexer):
         qresult_key = None
         query_mark = _as_bytes('>>>')
 
+        # read ahead by one line ourselves rather than using peekline, as
+        # UndoHandle.tell assumes byte offsets (not so with BGZF)
+        line_offset = start_offset
+        line = handle.readline()
         while True:
-            line = handle.readline()
-            peekline = handle.peekline()
-            end_offset = handle.tell()
+            peek_offset = handle.tell()
+            peekline = handle.readline()
 
             if not line.startswith(query_mark) and query_mark in line:
                 regx = re.search(_RE_ID_DESC_SEQLEN_IDX, line)
                 qresult_key = _bytes_to_string(regx.group(1))
-                start_offset = end_offset - len(line)
+                start_offset = line_offset
             # yield whenever we encounter a new query or at the end of the file
             if qresult_key is not None:
                 if (not peekline.startswith(query_mark)
                         and query_mark in peekline) or not line:
-                    yield qresult_key, start_offset, end_offset - start_offset
+                    # no length, as get_raw also includes the file header
+                    yield qresult_key, start_offset, 0
                     if not line:
                         break
-                    start_offset = end_offset
+            elif not line:
+                break
+            line_offset, line = peek_offset, peekline
 
     def get_raw(self, offset):
         handle = self._handle
@@ -319,29 +319,29 @@ class Hmmer2TextIndexer(_BaseHmmerTextIndexer):
 
         # determine flag for hmmsearch
         is_hmmsearch = False
+        line_offset = start_offset
         line = read_forward(handle)
         if line.startswith(_as_bytes('hmmsearch')):
             is_hmmsearch = True
 
         while True:
-            end_offset = handle.tell()
-
             if line.startswith(self.qresult_start):
                 regx = re.search(regex_id, line)
                 qresult_key = regx.group(1).strip()
                 # qresult start offset is the offset of this line
                 # (starts with the start mark)
-                start_offset = end_offset - len(line)
+                start_offset = line_offset
             elif line.startswith(self.qresult_end):
                 yield _bytes_to_string(qresult_key), start_offset, 0
-                start_offset = end_offset
+                start_offset = handle.tell()
             elif not line:
                 # HACK: since hmmsearch can only have one query result
                 if is_hmmsearch:
                     yield _bytes_to_string(qresult_key), start_offset, 0
                 break
 
-            line = read_forward(handle)
+            line_offset = handle.tell()
+            line = handle.readline()
 
 # if not used as a module, run the doctest
 if __name__ == "__main__":
@@ -390,18 +390,18 @@ class Hmmer3TextIndexer(_BaseHmmerTextIndexer):
         regex_id = re.compile(_as_bytes(_QRE_ID_LEN_PTN))
 
         while True:
-            line = read_forward(handle)
-            end_offset = handle.tell()
+            line_offset = handle.tell()
+            line = handle.readline()
 
             if line.startswith(self.qresult_start):
                 regx = re.search(regex_id, line)
                 qresult_key = regx.group(1).strip()
                 # qresult start offset is the offset of this line
                 # (starts with the start mark)
-                start_offset = end_offset - len(line)
+                start_offset = line_offset
             elif line.startswith(self.qresult_end):
                 yield _bytes_to_string(qresult_key), start_offset, 0
-                start_offset = end_offset
+                start_offset = handle.tell()
             elif not line:
                 break
 
@@ -421,13 +421,15 @@ def to_dict(qresults, key_function=lambda rec: rec.id):
     return qdict
 
 
-def index(filename, format=None, key_function=None, **kwargs):
+def index(filename, format=None, key_function=None, compact=False, **kwargs):
     """Indexes a search output file and returns a dictionary-like object.
 
      - filename     - string giving name of file to be indexed
      - format       - Lower case string denoting one of the supported formats.
      - key_function - Optional callback function which when given a
                       QueryResult should return a unique key for the dictionary.
+     - compact      - Optional boolean, if True the keys and offsets are held
+                      in compact arrays rather than a Python dictionary.
      - kwargs       - Format-specific keyword arguments.
 
     Index returns a pseudo-dictionary object with QueryResult objects as its
@@ -479,6 +481,10 @@ def index(filename, format=None, key_function=None, **kwargs):
     Note that the callback function does not change the QueryResult's ID value.
     It only changes the key value used to retrieve the associated QueryResult.
 
+    For files with very many queries, use compact=True to keep the keys and
+    file offsets in arrays instead of a Python dictionary. This needs much
+    less memory, but requires the keys (after any key_function) to be strings.
+
     """
     if not isinstance(filename, basestring):
         raise TypeError("Need a filename (not a handle)")
@@ -487,12 +493,14 @@ def index(filename, format=None, key_function=None, **kwargs):
     proxy_class = get_processor(format, _INDEXER_MAP)
     repr = "SearchIO.index(%r, %r, key_function=%r)" \
         % (filename, format, key_function)
+    if compact:
+        repr = repr[:-1] + ", compact=True)"
     return _IndexedSeqFileDict(proxy_class(filename, **kwargs),
-                               key_function, repr, "QueryResult")
+                               key_function, repr, "QueryResult", compact)
 
 
 def index_db(index_filename, filenames=None, format=None,
-        key_function=None, **kwargs):
+        key_function=None, processes=1, refresh=False, **kwargs):
     """Indexes several search output files into an SQLite database.
 
      - index_filename - The SQLite filename.
@@ -504,6 +512,10 @@ def index_db(index_filename, filenames=None, format=None,
      - key_function - Optional callback function which when given a
                       QueryResult identifier string should return a unique
                       key for the dictionary.
+     - processes    - Number of processes used to scan the files in parallel
+                      when creating a new index (default one, Python 2.6+).
+     - refresh      - If True, update an existing index to match the given
+                      filenames, re-scanning only new or modified files.
      - kwargs       - Format-specific keyword arguments.
 
     The `index_db` function is similar to `index` in that it indexes the start
@@ -554,17 +566,29 @@ def index_db(index_filename, filenames=None, format=None,
     repr = "SearchIO.index_db(%r, filenames=%r, format=%r, key_function=%r, ...)" \
                % (index_filename, filenames, format, key_function)
 
-    def proxy_factory(format, filename=None):
+    return _SQLiteManySeqFilesDict(index_filename, filenames,
+                                   _ProxyFactory(kwargs), format,
+                                   key_function, repr, processes=processes,
+                                   refresh=refresh)
+
+
+class _ProxyFactory(object):
+    """Proxy factory used by Bio.SearchIO.index_db (PRIVATE).
+
+    This is a class rather than a closure so that it can be pickled,
+    which is needed to scan files in parallel using multiprocessing.
+    """
+    def __init__(self, kwargs):
+        self._kwargs = kwargs
+
+    def __call__(self, format, filename=None):
         """Given a filename returns proxy object, else boolean if format OK."""
         if filename:
-            return get_processor(format, _INDEXER_MAP)(filename, **kwargs)
+            return get_processor(format, _INDEXER_MAP)(filename,
+                                                       **self._kwargs)
         else:
             return format in _INDEXER_MAP
 
-    return _SQLiteManySeqFilesDict(index_filename, filenames,
-                                   proxy_factory, format,
-                                   key_function, repr)
-
 
 def write(qresults, handle, format=None, **kwargs):
     """Writes QueryResult objects to a file in the given format.
@@ -0,0 +1,458 @@
+# Copyright 2013 by Peter Cock.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+"""Bio.SeqIO support for a simple binary "columnar" file format.
+
+You are expected to use this module via the Bio.SeqIO functions under the
+format name "columnar", or via the ColumnarFile class for random access.
+
+This is not a standard file format, but a simple binary container intended
+for caching a set of sequences which will be analysed repeatedly, so that
+the text of the original FASTA, FASTQ, GenBank (etc) files doesn't have to
+be parsed each time. Like FASTA and FASTQ, only the record identifiers,
+descriptions, sequences and any integer per-letter annotations (such as
+quality scores) are stored. The record identifiers must be unique, and
+every record must have the same set of integer per-letter annotations as
+the first record (otherwise writing the file raises a ValueError).
+
+Rather than one record after another, the file holds each field as a column:
+all the identifiers concatenated into one block of bytes along with an array
+of where each one starts, all the descriptions likewise, all the sequences
+likewise, and each per-letter annotation as one array of integers (using the
+same start positions as the sequences). There is also a hash table of the
+identifiers. The file can be memory mapped, and any record can be fetched
+directly by its position in the file or its identifier, without reading the
+rest of the file.
+
+For example, converting a FASTQ file (here to an in memory handle):
+
+    >>> from StringIO import StringIO
+    >>> from Bio import SeqIO
+    >>> handle = StringIO()
+    >>> SeqIO.convert("Quality/example.fastq", "fastq", handle, "columnar")
+    3
+    >>> handle.seek(0)
+    >>> for record in SeqIO.parse(handle, "columnar"):
+    ...     print record.id, record.seq, record.letter_annotations["phred_quality"][:5]
+    EAS54_6_R1_2_1_413_324 CCCTTCTTGTCTTCAGCGTTTCTCC [26, 26, 18, 26, 26]
+    EAS54_6_R1_2_1_540_792 TTGGCAGGCCAAGGCCGATGGATCA [26, 26, 26, 26, 26]
+    EAS54_6_R1_2_1_443_348 GTTGCTTCTGGCGTGGGTGGGGGGG [26, 26, 26, 26, 26]
+
+For random access use the ColumnarFile class, which (given a filename or a
+handle to a real file) memory maps the file:
+
+    >>> handle.seek(0)
+    >>> columns = ColumnarFile(handle)
+    >>> len(columns)
+    3
+    >>> print columns[1].id
+    EAS54_6_R1_2_1_540_792
+    >>> print columns["EAS54_6_R1_2_1_443_348"].seq
+    GTTGCTTCTGGCGTGGGTGGGGGGG
+    >>> columns.index("EAS54_6_R1_2_1_443_348")
+    2
+    >>> columns.close()
+
+The file is little endian binary data, starting with an eight byte magic
+string, the number of records and the length of a plain text header (both
+as unsigned 64 bit integers). Each line of the header describes a column,
+giving its name, the Python array module typecode of its values, where it
+starts in the file, and the number of values. The columns themselves are
+padded to start at multiples of eight bytes.
+"""
+
+import array
+import mmap
+import struct
+import sys
+
+from Bio import Alphabet
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+from Bio.File import _CompactOffsetTable, _MappedArray
+from Bio.File import _offset_array, _pad8
+from Bio._py3k import _as_bytes, _bytes_to_string
+from Interfaces import SequenceWriter
+
+_magic = _as_bytes("BIOCOL\x00\x01")
+#magic, record count, header length
+_header = struct.Struct("<8sQQ")
+#Prefix on the column names for the per-letter annotations
+_letter_prefix = "letter:"
+
+
+class _BytesView(object):
+    """Slices of a block of bytes within a larger string or mmap (PRIVATE)."""
+    def __init__(self, data, start):
+        self._data = data
+        self._start = start
+
+    def __getitem__(self, index):
+        start = self._start
+        return self._data[start + index.start:start + index.stop]
+
+
+class _MappedIdTable(_CompactOffsetTable):
+    """Hash table of the record identifiers in a columnar file (PRIVATE).
+
+    This looks up the record number for an identifier, using the same
+    layout and hash function as a _CompactOffsetTable, but accessing the
+    columns in place.
+    """
+    def __init__(self, keys, starts, slots):
+        self._keys = keys
+        self._starts = starts
+        self._offsets = xrange(len(starts) - 1)
+        self._slots = slots
+        self._mask = len(slots) - 1
+
+
+class ColumnarFile(object):
+    """Random access to the records in a columnar file.
+
+    Records are returned as SeqRecord objects, and can be looked up by their
+    position in the file (an integer, counting from zero, and negative
+    values count from the end as with a list), or by their identifier (a
+    string). Iterating gives all the records in order.
+    """
+    def __init__(self, handle, alphabet=Alphabet.single_letter_alphabet):
+        """Open a columnar file.
+
+         - handle - filename, or handle to the file opened in binary mode
+         - alphabet - optional alphabet for the sequences
+
+        If possible the file is memory mapped, otherwise the whole file is
+        read into memory.
+        """
+        if isinstance(handle, basestring):
+            handle = open(handle, "rb")
+            try:
+                data = self._load(handle)
+            finally:
+                handle.close()
+        else:
+            data = self._load(handle)
+        self._data = data
+        self._alphabet = alphabet
+        try:
+            self._read_header()
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_header(self):
+        """Find the columns, and set up the lookups (PRIVATE)."""
+        data = self._data
+        if len(data) < _header.size:
+            raise ValueError("File too small to be a columnar file")
+        magic, count, header_length = _header.unpack_from(data, 0)
+        if magic != _magic:
+            raise ValueError("Not a columnar file, starts %r"
+                             % data[:len(_magic)])
+        columns = {}
+        end = _header.size + header_length
+        for line in _bytes_to_string(data[_header.size:end]).splitlines():
+            if not line:
+                #Padding at the end of the header
+                continue
+            name, typecode, start, length = line.rsplit("\t", 3)
+            start = int(start)
+            length = int(length)
+            if start + struct.calcsize("<" + typecode) * length > len(data):
+                raise ValueError("Columnar file is truncated")
+            columns[name] = typecode, start, length
+        for name in ["ids", "id_starts", "descriptions", "description_starts",
+                     "seqs", "seq_starts", "id_slots"]:
+            if name not in columns:
+                raise ValueError("Columnar file lacks the %s column" % name)
+        self._columns = columns
+        self._count = count
+        self._id_table = _MappedIdTable(self._bytes("ids"),
+                                        self._integers("id_starts"),
+                                        self._integers("id_slots"))
+        self._letters = sorted(name[len(_letter_prefix):] for name in columns
+                               if name.startswith(_letter_prefix))
+
+    def _load(self, handle):
+        """Memory map the file if possible, else read it (PRIVATE)."""
+        try:
+            return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, ValueError, EnvironmentError):
+            #e.g. a StringIO handle, or an empty file
+            return handle.read()
+
+    def _integers(self, name):
+        """Returns an integer column, accessed in place (PRIVATE)."""
+        typecode, start, length = self._columns[name]
+        return _MappedArray(self._data, start, length, "<" + typecode)
+
+    def _bytes(self, name):
+        """Returns a bytes column, accessed in place (PRIVATE)."""
+        typecode, start, length = self._columns[name]
+        return _BytesView(self._data, start)
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        return "<%s with %i records>" % (self.__class__.__name__, len(self))
+
+    def __iter__(self):
+        #Decode the records in chunks, which is faster than one by one
+        for start in xrange(0, len(self), 1000):
+            for record in self._records(start, min(start + 1000,
+                                                   len(self))):
+                yield record
+
+    def __contains__(self, key):
+        return key in self._id_table
+
+    def __getitem__(self, key):
+        """Returns a record given its position (integer) or identifier."""
+        if isinstance(key, (int, long)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError("record index out of range")
+            return self._record(key)
+        return self._record(self._id_table[key])
+
+    def get(self, key, default=None):
+        """Returns the record with this identifier, or the default."""
+        try:
+            return self._record(self._id_table[key])
+        except KeyError:
+            return default
+
+    def index(self, key):
+        """Returns the position of the record with this identifier."""
+        try:
+            return self._id_table[key]
+        except KeyError:
+            raise ValueError("No record with identifier %r" % key)
+
+    def ids(self):
+        """Iterate over the record identifiers (in order)."""
+        return iter(self._id_table)
+
+    def _unpack(self, name, start, stop):
+        """Returns a tuple of the values in an integer column (PRIVATE)."""
+        typecode, offset, length = self._columns[name]
+        return struct.unpack_from("<%i%s" % (stop - start, typecode),
+                                  self._data,
+                                  offset + struct.calcsize("<" + typecode) * start)
+
+    def _strings(self, name, start, stop):
+        """Returns a list of the strings for these records (PRIVATE)."""
+        data = self._data
+        offset = self._columns[name + "s"][1]
+        starts = self._unpack(name + "_starts", start, stop + 1)
+        return [_bytes_to_string(data[offset + starts[j]:
+                                      offset + starts[j + 1]])
+                for j in xrange(stop - start)]
+
+    def _record(self, i):
+        """Returns the i-th record as a SeqRecord (PRIVATE)."""
+        return self._records(i, i + 1).next()
+
+    def _records(self, start, stop):
+        """Generates the records from start up to stop (PRIVATE)."""
+        seq_starts = self._unpack("seq_starts", start, stop + 1)
+        first = seq_starts[0]
+        letters = []
+        for key in self._letters:
+            values = list(self._unpack(_letter_prefix + key, first,
+                                       seq_starts[-1]))
+            letters.append((key, values))
+        seqs = self._strings("seq", start, stop)
+        descriptions = self._strings("description", start, stop)
+        alphabet = self._alphabet
+        for j, record_id in enumerate(self._strings("id", start, stop)):
+            record = SeqRecord(Seq(seqs[j], alphabet), id=record_id,
+                               name=record_id, description=descriptions[j])
+            #Dirty trick to skip checking the per-letter annotation lengths
+            a = seq_starts[j] - first
+            b = seq_starts[j + 1] - first
+            for key, values in letters:
+                dict.__setitem__(record._per_letter_annotations, key,
+                                 values[a:b])
+            yield record
+
+    def close(self):
+        """Close the file (if memory mapped)."""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+#This is a generator function!
+def ColumnarIterator(handle, alphabet=Alphabet.single_letter_alphabet):
+    """Iterate over the records in a columnar file (as SeqRecord objects).
+
+     - handle - input file, opened in binary mode
+     - alphabet - optional alphabet for the sequences
+    """
+    columns = ColumnarFile(handle, alphabet)
+    try:
+        for record in columns:
+            yield record
+    finally:
+        columns.close()
+
+
+def _integer_typecode(values):
+    """Smallest array typecode which can hold these integers (PRIVATE)."""
+    if not values:
+        return "B"
+    low = min(values)
+    high = max(values)
+    for typecode, minimum, maximum in [("B", 0, 255), ("b", -128, 127),
+                                       ("H", 0, 65535), ("h", -32768, 32767)]:
+        if minimum <= low and high <= maximum:
+            return typecode
+    return "i"
+
+
+def _integer_annotations(record):
+    """Dictionary of the integer per-letter annotations as arrays (PRIVATE)."""
+    letters = {}
+    for key, values in record.letter_annotations.items():
+        if isinstance(values, basestring):
+            continue
+        try:
+            letters[key] = array.array("i", values)
+        except (TypeError, OverflowError):
+            pass
+    return letters
+
+
+class ColumnarWriter(SequenceWriter):
+    """Columnar file writer.
+
+    As the file holds each column in one block, everything is collected in
+    memory and written out at the end (by the write_file method).
+    """
+    def __init__(self, handle):
+        """Creates the writer object.
+
+         - handle - Output handle, in binary write mode.
+        """
+        if hasattr(handle, "mode") and "U" in handle.mode.upper():
+            raise ValueError("Columnar files must NOT be opened in universal "
+                             "new lines mode. Binary mode is required")
+        elif hasattr(handle, "mode") and "B" not in handle.mode.upper():
+            raise ValueError("Columnar files must be opened in binary mode")
+        self.handle = handle
+
+    def write_file(self, records):
+        """Use this to write an entire file containing the given records."""
+        ids = []
+        descriptions = []
+        seqs = []
+        seq_starts = _offset_array()
+        seq_starts.append(0)
+        letters = None
+        for record in records:
+            ids.append(record.id)
+            descriptions.append(_encode(record.description))
+            seqs.append(_as_bytes(self._get_seq_string(record)))
+            seq_starts.append(seq_starts[-1] + len(seqs[-1]))
+            values = _integer_annotations(record)
+            if letters is None:
+                #The first record decides the per-letter annotation columns
+                letters = values
+                continue
+            if set(values) != set(letters):
+                raise ValueError("Record %s has integer per-letter "
+                                 "annotations %s, but the first record has %s"
+                                 % (record.id, ", ".join(sorted(values)),
+                                    ", ".join(sorted(letters))))
+            for key in letters:
+                letters[key].extend(values[key])
+        #This checks the identifiers are unique, and builds the hash table
+        table = _CompactOffsetTable((record_id, i)
+                                    for i, record_id in enumerate(ids))
+        empty = _as_bytes("")
+        columns = [("ids", "B", table._keys),
+                   ("id_starts", "Q", table._starts),
+                   ("descriptions", "B", empty.join(descriptions)),
+                   ("description_starts", "Q", _starts(descriptions)),
+                   ("seqs", "B", empty.join(seqs)),
+                   ("seq_starts", "Q", seq_starts),
+                   ("id_slots", "i", table._slots)]
+        for key in sorted(letters or []):
+            values = letters[key]
+            typecode = _integer_typecode(values)
+            columns.append((_letter_prefix + key, typecode,
+                            array.array(typecode, values)))
+        self._write_columns(len(ids), columns)
+        return len(ids)
+
+    def _write_columns(self, count, columns):
+        """Write the header and the columns (PRIVATE)."""
+        #First work out where everything goes
+        lines = []
+        position = 0
+        for name, typecode, values in columns:
+            size = struct.calcsize("<" + typecode)
+            lines.append((name, typecode, position, len(values)))
+            position = _pad8(position + size * len(values))
+        #The header length depends on the column positions and vice versa,
+        #so allow for the positions to need a few more digits
+        header_length = _pad8(sum(len("%s\t%s\t%i\t%i\n" % line)
+                                  for line in lines) + 20 * len(lines))
+        start = _header.size + header_length
+        text = "".join("%s\t%s\t%i\t%i\n" % (name, typecode, start + position,
+                                             length)
+                       for name, typecode, position, length in lines)
+        handle = self.handle
+        handle.write(_header.pack(_magic, count, header_length))
+        handle.write(_as_bytes(text + "\n" * (header_length - len(text))))
+        position = start
+        for name, typecode, values in columns:
+            _write_column(handle, typecode, values)
+            end = position + struct.calcsize("<" + typecode) * len(values)
+            position = _pad8(end)
+            handle.write(_as_bytes("\x00" * (position - end)))
+
+
+def _encode(text):
+    """Returns a (possibly unicode) string as bytes (PRIVATE)."""
+    if isinstance(text, unicode):
+        return text.encode("utf-8")
+    return _as_bytes(text)
+
+
+def _starts(blocks):
+    """Array of where each string starts when concatenated (PRIVATE)."""
+    starts = _offset_array()
+    starts.append(0)
+    for block in blocks:
+        starts.append(starts[-1] + len(block))
+    return starts
+
+
+def _write_column(handle, typecode, values):
+    """Write bytes, or integers as little endian binary data (PRIVATE)."""
+    if isinstance(values, type(_magic)):
+        handle.write(values)
+    elif isinstance(values, array.array) and sys.byteorder == "little" \
+            and values.itemsize == struct.calcsize("<" + typecode):
+        #Fast path, already in the desired layout
+        handle.write(values.tostring())
+    else:
+        for i in xrange(0, len(values), 65536):
+            chunk = values[i:i + 65536]
+            handle.write(struct.pack("<%i%s" % (len(chunk), typecode),
+                                     *chunk))
+
+
+if __name__ == "__main__":
+    from Bio._utils import run_doctest
+    run_doctest()
@@ -47,40 +47,64 @@ from Bio._py3k import _is_int_or_long
 # However, all the writing code is in this file.
 
 
-def GenBankIterator(handle):
+def GenBankIterator(handle, feature_types=None, feature_qualifiers=None):
     """Breaks up a Genbank file into SeqRecord objects.
 
     Every section from the LOCUS line to the terminating // becomes
     a single SeqRecord with associated annotation and features.
 
+    Optional arguments feature_types (e.g. ["CDS", "tRNA"]) and
+    feature_qualifiers (e.g. ["translation"]) restrict the features to
+    those of the given types, and/or with all the given qualifiers.
+    Other features are skipped without being parsed, which is faster
+    and uses less memory on large annotated genomes.
+
     Note that for genomes or chromosomes, there is typically only
     one record."""
     #This calls a generator function:
-    return GenBankScanner(debug=0).parse_records(handle)
+    return GenBankScanner(debug=0).parse_records(handle,
+                                     feature_types=feature_types,
+                                     feature_qualifiers=feature_qualifiers)
 
 
-def EmblIterator(handle):
+def EmblIterator(handle, feature_types=None, feature_qualifiers=None):
     """Breaks up an EMBL file into SeqRecord objects.
 
     Every section from the LOCUS line to the terminating // becomes
     a single SeqRecord with associated annotation and features.
 
+    Optional arguments feature_types (e.g. ["CDS", "tRNA"]) and
+    feature_qualifiers (e.g. ["translation"]) restrict the features to
+    those of the given types, and/or with all the given qualifiers.
+    Other features are skipped without being parsed, which is faster
+    and uses less memory on large annotated genomes.
+
     Note that for genomes or chromosomes, there is typically only
     one record."""
     #This calls a generator function:
-    return EmblScanner(debug=0).parse_records(handle)
+    return EmblScanner(debug=0).parse_records(handle,
+                                     feature_types=feature_types,
+                                     feature_qualifiers=feature_qualifiers)
 
 
-def ImgtIterator(handle):
+def ImgtIterator(handle, feature_types=None, feature_qualifiers=None):
     """Breaks up an IMGT file into SeqRecord objects.
 
     Every section from the LOCUS line to the terminating // becomes
     a single SeqRecord with associated annotation and features.
 
+    Optional arguments feature_types (e.g. ["CDS", "tRNA"]) and
+    feature_qualifiers (e.g. ["translation"]) restrict the features to
+    those of the given types, and/or with all the given qualifiers.
+    Other features are skipped without being parsed, which is faster
+    and uses less memory on large annotated genomes.
+
     Note that for genomes or chromosomes, there is typically only
     one record."""
     #This calls a generator function:
-    return _ImgtScanner(debug=0).parse_records(handle)
+    return _ImgtScanner(debug=0).parse_records(handle,
+                                     feature_types=feature_types,
+                                     feature_qualifiers=feature_qualifiers)
 
 
 def GenBankCdsFeatureIterator(handle, alphabet=Alphabet.generic_protein):
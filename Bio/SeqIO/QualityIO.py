@@ -364,12 +364,16 @@ are approximately equal.
 """
 __docformat__ = "epytext en"  # Don't just use plain text in epydoc API pages!
 
+from Bio._py3k import _as_bytes, _bytes_to_string
 from Bio.Alphabet import single_letter_alphabet
 from Bio.Seq import Seq, UnknownSeq
 from Bio.SeqRecord import SeqRecord
 from Bio.SeqIO.Interfaces import SequentialSequenceWriter
+from Bio.SeqIO._threads import _ChunkReader
 from math import log
+import itertools
 import warnings
+from StringIO import StringIO
 from Bio import BiopythonWarning, BiopythonParserWarning
 
 
@@ -530,12 +534,135 @@ def _get_phred_quality(record):
     except KeyError:
         pass
     try:
-        return [phred_quality_from_solexa(q) for
-                q in record.letter_annotations["solexa_quality"]]
+        qualities = record.letter_annotations["solexa_quality"]
     except KeyError:
         raise ValueError("No suitable quality scores found in "
                          "letter_annotations of SeqRecord (id=%s)."
                          % record.id)
+    if hasattr(qualities, "dtype") and qualities.dtype.char in "bBhHiIlLqQ":
+        #NumPy integer array, can convert them all in one go
+        import numpy
+        if len(qualities) and qualities.min() < -5:
+            warnings.warn("Solexa quality less than -5 passed, %s"
+                          % repr(qualities.min()), BiopythonWarning)
+        return 10 * numpy.log10(10 ** (qualities / 10.0) + 1)
+    return [phred_quality_from_solexa(q) for q in qualities]
+
+
+def _quality_array_decoder(offset, low, high, signed):
+    """Returns a function turning quality strings into NumPy arrays (PRIVATE).
+
+    This is used by the FASTQ parsers when called with quality_array=True.
+    The scores must be between low and high (after removing the offset),
+    and are returned as signed or unsigned 8 bit integers.
+    """
+    try:
+        import numpy
+    except ImportError:
+        from Bio import MissingPythonDependencyError
+        raise MissingPythonDependencyError("Install NumPy if you want to "
+                                           "use quality_array=True.")
+    if signed:
+        dtype = numpy.int8
+    else:
+        dtype = numpy.uint8
+    shift = numpy.uint8(offset)
+    low += offset
+    high += offset
+
+    def decode(quality_string):
+        letters = numpy.frombuffer(_as_bytes(quality_string), numpy.uint8)
+        if len(letters) and (letters.min() < low or letters.max() > high):
+            raise ValueError("Invalid character in quality string")
+        #Negative Solexa scores wrap round, which the signed view undoes
+        return (letters - shift).view(dtype)
+    return decode
+
+
+#Translation tables for encoding NumPy arrays of scores, built when needed
+_quality_tables = {}
+
+
+def _array_quality_str(qualities, convert, low, high, warning):
+    """Encodes a NumPy array of integer scores as a string (PRIVATE).
+
+     - qualities - the scores, which need not be a NumPy array
+     - convert - function giving the ASCII code for each score
+     - low - smallest score this will encode
+     - high - largest score which can be encoded without truncation
+     - warning - message for the warning given if any are above high
+
+    The conversion of each possible score to a letter is done once and
+    cached as a translation table, so that the whole array can be encoded
+    with a single call to the string translate method. Returns None if the
+    qualities are not an array of 8 bit integers (e.g. a list, or floats)
+    or any are below the low score, in which case the caller must use the
+    general code instead.
+    """
+    try:
+        signed = {"b": True, "B": False}[qualities.dtype.char]
+    except (AttributeError, KeyError):
+        return None
+    if not len(qualities):
+        return ""
+    if qualities.min() < low:
+        return None
+    if qualities.max() > high:
+        warnings.warn(warning, BiopythonWarning)
+    table = _quality_table(convert, signed, low)
+    return _bytes_to_string(qualities.tostring().translate(table))
+
+
+def _quality_table(convert, signed, low):
+    """Returns the cached translation table for encoding 8 bit scores (PRIVATE).
+
+    The table maps each of the 256 possible bytes (read as signed or
+    unsigned 8 bit integers) to the letter for that score, using the
+    convert function. Scores below low are mapped to chr(0), so the caller
+    must check the minimum score first.
+    """
+    key = (convert, signed)
+    try:
+        return _quality_tables[key]
+    except KeyError:
+        pass
+    letters = []
+    for byte in range(256):
+        if signed and byte > 127:
+            score = byte - 256
+        else:
+            score = byte
+        if score < low:
+            #Never used, as we check the minimum
+            letters.append(chr(0))
+        else:
+            letters.append(chr(min(126, convert(score))))
+    table = _quality_tables[key] = _as_bytes("".join(letters))
+    return table
+
+
+def _phred_to_sanger(qp):
+    return int(round(qp)) + SANGER_SCORE_OFFSET
+
+
+def _solexa_to_sanger(qs):
+    return int(round(phred_quality_from_solexa(qs))) + SANGER_SCORE_OFFSET
+
+
+def _phred_to_illumina(qp):
+    return int(round(qp)) + SOLEXA_SCORE_OFFSET
+
+
+def _solexa_to_illumina(qs):
+    return int(round(phred_quality_from_solexa(qs))) + SOLEXA_SCORE_OFFSET
+
+
+def _solexa_to_solexa(qs):
+    return int(round(qs)) + SOLEXA_SCORE_OFFSET
+
+
+def _phred_to_solexa(qp):
+    return int(round(solexa_quality_from_phred(qp))) + SOLEXA_SCORE_OFFSET
 
 #Only map 0 to 93, we need to give a warning on truncating at 93
 _phred_to_sanger_quality_str = dict((qp, chr(min(126, qp + SANGER_SCORE_OFFSET)))
@@ -616,6 +743,12 @@ def _get_sanger_quality_str(record):
         #Fall back on solexa scores...
         pass
     else:
+        #NumPy arrays can be done with a single translate:
+        answer = _array_quality_str(qualities, _phred_to_sanger, 0, 93,
+                                    "Data loss - max PHRED quality 93 "
+                                    "in Sanger FASTQ")
+        if answer is not None:
+            return answer
         #Try and use the precomputed mapping:
         try:
             return "".join([_phred_to_sanger_quality_str[qp]
@@ -638,6 +771,12 @@ def _get_sanger_quality_str(record):
         raise ValueError("No suitable quality scores found in "
                          "letter_annotations of SeqRecord (id=%s)."
                          % record.id)
+    #NumPy arrays can be done with a single translate:
+    answer = _array_quality_str(qualities, _solexa_to_sanger, -5, 93,
+                                "Data loss - max PHRED quality 93 "
+                                "in Sanger FASTQ")
+    if answer is not None:
+        return answer
     #Try and use the precomputed mapping:
     try:
         return "".join([_solexa_to_sanger_quality_str[qs]
@@ -684,6 +823,12 @@ def _get_illumina_quality_str(record):
         #Fall back on solexa scores...
         pass
     else:
+        #NumPy arrays can be done with a single translate:
+        answer = _array_quality_str(qualities, _phred_to_illumina, 0, 62,
+                                    "Data loss - max PHRED quality 62 "
+                                    "in Illumina FASTQ")
+        if answer is not None:
+            return answer
         #Try and use the precomputed mapping:
         try:
             return "".join([_phred_to_illumina_quality_str[qp]
@@ -706,6 +851,12 @@ def _get_illumina_quality_str(record):
         raise ValueError("No suitable quality scores found in "
                          "letter_annotations of SeqRecord (id=%s)."
                          % record.id)
+    #NumPy arrays can be done with a single translate:
+    answer = _array_quality_str(qualities, _solexa_to_illumina, -5, 62,
+                                "Data loss - max PHRED quality 62 "
+                                "in Illumina FASTQ")
+    if answer is not None:
+        return answer
     #Try and use the precomputed mapping:
     try:
         return "".join([_solexa_to_illumina_quality_str[qs]
@@ -753,6 +904,12 @@ def _get_solexa_quality_str(record):
         #Fall back on PHRED scores...
         pass
     else:
+        #NumPy arrays can be done with a single translate:
+        answer = _array_quality_str(qualities, _solexa_to_solexa, -5, 62,
+                                    "Data loss - max Solexa quality 62 "
+                                    "in Solexa FASTQ")
+        if answer is not None:
+            return answer
         #Try and use the precomputed mapping:
         try:
             return "".join([_solexa_to_solexa_quality_str[qs]
@@ -775,6 +932,12 @@ def _get_solexa_quality_str(record):
         raise ValueError("No suitable quality scores found in "
                          "letter_annotations of SeqRecord (id=%s)."
                          % record.id)
+    #NumPy arrays can be done with a single translate:
+    answer = _array_quality_str(qualities, _phred_to_solexa, 0, 62,
+                                "Data loss - max Solexa quality 62 "
+                                "in Solexa FASTQ")
+    if answer is not None:
+        return answer
     #Try and use the precomputed mapping:
     try:
         return "".join([_phred_to_solexa_quality_str[qp]
@@ -958,7 +1121,481 @@ def FastqGeneralIterator(handle):
     raise StopIteration
 
 
-def FastqPhredIterator(handle, alphabet=single_letter_alphabet, title2ids=None):
+class FastqBatch(object):
+    """A batch of FASTQ reads held as columns of NumPy arrays.
+
+    These are returned by FastqBatchIterator. Rather than a SeqRecord (or
+    a tuple of strings) for each read, all the sequences in the batch are
+    held as one array of ASCII codes, all the quality scores as one array
+    of integers, and all the titles as one array of ASCII codes:
+
+     - seq_bytes - uint8 array of all the sequence letters
+     - qualities - array of all the quality scores, uint8 for PHRED scores
+                   or int8 for Solexa scores (which can be negative)
+     - offsets - int64 array giving where each read starts in seq_bytes
+                 and qualities, with an extra final entry for the end
+     - title_bytes - uint8 array of all the title lines (without the "@")
+     - title_offsets - int64 array giving where each title starts, again
+                       with an extra final entry
+
+    For convenience the title, seq and qual methods give you the values for
+    a single read, and the lengths method all the read lengths.
+    """
+    def __init__(self, seq_bytes, qualities, offsets, title_bytes,
+                 title_offsets):
+        self.seq_bytes = seq_bytes
+        self.qualities = qualities
+        self.offsets = offsets
+        self.title_bytes = title_bytes
+        self.title_offsets = title_offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __repr__(self):
+        return "<%s with %i reads>" % (self.__class__.__name__, len(self))
+
+    def lengths(self):
+        """Returns an array of the read lengths."""
+        return self.offsets[1:] - self.offsets[:-1]
+
+    def title(self, index):
+        """Returns the title line of this read as a string."""
+        start, end = self.title_offsets[index:index + 2]
+        return _bytes_to_string(self.title_bytes[start:end].tostring())
+
+    def seq(self, index):
+        """Returns the sequence of this read as a string."""
+        start, end = self.offsets[index:index + 2]
+        return _bytes_to_string(self.seq_bytes[start:end].tostring())
+
+    def qual(self, index):
+        """Returns the quality scores of this read (as an array view)."""
+        start, end = self.offsets[index:index + 2]
+        return self.qualities[start:end]
+
+    def subset(self, keep, starts=None, ends=None):
+        """Returns a new batch with the selected (and optionally trimmed) reads.
+
+         - keep - boolean array with an entry for each read, or an array
+                  of the indices of the reads wanted
+         - starts - optional array with an entry for each read, giving
+                    where the trimmed read starts (within the read)
+         - ends - optional array with an entry for each read, giving
+                  where the trimmed read ends (within the read)
+
+        The sequences, qualities and titles are copied into new arrays.
+        """
+        import numpy
+        keep = numpy.asarray(keep)
+        if keep.dtype == numpy.bool_:
+            keep = numpy.flatnonzero(keep)
+        lengths = self.lengths()
+        if starts is None:
+            starts = numpy.zeros(len(self), numpy.int64)
+        if ends is None:
+            ends = lengths
+        starts = numpy.asarray(starts, numpy.int64)[keep]
+        ends = numpy.asarray(ends, numpy.int64)[keep]
+        if (starts < 0).any() or (ends > lengths[keep]).any() \
+                or (starts > ends).any():
+            raise ValueError("Trimmed reads must be within the reads")
+        where = _slice_positions(numpy, self.offsets[keep] + starts,
+                                 ends - starts)
+        offsets = numpy.zeros(len(keep) + 1, numpy.int64)
+        numpy.cumsum(ends - starts, out=offsets[1:])
+        title_lengths = self.title_offsets[1:] - self.title_offsets[:-1]
+        title_where = _slice_positions(numpy, self.title_offsets[keep],
+                                       title_lengths[keep])
+        title_offsets = numpy.zeros(len(keep) + 1, numpy.int64)
+        numpy.cumsum(title_lengths[keep], out=title_offsets[1:])
+        return self.__class__(self.seq_bytes[where], self.qualities[where],
+                              offsets, self.title_bytes[title_where],
+                              title_offsets)
+
+    def write(self, handle, variant="sanger"):
+        """Write the reads to a handle as FASTQ, returns the number of reads.
+
+         - handle - output file
+         - variant - "sanger" (default), "solexa" or "illumina", how to
+                     encode the quality scores (as in FastqBatchIterator)
+
+        The qualities are converted as needed, so a batch of Solexa scores
+        can be written as Sanger FASTQ for example, with the same warnings
+        as the FastqPhredWriter etc. if any scores have to be truncated.
+        All the reads are formatted into a single string using NumPy, with
+        no SeqRecord objects, and written with one call.
+        """
+        import numpy
+        signed = self.qualities.dtype == numpy.int8
+        try:
+            convert, low, high, warning = _batch_encodings[variant, signed]
+        except KeyError:
+            raise ValueError("Unknown FASTQ variant %r" % variant)
+        count = len(self)
+        if not count:
+            return 0
+        if len(self.qualities) and self.qualities.min() < low:
+            raise ValueError("Quality score below %i in FASTQ batch" % low)
+        if len(self.qualities) and self.qualities.max() > high:
+            warnings.warn(warning, BiopythonWarning)
+        table = numpy.frombuffer(_quality_table(convert, signed, low),
+                                 numpy.uint8)
+        lengths = self.lengths()
+        title_lengths = self.title_offsets[1:] - self.title_offsets[:-1]
+        #Each record is @title\nseq\n+\nqual\n
+        record_starts = numpy.zeros(count + 1, numpy.int64)
+        numpy.cumsum(title_lengths + 2 * lengths + 6, out=record_starts[1:])
+        seq_starts = record_starts[:-1] + title_lengths + 2
+        qual_starts = seq_starts + lengths + 3
+        data = numpy.empty(record_starts[-1], numpy.uint8)
+        data[record_starts[:-1]] = 64
+        data[_slice_positions(numpy, record_starts[:-1] + 1,
+                              title_lengths)] = self.title_bytes
+        data[seq_starts - 1] = 10
+        data[_slice_positions(numpy, seq_starts, lengths)] = self.seq_bytes
+        data[seq_starts + lengths] = 10
+        data[seq_starts + lengths + 1] = 43
+        data[seq_starts + lengths + 2] = 10
+        data[_slice_positions(numpy, qual_starts, lengths)] = \
+            table[self.qualities.view(numpy.uint8)]
+        data[qual_starts + lengths] = 10
+        handle.write(_bytes_to_string(data.tostring()))
+        return count
+
+
+#Quality encoding used by FastqBatch.write, depending on the output variant
+#and if the batch holds PHRED scores (unsigned) or Solexa scores (signed):
+_batch_encodings = {
+    ("sanger", False): (_phred_to_sanger, 0, 93,
+                        "Data loss - max PHRED quality 93 in Sanger FASTQ"),
+    ("sanger", True): (_solexa_to_sanger, -5, 93,
+                       "Data loss - max PHRED quality 93 in Sanger FASTQ"),
+    ("illumina", False): (_phred_to_illumina, 0, 62,
+                          "Data loss - max PHRED quality 62 in Illumina FASTQ"),
+    ("illumina", True): (_solexa_to_illumina, -5, 62,
+                         "Data loss - max PHRED quality 62 in Illumina FASTQ"),
+    ("solexa", False): (_phred_to_solexa, 0, 62,
+                        "Data loss - max Solexa quality 62 in Solexa FASTQ"),
+    ("solexa", True): (_solexa_to_solexa, -5, 62,
+                       "Data loss - max Solexa quality 62 in Solexa FASTQ"),
+    }
+
+
+def _slice_positions(numpy, starts, lengths):
+    """Array of all the positions in the slices with these starts and lengths (PRIVATE).
+
+    The slices may touch or be in any order, the positions are given slice
+    by slice. Used to gather or scatter the reads in a FastqBatch.
+    """
+    offsets = numpy.zeros(len(lengths), numpy.int64)
+    numpy.cumsum(lengths[:-1], out=offsets[1:])
+    return numpy.repeat(starts - offsets, lengths) \
+        + numpy.arange(offsets[-1] + lengths[-1] if len(lengths) else 0)
+
+
+class _PrefixedHandle(object):
+    """Gives lines from a string, then from a handle (PRIVATE).
+
+    Used to fall back on FastqGeneralIterator for data already read.
+    The string may end part way through a line.
+    """
+    def __init__(self, prefix, handle):
+        self._prefix = StringIO(prefix)
+        self._handle = handle
+
+    def readline(self):
+        line = self._prefix.readline()
+        if not line.endswith("\n"):
+            line += self._handle.readline()
+        return line
+
+
+def _gather(numpy, data, starts, lengths):
+    """Join the slices of data (an array) with these starts and lengths (PRIVATE).
+
+    Returns the joined array, and the offsets of the slices within it
+    (with an extra final entry for the total length).
+    """
+    offsets = numpy.zeros(len(lengths) + 1, numpy.int64)
+    numpy.cumsum(lengths, out=offsets[1:])
+    #Flag the start and end of each (non-empty) slice, the running XOR is
+    #then true within the slices and false elsewhere (they don't overlap,
+    #or touch as there is at least a new line character between them)
+    wanted = lengths > 0
+    starts = starts[wanted]
+    mask = numpy.zeros(len(data) + 1, numpy.bool_)
+    mask[starts] = True
+    mask[starts + lengths[wanted]] = True
+    mask = numpy.logical_xor.accumulate(mask)
+    return data[mask[:-1]], offsets
+
+
+def _fastq_batch_columns(numpy, data, count):
+    """Parse count four line FASTQ records from a string (PRIVATE).
+
+    Returns a tuple of the sequence bytes, raw quality bytes, offsets,
+    title bytes, title offsets, and how much of the string was used.
+    Returns None if the data does not look like simple four line FASTQ
+    records (e.g. line wrapping, trailing white space, or errors) in which
+    case the caller should use FastqGeneralIterator instead.
+    """
+    data = numpy.frombuffer(data, numpy.uint8)
+    ends = numpy.flatnonzero(data == 10)[:4 * count]
+    if len(ends) != 4 * count:
+        return None
+    used = ends[-1] + 1
+    starts = numpy.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    #Remove any \r from Windows style new lines
+    ends = ends - ((ends > starts) & (data[ends - 1] == 13))
+    if ((ends > starts) & ((data[ends - 1] == 32) |
+                           (data[ends - 1] == 9))).any():
+        #Trailing white space, which FastqGeneralIterator would remove
+        return None
+    starts = starts.reshape(count, 4)
+    ends = ends.reshape(count, 4)
+    lengths = ends - starts
+    if (lengths[:, 0] == 0).any() or (lengths[:, 2] == 0).any() \
+            or (data[starts[:, 0]] != 64).any() \
+            or (data[starts[:, 2]] != 43).any() \
+            or (lengths[:, 1] != lengths[:, 3]).any():
+        return None
+    #Any title on the + lines must match the @ lines
+    repeated = numpy.flatnonzero(lengths[:, 2] > 1)
+    if len(repeated):
+        if (lengths[repeated, 0] != lengths[repeated, 2]).any():
+            return None
+        first = _gather(numpy, data, starts[repeated, 0] + 1,
+                        lengths[repeated, 0] - 1)[0]
+        second = _gather(numpy, data, starts[repeated, 2] + 1,
+                         lengths[repeated, 2] - 1)[0]
+        if (first != second).any():
+            return None
+    seq_bytes, offsets = _gather(numpy, data, starts[:, 1], lengths[:, 1])
+    if ((seq_bytes == 32) | (seq_bytes == 9)).any():
+        return None
+    qual_bytes = _gather(numpy, data, starts[:, 3], lengths[:, 3])[0]
+    title_bytes, title_offsets = _gather(numpy, data, starts[:, 0] + 1,
+                                         lengths[:, 0] - 1)
+    return seq_bytes, qual_bytes, offsets, title_bytes, title_offsets, used
+
+
+def _fastq_batch_from_tuples(numpy, records):
+    """Columns for a list of (title, seq, qual) string tuples (PRIVATE)."""
+    offsets = numpy.zeros(len(records) + 1, numpy.int64)
+    offsets[1:] = numpy.cumsum([len(seq) for title, seq, qual in records])
+    title_offsets = numpy.zeros(len(records) + 1, numpy.int64)
+    title_offsets[1:] = numpy.cumsum([len(title) for title, seq, qual
+                                      in records])
+    seq_bytes = numpy.frombuffer(
+        _as_bytes("".join([seq for title, seq, qual in records])),
+        numpy.uint8)
+    qual_bytes = numpy.frombuffer(
+        _as_bytes("".join([qual for title, seq, qual in records])),
+        numpy.uint8)
+    title_bytes = numpy.frombuffer(
+        _as_bytes("".join([title for title, seq, qual in records])),
+        numpy.uint8)
+    return seq_bytes, qual_bytes, offsets, title_bytes, title_offsets
+
+
+def FastqBatchIterator(handle, batch_size=10000, variant="sanger"):
+    """Iterate over FASTQ reads in batches held as NumPy arrays.
+
+     - handle - input file
+     - batch_size - the number of reads in each batch (except perhaps
+                    the last batch, which may be smaller)
+     - variant - "sanger" (default), "solexa" or "illumina", how the
+                 quality scores are encoded (as in the file formats
+                 "fastq-sanger", "fastq-solexa" and "fastq-illumina")
+
+    This returns FastqBatch objects, where the sequences, qualities and
+    titles for all the reads in the batch are held in arrays. This avoids
+    creating a SeqRecord (and a list of integer quality scores) for each
+    read, and the quality letters are decoded in a single step for each
+    batch. For Sanger or Illumina 1.3+ FASTQ files, the qualities are PHRED
+    scores (as unsigned 8 bit integers), while for old Solexa files they
+    are Solexa scores (as signed 8 bit integers, as they can be negative).
+
+    Simple four line FASTQ files are parsed using NumPy directly. Anything
+    else (e.g. line wrapped files, or files with errors) is handled using
+    FastqGeneralIterator instead, so the same errors are raised.
+
+    This requires NumPy, so this example is not run as a doctest:
+
+        handle = open("Quality/example.fastq", "rU")
+        for batch in FastqBatchIterator(handle, batch_size=2):
+            print len(batch), list(batch.lengths())
+            print batch.title(0)
+            print batch.seq(0)
+        handle.close()
+
+    Giving:
+
+        2 [25, 25]
+        EAS54_6_R1_2_1_413_324
+        CCCTTCTTGTCTTCAGCGTTTCTCC
+        1 [25]
+        EAS54_6_R1_2_1_443_348
+        GTTGCTTCTGGCGTGGGTGGGGGGG
+    """
+    try:
+        import numpy
+    except ImportError:
+        from Bio import MissingPythonDependencyError
+        raise MissingPythonDependencyError("Install NumPy if you want to "
+                                           "use FastqBatchIterator.")
+    if batch_size < 1:
+        raise ValueError("Batch size should be at least one")
+    try:
+        offset, low, high, dtype = {
+            "sanger": (SANGER_SCORE_OFFSET, 0, 93, numpy.uint8),
+            "solexa": (SOLEXA_SCORE_OFFSET, -5, 62, numpy.int8),
+            "illumina": (SOLEXA_SCORE_OFFSET, 0, 62, numpy.uint8),
+            }[variant]
+    except KeyError:
+        raise ValueError("Unknown FASTQ variant %r" % variant)
+
+    def make_batch(seq_bytes, qual_bytes, offsets, title_bytes,
+                   title_offsets):
+        qualities = qual_bytes.astype(numpy.int16) - offset
+        if len(qualities) and (qualities.min() < low or
+                               qualities.max() > high):
+            raise ValueError("Invalid character in quality string")
+        return FastqBatch(seq_bytes, qualities.astype(dtype), offsets,
+                          title_bytes, title_offsets)
+
+    pieces = []
+    lines = 0
+    eof = False
+    while True:
+        #Read in enough lines for the next batch (if simple FASTQ)
+        while lines < 4 * batch_size and not eof:
+            data = handle.read(1048576)
+            if not data:
+                eof = True
+            else:
+                pieces.append(data)
+                lines += data.count("\n")
+        data = "".join(pieces)
+        if not data or (eof and not data.strip()):
+            return
+        if eof and not data.endswith("\n"):
+            data += "\n"
+            lines += 1
+        count = min(batch_size, lines // 4)
+        columns = count and _fastq_batch_columns(numpy, _as_bytes(data), count)
+        if not columns:
+            break
+        yield make_batch(*columns[:5])
+        used = columns[5]
+        pieces = [data[used:]]
+        lines -= 4 * count
+
+    #Not simple four line FASTQ, or there is a problem. Use the full parser:
+    records = FastqGeneralIterator(_PrefixedHandle(data, handle))
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            break
+        yield make_batch(*_fastq_batch_from_tuples(numpy, batch))
+
+
+def trim_fastq_batch(batch, window_size=None, min_quality=20, min_length=0,
+                     max_expected_errors=None, max_n=None):
+    """Quality trim and filter the reads in a FastqBatch.
+
+     - batch - a FastqBatch, e.g. from FastqBatchIterator
+     - window_size - optional sliding window size for quality trimming
+     - min_quality - the minimum mean PHRED quality within each window
+     - min_length - the minimum length of a read (after trimming)
+     - max_expected_errors - optional maximum expected number of errors in
+                             a read (after trimming), the sum of the error
+                             probabilities given by the quality scores
+     - max_n - optional maximum number of N characters in a read (after
+               trimming)
+
+    Returns a new FastqBatch with just the reads passing the filters (which
+    may be empty). If a window size is given, each read is cut at the start
+    of the first window (scanning from the start of the read) where the mean
+    quality is below the minimum. Reads shorter than the window size are not
+    trimmed. Solexa scores (in batches from "solexa" variant files) are
+    converted to PHRED scores for the window and expected error calculations.
+
+    All the calculations are done over the whole batch at once with NumPy,
+    using cumulative sums over the batch's concatenated quality scores.
+    """
+    import numpy
+    count = len(batch)
+    offsets = batch.offsets
+    lengths = batch.lengths()
+    if batch.qualities.dtype == numpy.int8:
+        #Solexa scores, can be negative
+        phred = 10 * numpy.log10(10 ** (batch.qualities / 10.0) + 1)
+    else:
+        phred = batch.qualities
+    ends = lengths
+    if window_size:
+        if window_size < 1:
+            raise ValueError("Window size should be at least one")
+        totals = numpy.zeros(len(phred) + 1, numpy.float64)
+        numpy.cumsum(phred, out=totals[1:])
+        #The window starting at each position, if it fits within its read
+        starts = numpy.arange(len(phred) - window_size + 1)
+        read_ends = numpy.repeat(offsets[1:], lengths)[:len(starts)]
+        sums = totals[starts + window_size] - totals[starts]
+        bad = starts[(starts + window_size <= read_ends) &
+                     (sums < min_quality * window_size)]
+        #Find the first bad window (if any) in each read, using the end of
+        #the batch as a sentinel for reads with no bad windows
+        bad = numpy.append(bad, len(phred))
+        cut = bad[numpy.searchsorted(bad, offsets[:-1])]
+        ends = numpy.where(cut < offsets[1:], cut - offsets[:-1], lengths)
+    keep = ends >= min_length
+    if max_expected_errors is not None:
+        totals = numpy.zeros(len(phred) + 1, numpy.float64)
+        numpy.cumsum(10 ** (phred / -10.0), out=totals[1:])
+        errors = totals[offsets[:-1] + ends] - totals[offsets[:-1]]
+        keep &= errors <= max_expected_errors
+    if max_n is not None:
+        totals = numpy.zeros(len(batch.seq_bytes) + 1, numpy.int64)
+        numpy.cumsum((batch.seq_bytes == 78) | (batch.seq_bytes == 110),
+                     out=totals[1:])
+        keep &= totals[offsets[:-1] + ends] - totals[offsets[:-1]] <= max_n
+    if keep.all() and (ends == lengths).all():
+        return batch
+    return batch.subset(keep, numpy.zeros(count, numpy.int64), ends)
+
+
+def trim_fastq(in_handle, out_handle, variant="sanger", batch_size=10000,
+               **kwargs):
+    """Quality trim and filter a FASTQ file, returns the read counts.
+
+     - in_handle - input FASTQ file
+     - out_handle - output FASTQ file
+     - variant - "sanger" (default), "solexa" or "illumina", how the
+                 quality scores are encoded in both files
+     - batch_size - number of reads to process at once
+     - kwargs - the trimming and filtering options for trim_fastq_batch
+
+    The input is read with FastqBatchIterator, trimmed and filtered a batch
+    at a time with trim_fastq_batch, and written out again using the
+    FastqBatch write method, so no SeqRecord objects are created and only
+    one batch is held in memory. Returns a tuple of the number of reads
+    read and the number written. This requires NumPy.
+    """
+    count = 0
+    kept = 0
+    for batch in FastqBatchIterator(in_handle, batch_size, variant):
+        count += len(batch)
+        kept += trim_fastq_batch(batch, **kwargs).write(out_handle, variant)
+    return count, kept
+
+
+def FastqPhredIterator(handle, alphabet=single_letter_alphabet, title2ids=None,
+                       quality_array=False):
     """Generator function to iterate over FASTQ records (as SeqRecord objects).
 
      - handle - input file
@@ -969,6 +1606,8 @@ def FastqPhredIterator(handle, alphabet=single_letter_alphabet, title2ids=None):
                    strings.  If this is not given, then the entire title line
                    will be used as the description, and the first word as the
                    id and name.
+     - quality_array - If True, the qualities are held as a NumPy array of
+                   8 bit integers rather than as a list (requires NumPy).
 
     Note that use of title2ids matches that of Bio.SeqIO.FastaIO.
 
@@ -1023,6 +1662,23 @@ def FastqPhredIterator(handle, alphabet=single_letter_alphabet, title2ids=None):
     >>> print record.letter_annotations["phred_quality"]
     [26, 26, 26, 26, 26, 26, 26, 26, 26, 26, 26, 24, 26, 22, 26, 26, 13, 22, 26, 18, 24, 18, 18, 18, 18]
 
+    For large files, holding each record's qualities as a NumPy array of
+    unsigned 8 bit integers takes about an eighth of the memory of a list.
+    Slicing the record then gives a view of the array rather than a copy,
+    and writing the record out as FASTQ is also faster. This requires NumPy,
+    so this example is not run as a doctest:
+
+        handle = open("Quality/example.fastq", "rU")
+        for record in FastqPhredIterator(handle, quality_array=True):
+            print record.id, record.letter_annotations["phred_quality"].dtype
+        handle.close()
+
+    Giving:
+
+        EAS54_6_R1_2_1_413_324 uint8
+        EAS54_6_R1_2_1_540_792 uint8
+        EAS54_6_R1_2_1_443_348 uint8
+
     """
     assert SANGER_SCORE_OFFSET == ord("!")
     #Originally, I used a list expression for each record:
@@ -1033,6 +1689,8 @@ def FastqPhredIterator(handle, alphabet=single_letter_alphabet, title2ids=None):
     q_mapping = dict()
     for letter in range(0, 255):
         q_mapping[chr(letter)] = letter - SANGER_SCORE_OFFSET
+    if quality_array:
+        decode = _quality_array_decoder(SANGER_SCORE_OFFSET, 0, 93, False)
     for title_line, seq_string, quality_string in FastqGeneralIterator(handle):
         if title2ids:
             id, name, descr = title2ids(title_line)
@@ -1042,9 +1700,12 @@ def FastqPhredIterator(handle, alphabet=single_letter_alphabet, title2ids=None):
             name = id
         record = SeqRecord(Seq(seq_string, alphabet),
                            id=id, name=name, description=descr)
-        qualities = [q_mapping[letter] for letter in quality_string]
-        if qualities and (min(qualities) < 0 or max(qualities) > 93):
-            raise ValueError("Invalid character in quality string")
+        if quality_array:
+            qualities = decode(quality_string)
+        else:
+            qualities = [q_mapping[letter] for letter in quality_string]
+            if qualities and (min(qualities) < 0 or max(qualities) > 93):
+                raise ValueError("Invalid character in quality string")
         #For speed, will now use a dirty trick to speed up assigning the
         #qualities. We do this to bypass the length check imposed by the
         #per-letter-annotations restricted dict (as this has already been
@@ -1055,7 +1716,8 @@ def FastqPhredIterator(handle, alphabet=single_letter_alphabet, title2ids=None):
         yield record
 
 
-def FastqSolexaIterator(handle, alphabet=single_letter_alphabet, title2ids=None):
+def FastqSolexaIterator(handle, alphabet=single_letter_alphabet, title2ids=None,
+                        quality_array=False):
     r"""Parsing old Solexa/Illumina FASTQ like files (which differ in the quality mapping).
 
     The optional arguments are the same as those for the FastqPhredIterator.
@@ -1195,6 +1857,8 @@ def FastqSolexaIterator(handle, alphabet=single_letter_alphabet, title2ids=None)
     q_mapping = dict()
     for letter in range(0, 255):
         q_mapping[chr(letter)] = letter - SOLEXA_SCORE_OFFSET
+    if quality_array:
+        decode = _quality_array_decoder(SOLEXA_SCORE_OFFSET, -5, 62, True)
     for title_line, seq_string, quality_string in FastqGeneralIterator(handle):
         if title2ids:
             id, name, descr = title_line
@@ -1204,10 +1868,13 @@ def FastqSolexaIterator(handle, alphabet=single_letter_alphabet, title2ids=None)
             name = id
         record = SeqRecord(Seq(seq_string, alphabet),
                            id=id, name=name, description=descr)
-        qualities = [q_mapping[letter] for letter in quality_string]
+        if quality_array:
+            qualities = decode(quality_string)
+        else:
+            qualities = [q_mapping[letter] for letter in quality_string]
+            if qualities and (min(qualities) < -5 or max(qualities) > 62):
+                raise ValueError("Invalid character in quality string")
         #DO NOT convert these into PHRED qualities automatically!
-        if qualities and (min(qualities) < -5 or max(qualities) > 62):
-            raise ValueError("Invalid character in quality string")
         #Dirty trick to speed up this line:
         #record.letter_annotations["solexa_quality"] = qualities
         dict.__setitem__(record._per_letter_annotations,
@@ -1215,7 +1882,8 @@ def FastqSolexaIterator(handle, alphabet=single_letter_alphabet, title2ids=None)
         yield record
 
 
-def FastqIlluminaIterator(handle, alphabet=single_letter_alphabet, title2ids=None):
+def FastqIlluminaIterator(handle, alphabet=single_letter_alphabet, title2ids=None,
+                          quality_array=False):
     """Parse Illumina 1.3 to 1.7 FASTQ like files (which differ in the quality mapping).
 
     The optional arguments are the same as those for the FastqPhredIterator.
@@ -1247,6 +1915,8 @@ def FastqIlluminaIterator(handle, alphabet=single_letter_alphabet, title2ids=Non
     q_mapping = dict()
     for letter in range(0, 255):
         q_mapping[chr(letter)] = letter - SOLEXA_SCORE_OFFSET
+    if quality_array:
+        decode = _quality_array_decoder(SOLEXA_SCORE_OFFSET, 0, 62, False)
     for title_line, seq_string, quality_string in FastqGeneralIterator(handle):
         if title2ids:
             id, name, descr = title2ids(title_line)
@@ -1256,9 +1926,12 @@ def FastqIlluminaIterator(handle, alphabet=single_letter_alphabet, title2ids=Non
             name = id
         record = SeqRecord(Seq(seq_string, alphabet),
                            id=id, name=name, description=descr)
-        qualities = [q_mapping[letter] for letter in quality_string]
-        if qualities and (min(qualities) < 0 or max(qualities) > 62):
-            raise ValueError("Invalid character in quality string")
+        if quality_array:
+            qualities = decode(quality_string)
+        else:
+            qualities = [q_mapping[letter] for letter in quality_string]
+            if qualities and (min(qualities) < 0 or max(qualities) > 62):
+                raise ValueError("Invalid character in quality string")
         #Dirty trick to speed up this line:
         #record.letter_annotations["phred_quality"] = qualities
         dict.__setitem__(record._per_letter_annotations,
@@ -1808,6 +2481,213 @@ def PairedFastaQualIterator(fasta_handle, qual_handle, alphabet=single_letter_al
     #Done
 
 
+def _open_fastq(filename):
+    """Open a plain, gzip or BGZF compressed FASTQ file for reading (PRIVATE)."""
+    handle = open(filename, "rb")
+    magic = handle.read(4)
+    handle.close()
+    if magic == _as_bytes("\x1f\x8b\x08\x04"):
+        from Bio import bgzf
+        return bgzf.BgzfReader(filename, "r")
+    elif magic[:2] == _as_bytes("\x1f\x8b"):
+        import gzip
+        return gzip.open(filename, "r")
+    else:
+        return open(filename, "rU")
+
+
+def _mate_name(title):
+    """Returns the first word of a FASTQ title, without any /1 or /2 (PRIVATE)."""
+    words = title.split(None, 1)
+    if not words:
+        return ""
+    name = words[0]
+    if name[-2:] in ("/1", "/2"):
+        return name[:-2]
+    return name
+
+
+def _batch_mate_names(numpy, batch):
+    """Returns the start and end of each read's mate name in a batch (PRIVATE).
+
+    Like _mate_name, the names are the first word of each title without
+    any trailing /1 or /2, as offsets into the batch's title_bytes.
+    """
+    starts = batch.title_offsets[:-1]
+    title_bytes = batch.title_bytes
+    spaces = numpy.flatnonzero((title_bytes == 32) | (title_bytes == 9))
+    spaces = numpy.append(spaces, len(title_bytes))
+    ends = numpy.minimum(spaces[numpy.searchsorted(spaces, starts)],
+                         batch.title_offsets[1:])
+    #Look for /1 or /2 on the end, using a padded copy for short names
+    padded = numpy.append(title_bytes, numpy.zeros(2, numpy.uint8))
+    suffix = (ends - starts >= 2) & (padded[ends - 2] == 47) \
+        & ((padded[ends - 1] == 49) | (padded[ends - 1] == 50))
+    return starts, ends - 2 * suffix
+
+
+def _check_mate_batches(numpy, batch1, batch2):
+    """Checks the mate names in two FastqBatch objects agree (PRIVATE)."""
+    starts1, ends1 = _batch_mate_names(numpy, batch1)
+    starts2, ends2 = _batch_mate_names(numpy, batch2)
+    lengths = ends1 - starts1
+    bad = lengths != ends2 - starts2
+    if not bad.any():
+        names1 = batch1.title_bytes[_slice_positions(numpy, starts1, lengths)]
+        names2 = batch2.title_bytes[_slice_positions(numpy, starts2, lengths)]
+        if (names1 == names2).all():
+            return
+    #Report the first mismatch
+    for i in range(len(batch1)):
+        name1 = _mate_name(batch1.title(i))
+        name2 = _mate_name(batch2.title(i))
+        if name1 != name2:
+            raise ValueError("Paired reads do not match (%s vs %s)."
+                             % (name1, name2))
+
+
+def PairedFastqIterator(handle1, handle2, variant="sanger", batch_size=1000,
+                        batches=False, check_names=True, queue_size=4):
+    """Iterate over paired end reads from two FASTQ files in lockstep.
+
+     - handle1 - input file for the first read of each pair (e.g. R1),
+                 either a handle or a filename
+     - handle2 - input file for the second read of each pair (e.g. R2),
+                 either a handle or a filename
+     - variant - "sanger" (default), "solexa" or "illumina", used for the
+                 quality scores when batches=True
+     - batch_size - number of reads from each file to handle at once
+     - batches - if True, returns pairs of FastqBatch objects (from the
+                 FastqBatchIterator, which requires NumPy), otherwise pairs
+                 of (title, sequence, quality) string tuples as from the
+                 FastqGeneralIterator (default)
+     - check_names - if True (default), checks the names of each pair of
+                     reads match, i.e. the first word of the titles ignoring
+                     any trailing /1 and /2
+     - queue_size - number of batches each background thread can read ahead
+
+    If given filenames, the files are opened here, and can be plain text,
+    gzip or BGZF compressed. Each file is read (including decompression) and
+    parsed in its own background thread, which hands batches of reads to
+    the main thread. The names are then checked a batch at a time, and a
+    ValueError is raised if they disagree, or if one file has more reads
+    than the other.
+
+    For example,
+
+    >>> for (title1, seq1, qual1), (title2, seq2, qual2) in PairedFastqIterator(
+    ...         "Quality/example.fastq", "Quality/example.fastq.gz"):
+    ...     print title1, seq1 == seq2
+    EAS54_6_R1_2_1_413_324 True
+    EAS54_6_R1_2_1_540_792 True
+    EAS54_6_R1_2_1_443_348 True
+
+    """
+    if batch_size < 1:
+        raise ValueError("Batch size should be at least one")
+    handles = []
+    readers = []
+    try:
+        for handle in [handle1, handle2]:
+            if isinstance(handle, basestring):
+                handle = _open_fastq(handle)
+                handles.append(handle)
+            if batches:
+                chunks = FastqBatchIterator(handle, batch_size, variant)
+            else:
+                records = FastqGeneralIterator(handle)
+                chunks = iter(lambda records=records:
+                              list(itertools.islice(records, batch_size)), [])
+            readers.append(_ChunkReader(chunks, queue_size))
+        if batches and check_names:
+            import numpy
+        while True:
+            chunk1 = readers[0].get()
+            chunk2 = readers[1].get()
+            if chunk1 is None and chunk2 is None:
+                break
+            if chunk2 is None or (chunk1 is not None and
+                                  len(chunk1) > len(chunk2)):
+                raise ValueError("First FASTQ file has more reads than "
+                                 "the second.")
+            if chunk1 is None or len(chunk1) < len(chunk2):
+                raise ValueError("Second FASTQ file has more reads than "
+                                 "the first.")
+            if batches:
+                if check_names:
+                    _check_mate_batches(numpy, chunk1, chunk2)
+                yield chunk1, chunk2
+            else:
+                if check_names:
+                    names1 = [_mate_name(r[0]) for r in chunk1]
+                    names2 = [_mate_name(r[0]) for r in chunk2]
+                    if names1 != names2:
+                        for name1, name2 in zip(names1, names2):
+                            if name1 != name2:
+                                raise ValueError("Paired reads do not match "
+                                                 "(%s vs %s)."
+                                                 % (name1, name2))
+                for pair in zip(chunk1, chunk2):
+                    yield pair
+    finally:
+        for reader in readers:
+            reader.close()
+        for handle in handles:
+            handle.close()
+
+
+def demultiplex_fastq(in_handle, barcodes, filenames, mismatches=1,
+                      location="title", unmatched=None, compress=False,
+                      max_open=64, buffer_size=1048576, processes=1,
+                      chunk_size=10000):
+    """Split the reads in a FASTQ file into a file per sample by barcode.
+
+     - in_handle - input FASTQ file handle
+     - barcodes - dictionary mapping sample names to barcode sequences
+     - filenames - output filename for each sample, either a dictionary
+                   mapping the sample names to filenames, or a string
+                   template like "demux/%s.fastq" used with each name
+     - mismatches - how many mismatches to allow in the barcode (default 1)
+     - location - where to find each read's barcode, either "title"
+                  (default) for the end of the title line after the last
+                  colon (as in recent Illumina FASTQ files, where dual
+                  index barcodes look like "ACGTACGT+TTGACCAA"), or "start"
+                  for the first bases of the read (which are removed)
+     - unmatched - optional filename for the reads which don't match
+     - compress - if True, write BGZF compressed files (default False)
+     - max_open - maximum number of output files open at once
+     - buffer_size - how much FASTQ text to hold in memory for each sample
+                     before writing it out
+     - processes - number of processes to match the barcodes in (default
+                   one, or None for the number of CPUs)
+     - chunk_size - number of reads to send to a process at once
+
+    This reads the input with FastqGeneralIterator, and the FASTQ text is
+    written out unchanged (apart from removing barcodes at the start of
+    the reads), so there is no need to give the FASTQ variant. All the
+    sequences within the allowed number of mismatches of each barcode are
+    found in advance, so matching each read takes a single dictionary
+    lookup. A sequence which is equally close to the barcodes of two samples
+    is not assigned to either, and those reads are treated as unmatched.
+
+    The output for each sample is buffered and written in large pieces. Only
+    max_open files are kept open at once, the least recently written file
+    being closed if another is needed (and reopened later in append mode).
+    An output file is created for every sample, even if it has no reads.
+
+    Returns a dictionary mapping the sample names to how many reads they
+    were given, with the key None for the number of unmatched reads.
+
+    With more than one process, the records are passed between processes
+    using pickle, which requires Python 2.6 or later for the multiprocessing
+    module.
+    """
+    from Bio.SeqIO._demux import demultiplex_fastq as _demultiplex_fastq
+    return _demultiplex_fastq(in_handle, barcodes, filenames, mismatches,
+                              location, unmatched, compress, max_open,
+                              buffer_size, processes, chunk_size)
+
+
 if __name__ == "__main__":
     from Bio._utils import run_doctest
     run_doctest(verbose=0)
@@ -327,7 +327,9 @@ def _sff_do_slow_index(handle):
     This is a slow but generic approach if we can't parse the provided index
     (if present).
 
-    Will use the handle seek/tell functions.
+    Will use the handle seek/tell functions. The position within the file is
+    tracked separately, so this also works on BGZF compressed files where
+    tell gives a virtual offset (which is what is returned for each read).
     """
     handle.seek(0)
     header_length, index_offset, index_length, number_of_reads, \
@@ -343,17 +345,19 @@ def _sff_do_slow_index(handle):
     assert 1 == struct.calcsize(">s")
     assert 1 == struct.calcsize(">c")
     assert read_header_size % 8 == 0  # Important for padding calc later!
+    #Uncompressed position in the file
+    pos = header_length
     for read in range(number_of_reads):
-        record_offset = handle.tell()
-        if record_offset == index_offset:
+        if pos == index_offset:
             #Found index block within reads, ignore it:
             offset = index_offset + index_length
             if offset % 8:
                 offset += 8 - (offset % 8)
             assert offset % 8 == 0
-            handle.seek(offset)
-            record_offset = offset
-        #assert record_offset%8 == 0 #Worth checking, but slow
+            handle.read(offset - pos)
+            pos = offset
+        #assert pos % 8 == 0 #Worth checking, but slow
+        record_offset = handle.tell()
         #First the fixed header
         data = handle.read(read_header_size)
         read_header_length, name_length, seq_len, clip_qual_left, \
@@ -368,10 +372,10 @@ def _sff_do_slow_index(handle):
         if handle.read(padding).count(_null) != padding:
             raise ValueError("Post name %i byte padding region contained data"
                              % padding)
-        assert record_offset + read_header_length == handle.tell()
         #now the flowgram values, flowgram index, bases and qualities
         size = read_flow_size + 3 * seq_len
-        handle.seek(size, 1)
+        if len(handle.read(size)) != size:
+            raise ValueError("Premature end of file in read %s" % name)
         #now any padding...
         padding = size % 8
         if padding:
@@ -379,9 +383,11 @@ def _sff_do_slow_index(handle):
             if handle.read(padding).count(_null) != padding:
                 raise ValueError("Post quality %i byte padding region contained data"
                                  % padding)
+            size += padding
+        pos += read_header_length + size
         #print read, name, record_offset
         yield name, record_offset
-    if handle.tell() % 8 != 0:
+    if pos % 8 != 0:
         raise ValueError(
             "After scanning reads, did not end on a multiple of 8")
 
@@ -888,6 +894,330 @@ def _SffTrimIterator(handle, alphabet=Alphabet.generic_dna):
     return SffIterator(handle, alphabet, trim=True)
 
 
+class SffBatch(object):
+    """A batch of SFF reads held as columns of NumPy arrays.
+
+    These are returned by SffBatchIterator. Rather than a SeqRecord for each
+    read (with the flowgram values etc as tuples of integers), the values
+    for all the reads in the batch are held in a few arrays:
+
+     - headers - structured array with the fixed fields from each read
+                 header, seq_len, clip_qual_left, clip_qual_right,
+                 clip_adapter_left and clip_adapter_right (the left clip
+                 values are zero based, as in the SffIterator annotations)
+     - flowgrams - uint16 matrix of the flowgram values, one row per read
+                   and one column per flow
+     - seq_bytes - uint8 array of all the bases (ASCII codes)
+     - qualities - uint8 array of all the PHRED quality scores
+     - flow_positions - int64 array giving the flow (column in the
+                        flowgrams matrix, counting from zero) for each base,
+                        i.e. the cumulative sum of the flow index values
+     - offsets - int64 array giving where each read starts in seq_bytes,
+                 qualities and flow_positions, with an extra final entry
+     - name_bytes - uint8 array of all the read names
+     - name_offsets - int64 array giving where each name starts, again
+                      with an extra final entry
+     - flow_chars - the flow order from the file header (a string)
+     - key_sequence - the key sequence from the file header (a string)
+
+    For convenience the name, seq and qual methods give you the values for
+    a single read, and the lengths method all the read lengths.
+    """
+    def __init__(self, headers, flowgrams, seq_bytes, qualities,
+                 flow_positions, offsets, name_bytes, name_offsets,
+                 flow_chars, key_sequence):
+        self.headers = headers
+        self.flowgrams = flowgrams
+        self.seq_bytes = seq_bytes
+        self.qualities = qualities
+        self.flow_positions = flow_positions
+        self.offsets = offsets
+        self.name_bytes = name_bytes
+        self.name_offsets = name_offsets
+        self.flow_chars = flow_chars
+        self.key_sequence = key_sequence
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __repr__(self):
+        return "<%s with %i reads>" % (self.__class__.__name__, len(self))
+
+    def lengths(self):
+        """Returns an array of the read lengths."""
+        return self.offsets[1:] - self.offsets[:-1]
+
+    def name(self, index):
+        """Returns the name of this read as a string."""
+        start, end = self.name_offsets[index:index + 2]
+        return _bytes_to_string(self.name_bytes[start:end].tostring())
+
+    def seq(self, index):
+        """Returns the bases of this read as a string."""
+        start, end = self.offsets[index:index + 2]
+        return _bytes_to_string(self.seq_bytes[start:end].tostring())
+
+    def qual(self, index):
+        """Returns the quality scores of this read (as an array view)."""
+        start, end = self.offsets[index:index + 2]
+        return self.qualities[start:end]
+
+    def clip_positions(self):
+        """Returns two arrays, where each read's trimmed region starts and ends.
+
+        This follows SffIterator, applying the most aggressive of the quality
+        and adapter clipping, where a right clip value of zero means no
+        clipping. The values are always within the reads, with the start no
+        more than the end (so over clipped reads become empty).
+        """
+        import numpy
+        headers = self.headers
+        lengths = self.lengths()
+        starts = numpy.maximum(headers["clip_qual_left"],
+                               headers["clip_adapter_left"]).astype(numpy.int64)
+        ends = lengths
+        for field in ("clip_qual_right", "clip_adapter_right"):
+            values = headers[field].astype(numpy.int64)
+            ends = numpy.where(values, numpy.minimum(ends, values), ends)
+        starts = numpy.minimum(starts, ends)
+        return starts, ends
+
+    def trim(self):
+        """Returns a new batch with the reads trimmed using the clip values.
+
+        The bases, qualities and flow positions are copied into new arrays,
+        with the trimmed region of each read (as given by clip_positions).
+        The flow positions still refer to the columns of the flowgrams,
+        which along with the names and headers are left as they are.
+        """
+        import numpy
+        from Bio.SeqIO.QualityIO import _slice_positions
+        starts, ends = self.clip_positions()
+        where = _slice_positions(numpy, self.offsets[:-1] + starts,
+                                 ends - starts)
+        offsets = numpy.zeros(len(self) + 1, numpy.int64)
+        numpy.cumsum(ends - starts, out=offsets[1:])
+        return self.__class__(self.headers, self.flowgrams,
+                              self.seq_bytes[where], self.qualities[where],
+                              self.flow_positions[where], offsets,
+                              self.name_bytes, self.name_offsets,
+                              self.flow_chars, self.key_sequence)
+
+
+#Big endian fixed part of each read header (see _sff_read_seq_record)
+_read_header_dtype = [("read_header_length", ">u2"), ("name_length", ">u2"),
+                      ("seq_len", ">u4"), ("clip_qual_left", ">u2"),
+                      ("clip_qual_right", ">u2"), ("clip_adapter_left", ">u2"),
+                      ("clip_adapter_right", ">u2")]
+
+
+def _sff_raw_batches(handle, batch_size, index_offset, index_length,
+                     number_of_reads, number_of_flows_per_read,
+                     block_size=1048576):
+    """Yields the raw bytes of the reads, batch_size reads at a time (PRIVATE).
+
+    Returns tuples of a string holding the reads (with their padding) and
+    a list of where each read starts in that string. The handle is read in
+    large blocks, and only the first eight bytes of each read header are
+    unpacked here (enough to find where the next read starts). Any index
+    block between the reads is skipped. Afterwards the handle is left just
+    after the last read (or the index block, if that follows the reads).
+    """
+    flow_size = 2 * number_of_flows_per_read
+    empty = _as_bytes("")
+    buffer = empty
+    offset = handle.tell()  # of the start of the buffer in the file
+    start = 0  # of the next read in the buffer
+
+    def skip_index(start):
+        #Returns the new start if at the index block
+        if index_offset and offset + start == index_offset:
+            end = index_offset + index_length
+            if end % 8:
+                end += 8 - (end % 8)
+            start += end - index_offset
+        return start
+
+    remaining = number_of_reads
+    while remaining:
+        count = min(batch_size, remaining)
+        remaining -= count
+        pieces = []
+        starts = []
+        size = 0
+        for i in range(count):
+            start = skip_index(start)
+            length = 8  # to begin with, just the start of the read header
+            while True:
+                if len(buffer) < start + length:
+                    if start > len(buffer):
+                        handle.read(start - len(buffer))
+                    buffer = buffer[start:] + \
+                        handle.read(max(length, block_size))
+                    offset += start
+                    start = 0
+                    if len(buffer) < length:
+                        raise ValueError("Premature end of SFF file, "
+                                         "expected %i reads"
+                                         % number_of_reads)
+                if length > 8:
+                    break
+                read_header_length, name_length, seq_len \
+                    = struct.unpack(">2HI", buffer[start:start + 8])
+                if read_header_length < 10 or read_header_length % 8 != 0:
+                    raise ValueError("Malformed read header, says length "
+                                     "is %i" % read_header_length)
+                length = flow_size + 3 * seq_len
+                if length % 8:
+                    length += 8 - (length % 8)
+                length += read_header_length
+            pieces.append(buffer[start:start + length])
+            starts.append(size)
+            size += length
+            start += length
+        yield empty.join(pieces), starts
+    start = skip_index(start)
+    if start > len(buffer):
+        handle.read(start - len(buffer))
+    elif buffer[start:]:
+        raise ValueError("Additional data at end of SFF file")
+
+
+def _sff_decode_batch(numpy, raw, starts, number_of_flows_per_read,
+                      flow_chars, key_sequence):
+    """Decode the raw reads from _sff_raw_batches into an SffBatch (PRIVATE)."""
+    from Bio.SeqIO.QualityIO import _slice_positions
+    from numpy.lib.stride_tricks import as_strided
+    data = numpy.frombuffer(raw, numpy.uint8)
+    starts = numpy.array(starts, numpy.int64)
+
+    def rows(starts, width):
+        #Gather fixed width rows, using a view of every possible row
+        windows = as_strided(data, (len(data) - width + 1, width), (1, 1))
+        return windows[starts]
+
+    #Gather the fixed part of the read headers into a structured array
+    header_size = 16
+    headers = rows(starts, header_size).view(_read_header_dtype).ravel()
+    read_header_lengths = headers["read_header_length"].astype(numpy.int64)
+    name_lengths = headers["name_length"].astype(numpy.int64)
+    lengths = headers["seq_len"].astype(numpy.int64)
+    if (read_header_lengths < header_size + name_lengths).any():
+        raise ValueError("Malformed read header, too short for the read name")
+    #Check all the padding (after the name, and after the qualities) at once
+    flow_size = 2 * number_of_flows_per_read
+    flow_starts = starts + read_header_lengths
+    quals_ends = flow_starts + flow_size + 3 * lengths
+    ends = numpy.append(starts[1:], len(data))
+    padding = numpy.concatenate([
+        _slice_positions(numpy, starts + header_size + name_lengths,
+                         read_header_lengths - header_size - name_lengths),
+        _slice_positions(numpy, quals_ends, ends - quals_ends)])
+    if data[padding].any():
+        raise ValueError("Read padding region contained data")
+    #The flowgrams are fixed size, so can be gathered as a matrix
+    flowgrams = rows(flow_starts, flow_size).view(">u2").astype(numpy.uint16)
+    #The flow index, bases and qualities are one after the other, each
+    #the length of the read, so find the positions in the flow index
+    #and shift them to get the bases and qualities
+    offsets = numpy.zeros(len(starts) + 1, numpy.int64)
+    numpy.cumsum(lengths, out=offsets[1:])
+    where = _slice_positions(numpy, flow_starts + flow_size, lengths)
+    flow_positions = numpy.cumsum(data[where], dtype=numpy.int64)
+    if len(flow_positions):
+        #Restart the sum at zero for each read (counting flows from zero)
+        before = numpy.concatenate([[0], flow_positions])[offsets[:-1]]
+        flow_positions -= numpy.repeat(before + 1, lengths)
+    shift = numpy.repeat(lengths, lengths)
+    where += shift
+    seq_bytes = data[where]
+    where += shift
+    qualities = data[where]
+    name_offsets = numpy.zeros(len(starts) + 1, numpy.int64)
+    numpy.cumsum(name_lengths, out=name_offsets[1:])
+    name_bytes = data[_slice_positions(numpy, starts + header_size,
+                                       name_lengths)]
+    #Store the useful header fields in native byte order, with the left
+    #clip values zero based (as in the SffIterator annotations)
+    fields = ["seq_len", "clip_qual_left", "clip_qual_right",
+              "clip_adapter_left", "clip_adapter_right"]
+    native = numpy.zeros(len(starts), [("seq_len", numpy.uint32)] +
+                         [(field, numpy.uint16) for field in fields[1:]])
+    for field in fields:
+        native[field] = headers[field]
+    for field in ("clip_qual_left", "clip_adapter_left"):
+        native[field] = numpy.maximum(native[field], 1) - 1
+    return SffBatch(native, flowgrams, seq_bytes, qualities, flow_positions,
+                    offsets, name_bytes, name_offsets, flow_chars,
+                    key_sequence)
+
+
+def SffBatchIterator(handle, batch_size=10000, trim=False):
+    """Iterate over SFF reads in batches held as NumPy arrays.
+
+     - handle - input file, an SFF file (opened in binary mode)
+     - batch_size - the number of reads in each batch (except perhaps
+                    the last batch, which may be smaller)
+     - trim - should the reads be trimmed (using the clip values)?
+
+    This returns SffBatch objects, where the flowgrams for all the reads in
+    the batch are held as a matrix of unsigned 16 bit integers, and the
+    bases, qualities and flow positions are held in arrays. This avoids
+    creating a SeqRecord (and tuples of flowgram values etc) for each read,
+    which dominates the time taken by SffIterator on large files. The file
+    is read in large blocks, and each batch is decoded in a few steps.
+
+    This requires NumPy, so this example is not run as a doctest:
+
+        handle = open("Roche/E3MFGYR02_random_10_reads.sff", "rb")
+        for batch in SffBatchIterator(handle, batch_size=4, trim=True):
+            print len(batch), list(batch.lengths())
+            print batch.name(0), batch.seq(0)[:20] + "..."
+            print list(batch.flowgrams[0, :10])
+        handle.close()
+
+    Giving:
+
+        4 [260, 265, 292, 295]
+        E3MFGYR02JWQ7T GGTCTACATGTTGGTTAACC...
+        [84, 1, 123, 5, 8, 91, 11, 282, 97, 32]
+        4 [277, 256, 271, 150]
+        E3MFGYR02FTGED TGGTAATGGGGGGAAATTTA...
+        [79, 4, 121, 9, 6, 99, 12, 121, 105, 16]
+        2 [221, 130]
+        E3MFGYR02GPGB1 AAGCAGTGGTATCAACGCAG...
+        [82, 7, 121, 6, 10, 96, 12, 102, 7, 213]
+    """
+    try:
+        import numpy
+    except ImportError:
+        from Bio import MissingPythonDependencyError
+        raise MissingPythonDependencyError("Install NumPy if you want to "
+                                           "use SffBatchIterator.")
+    if batch_size < 1:
+        raise ValueError("Batch size should be at least one")
+    try:
+        assert 0 == handle.tell()
+    except AttributeError:
+        #Probably a network handle or something like that
+        handle = _AddTellHandle(handle)
+    header_length, index_offset, index_length, number_of_reads, \
+        number_of_flows_per_read, flow_chars, key_sequence \
+        = _sff_file_header(handle)
+    for raw, starts in _sff_raw_batches(handle, batch_size, index_offset,
+                                        index_length, number_of_reads,
+                                        number_of_flows_per_read):
+        batch = _sff_decode_batch(numpy, raw, starts,
+                                  number_of_flows_per_read,
+                                  flow_chars, key_sequence)
+        if trim:
+            batch = batch.trim()
+        yield batch
+    #Should now be at the end of the file...
+    if handle.read(1):
+        raise ValueError("Additional data at end of SFF file")
+
+
 class SffWriter(SequenceWriter):
     """SFF file writer."""
 
@@ -40,8 +40,16 @@ except ImportError:
 NS = "{http://uniprot.org/uniprot}"
 REFERENCE_JOURNAL = "%(name)s %(volume)s:%(first)s-%(last)s(%(pub_date)s)"
 
+#The entry child elements handled by the Parser class, which can be
+#selected with the fields argument. The name and accession are always
+#parsed as they are used for the record's name and id.
+_FIELDS = ["name", "accession", "protein", "gene", "geneLocation", "organism",
+           "organismHost", "keyword", "comment", "dbReference", "reference",
+           "feature", "proteinExistence", "evidence", "sequence"]
 
-def UniprotIterator(handle, alphabet=Alphabet.ProteinAlphabet(), return_raw_comments=False):
+
+def UniprotIterator(handle, alphabet=Alphabet.ProteinAlphabet(), return_raw_comments=False,
+                    fields=None):
     """Generator function to parse UniProt XML as SeqRecord objects.
 
     parses an XML entry at a time from any UniProt XML file
@@ -51,6 +59,20 @@ def UniprotIterator(handle, alphabet=Alphabet.ProteinAlphabet(), return_raw_comm
 
     return_raw_comments = True --> comment fields are returned as complete XML to allow further processing
     skip_parsing_errors = True --> if parsing errors are found, skip to next entry
+    fields = list of entry elements to parse, e.g. ["sequence"] or ["sequence", "dbReference"]
+             (by default everything is parsed, the name and accession are always parsed)
+
+    The XML is parsed incrementally, and each entry is discarded once it has
+    been turned into a SeqRecord, so memory use does not grow with the size
+    of the file. If you only need some of the data, say the sequences and
+    cross-references, using the fields argument is much faster as the other
+    elements (like the references and features) are ignored:
+
+    >>> from Bio import SeqIO
+    >>> record = SeqIO.read("SwissProt/Q13639.xml", "uniprot-xml",
+    ...                     fields=["sequence", "dbReference"])
+    >>> print record.id, len(record), len(record.dbxrefs), len(record.features)
+    Q13639 388 81 0
     """
     if isinstance(alphabet, Alphabet.NucleotideAlphabet):
         raise ValueError("Wrong alphabet %r" % alphabet)
@@ -71,10 +93,24 @@ def UniprotIterator(handle, alphabet=Alphabet.ProteinAlphabet(), return_raw_comm
                 "Use Python 2.5+, lxml or elementtree if you "
                 "want to use Bio.SeqIO.UniprotIO.")
 
+    if fields is not None:
+        for field in fields:
+            if field not in _FIELDS:
+                raise ValueError("Unknown field %r, should be one of: %s"
+                                 % (field, ", ".join(_FIELDS)))
+
+    root = None
     for event, elem in ElementTree.iterparse(handle, events=("start", "end")):
-        if event == "end" and elem.tag == NS + "entry":
-            yield Parser(elem, alphabet=alphabet, return_raw_comments=return_raw_comments).parse()
-            elem.clear()
+        if root is None:
+            #The first start event is for the root <uniprot> element
+            root = elem
+        elif event == "end" and elem.tag == NS + "entry":
+            record = Parser(elem, alphabet=alphabet, return_raw_comments=return_raw_comments,
+                            fields=fields).parse()
+            #Discard this entry (and any earlier cleared entries), otherwise
+            #the root element keeps growing as the file is parsed
+            root.clear()
+            yield record
 
 
 class Parser(object):
@@ -82,11 +118,18 @@ class Parser(object):
 
     return_raw_comments=True to get back the complete comment field in XML format
     alphabet=Alphabet.ProteinAlphabet()    can be modified if needed, default is protein alphabet.
+    fields=["sequence"]    to only parse the listed entry elements (plus the name and accession).
     """
-    def __init__(self, elem, alphabet=Alphabet.ProteinAlphabet(), return_raw_comments=False):
+    def __init__(self, elem, alphabet=Alphabet.ProteinAlphabet(), return_raw_comments=False,
+                 fields=None):
         self.entry = elem
         self.alphabet = alphabet
         self.return_raw_comments = return_raw_comments
+        if fields is None:
+            self.tags = None
+        else:
+            self.tags = set(NS + field for field in fields)
+            self.tags.update([NS + "name", NS + "accession"])
 
     def parse(self):
         """Parse the input."""
@@ -480,8 +523,12 @@ class Parser(object):
                 self.ParsedSeqRecord.annotations[k] = v  # to cope with swissProt plain text parser
 
         #Top-to-bottom entry children parsing
+        tags = self.tags
         for element in self.entry:
-            if element.tag == NS + 'name':
+            if tags is not None and element.tag not in tags:
+                #Not wanted
+                continue
+            elif element.tag == NS + 'name':
                 _parse_name(element)
             elif element.tag == NS + 'accession':
                 _parse_accession(element)
@@ -522,3 +569,8 @@ class Parser(object):
             self.ParsedSeqRecord.id = self.ParsedSeqRecord.annotations['accessions'][0]
 
         return self.ParsedSeqRecord
+
+
+if __name__ == "__main__":
+    from Bio._utils import run_doctest
+    run_doctest(verbose=0)
@@ -137,6 +137,18 @@ wrapping. Also note that under Python 3, the get_raw method will return a
 bytes string, hence the use of decode to turn it into a (unicode) string.
 This is uncessary on Python 2.
 
+If you want lots of records, the get_many and get_raw_many methods take a
+list of keys and read the records in the order they appear in the file
+(rather than jumping back and forth), giving (key, record) tuples:
+
+    >>> wanted = ["gi|1348917|gb|G26685|G26685", "gi|1348912|gb|G26680|G26680"]
+    >>> for key, record in record_dict.get_many(wanted):
+    ...     print key, len(record)
+    gi|1348912|gb|G26680|G26680 633
+    gi|1348917|gb|G26685|G26685 413
+
+Use keep_order=True to get the records in the order the keys were given.
+
 
 Input - Alignments
 ==================
@@ -213,6 +225,9 @@ names are also used in Bio.AlignIO and include the following:
 
  - abif    - Applied Biosystem's sequencing trace format
  - ace     - Reads the contig sequences from an ACE assembly file.
+ - columnar - Simple binary format for caching sequences (and any quality
+             scores) for fast reloading and random access, see the
+             Bio.SeqIO.ColumnarIO module for details.
  - embl    - The EMBL flat file format. Uses Bio.GenBank internally.
  - fasta   - The generic sequence file format where each record starts with
              an identifer line starting with a ">" character, followed by
@@ -309,6 +324,8 @@ See also http://biopython.org/wiki/SeqIO_dev
 """
 
 
+import sys
+
 from Bio.File import as_handle
 from Bio.SeqRecord import SeqRecord
 from Bio.Align import MultipleSeqAlignment
@@ -316,6 +333,7 @@ from Bio.Alphabet import Alphabet, AlphabetEncoder, _get_base_alphabet
 
 import AbiIO
 import AceIO
+import ColumnarIO
 import FastaIO
 import IgIO  # IntelliGenetics or MASE format
 import InsdcIO  # EMBL and GenBank
@@ -366,6 +384,7 @@ _FormatToIterator = {"fasta": FastaIO.FastaIterator,
                      "seqxml": SeqXmlIO.SeqXmlIterator,
                      "abi": AbiIO.AbiIterator,
                      "abi-trim": AbiIO._AbiTrimIterator,
+                     "columnar": ColumnarIO.ColumnarIterator,
                      }
 
 _FormatToWriter = {"fasta": FastaIO.FastaWriter,
@@ -382,9 +401,10 @@ _FormatToWriter = {"fasta": FastaIO.FastaWriter,
                    "qual": QualityIO.QualPhredWriter,
                    "sff": SffIO.SffWriter,
                    "seqxml": SeqXmlIO.SeqXmlWriter,
+                   "columnar": ColumnarIO.ColumnarWriter,
                    }
 
-_BinaryFormats = ["sff", "sff-trim", "abi", "abi-trim"]
+_BinaryFormats = ["sff", "sff-trim", "abi", "abi-trim", "columnar"]
 
 
 def write(sequences, handle, format):
@@ -447,7 +467,7 @@ def write(sequences, handle, format):
     return count
 
 
-def parse(handle, format, alphabet=None):
+def parse(handle, format, alphabet=None, prefetch=0, **kwargs):
     r"""Turns a sequence file into an iterator returning SeqRecords.
 
      - handle   - handle to the file, or the filename as a string
@@ -456,6 +476,20 @@ def parse(handle, format, alphabet=None):
      - alphabet - optional Alphabet object, useful when the sequence type
                   cannot be automatically inferred from the file itself
                   (e.g. format="fasta" or "tab")
+     - prefetch - optional integer, if given the file is parsed in a
+                  background thread up to about this many records ahead
+                  (default zero, meaning parse as the records are used).
+
+    Any additional keyword arguments are passed to the format's parser.
+    For example, the "genbank", "embl" and "imgt" parsers accept
+    feature_types (e.g. ["CDS"]) and feature_qualifiers (e.g.
+    ["translation"]) arguments to only parse the features of interest:
+
+    >>> from Bio import SeqIO
+    >>> filename = "GenBank/NC_005816.gb"
+    >>> for record in SeqIO.parse(filename, "genbank", feature_types=["CDS"]):
+    ...    print record.id, len(record.features)
+    NC_005816.1 10
 
     Typical usage, opening a file to read in, and looping over the record(s):
 
@@ -494,6 +528,25 @@ def parse(handle, format, alphabet=None):
     Alpha ACCGGATGTA
     Beta AGGCTCGGTTA
 
+    With prefetch, reading the file (including any decompression) and parsing
+    it happens in a background thread, overlapping with whatever you do with
+    each record. The records are passed over in small batches via a bounded
+    queue, so at most about this many records are held in memory ahead of
+    your code. Note that Python's global interpreter lock means this helps
+    most when reading from compressed files or slow file systems (as the
+    actual reading and decompression don't need the lock), or when your code
+    is waiting on something else. The records are the same either way:
+
+    >>> for record in SeqIO.parse("Quality/example.fastq", "fastq",
+    ...                           prefetch=100):
+    ...     print record.id, len(record)
+    EAS54_6_R1_2_1_413_324 25
+    EAS54_6_R1_2_1_540_792 25
+    EAS54_6_R1_2_1_443_348 25
+
+    Any error parsing the file is raised when you reach that point in the
+    records, as it would be without prefetch.
+
     Use the Bio.SeqIO.read(...) function when you expect a single record
     only.
     """
@@ -518,28 +571,82 @@ def parse(handle, format, alphabet=None):
     if alphabet is not None and not (isinstance(alphabet, Alphabet) or
                                      isinstance(alphabet, AlphabetEncoder)):
         raise ValueError("Invalid alphabet, %s" % repr(alphabet))
+    if prefetch < 0:
+        raise ValueError("Number of records to prefetch can't be negative")
 
     with as_handle(handle, mode) as fp:
         #Map the file format to a sequence iterator:
         if format in _FormatToIterator:
             iterator_generator = _FormatToIterator[format]
             if alphabet is None:
-                i = iterator_generator(fp)
+                i = iterator_generator(fp, **kwargs)
             else:
                 try:
-                    i = iterator_generator(fp, alphabet=alphabet)
+                    i = iterator_generator(fp, alphabet=alphabet, **kwargs)
                 except TypeError:
-                    i = _force_alphabet(iterator_generator(fp), alphabet)
+                    i = _force_alphabet(iterator_generator(fp, **kwargs),
+                                        alphabet)
         elif format in AlignIO._FormatToIterator:
             #Use Bio.AlignIO to read in the alignments
             i = (r for alignment in AlignIO.parse(fp, format,
-                                                  alphabet=alphabet)
+                                                  alphabet=alphabet, **kwargs)
                  for r in alignment)
         else:
             raise ValueError("Unknown format '%s'" % format)
+        if prefetch:
+            i = _prefetch(i, prefetch)
         #This imposes some overhead... wait until we drop Python 2.4 to fix it
-        for r in i:
-            yield r
+        try:
+            for r in i:
+                yield r
+        finally:
+            if prefetch:
+                #Stop the background thread before the handle is closed
+                i.close()
+
+
+def _prefetch(records, count):
+    """Iterate over records parsed ahead in a background thread (PRIVATE).
+
+    The records are read in chunks (lists of up to 100 records) using the
+    _threads._ChunkReader class, holding at most about count records.
+    Any parsing error is only raised once the records before it have been
+    returned.
+    """
+    from Bio.SeqIO._threads import _ChunkReader
+    chunk_size = min(100, max(1, count // 2))
+    reader = _ChunkReader(_record_chunks(records, chunk_size),
+                          max(1, count // chunk_size))
+    try:
+        while True:
+            chunk = reader.get()
+            if chunk is None:
+                break
+            for record in chunk:
+                yield record
+    finally:
+        reader.close()
+
+
+def _record_chunks(records, chunk_size):
+    """Group the records into lists of the given size (PRIVATE)."""
+    from Bio.SeqIO._threads import _reraise
+    chunk = []
+    try:
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    except Exception:
+        #Hand over the good records first, then the error (keeping the
+        #original traceback, which would be lost after the yield)
+        exc_info = sys.exc_info()
+        if chunk:
+            yield chunk
+        _reraise(exc_info)
+    if chunk:
+        yield chunk
 
 
 def _force_alphabet(record_iterator, alphabet):
@@ -557,7 +664,7 @@ def _force_alphabet(record_iterator, alphabet):
                              % (repr(alphabet), repr(record.seq.alphabet)))
 
 
-def read(handle, format, alphabet=None):
+def read(handle, format, alphabet=None, **kwargs):
     """Turns a sequence file into a single SeqRecord.
 
      - handle   - handle to the file, or the filename as a string
@@ -567,6 +674,9 @@ def read(handle, format, alphabet=None):
                   cannot be automatically inferred from the file itself
                   (e.g. format="fasta" or "tab")
 
+    Any additional keyword arguments are passed to the format's parser,
+    as in Bio.SeqIO.parse(...).
+
     This function is for use parsing sequence files containing
     exactly one record.  For example, reading a GenBank file:
 
@@ -600,7 +710,7 @@ def read(handle, format, alphabet=None):
     Use the Bio.SeqIO.parse(handle, format) function if you want
     to read multiple records from the handle.
     """
-    iterator = parse(handle, format, alphabet)
+    iterator = parse(handle, format, alphabet, **kwargs)
     try:
         first = iterator.next()
     except StopIteration:
@@ -677,7 +787,8 @@ def to_dict(sequences, key_function=None):
     return d
 
 
-def index(filename, format, alphabet=None, key_function=None):
+def index(filename, format, alphabet=None, key_function=None, compact=False,
+          cache=None, mmap=False, lazy=False):
     """Indexes a sequence file and returns a dictionary like object.
 
      - filename - string giving name of file to be indexed
@@ -688,6 +799,17 @@ def index(filename, format, alphabet=None, key_function=None):
      - key_function - Optional callback function which when given a
                   SeqRecord identifier string should return a unique
                   key for the dictionary.
+     - compact  - Optional boolean, default False. If True, the keys and
+                  offsets are held in compact arrays rather than a Python
+                  dictionary (requires string keys, see below).
+     - cache    - Optional, either True or a filename, to save the offsets
+                  to a sidecar file after the first scan, and reuse them
+                  on later calls (implies compact=True, see below).
+     - mmap     - Optional boolean, default False. If True, the file is
+                  memory mapped for faster record access (see below).
+     - lazy     - Optional boolean, default False. If True, GenBank, EMBL
+                  and IMGT records are only parsed as each attribute is
+                  used (see below).
 
     This indexing function will return a dictionary like object, giving the
     SeqRecord objects as values:
@@ -780,6 +902,65 @@ def index(filename, format, alphabet=None, key_function=None):
     to be completely parsed while building the index. Right now this is
     usually avoided.
 
+    For very large files, such as FASTQ files with hundreds of millions of
+    reads, the in memory Python dictionary of keys and offsets can itself
+    use too much RAM. Using compact=True stores the keys and offsets in
+    arrays instead, avoiding the overhead of a Python string and integer
+    object (and dictionary entry) for each record, in exchange for slightly
+    slower lookups. This requires the keys (after any key_function) to be
+    strings:
+
+    >>> from Bio import SeqIO
+    >>> records = SeqIO.index("Quality/example.fastq", "fastq", compact=True)
+    >>> len(records)
+    3
+    >>> print records["EAS54_6_R1_2_1_540_792"].seq
+    TTGGCAGGCCAAGGCCGATGGATCA
+
+    Scanning a large file can take several minutes, so if you will be
+    indexing the same file repeatedly (e.g. each time a script is run),
+    you can ask for the offsets to be cached in a sidecar file. With
+    cache=True this is the filename plus ".idxcache", or you can give a
+    cache filename explicitly (e.g. if the data is in a read only folder).
+    After the first call, so long as the indexed file's path, size and
+    modification time are unchanged, the cache is memory mapped and used
+    without re-scanning the file. Any key_function must be a named function
+    (not a lambda), and its name and code are recorded in the cache, so the
+    cache is rebuilt if you change your key_function.
+
+    If you will be looking up lots of records (e.g. in a web service), use
+    mmap=True to memory map the file rather than reading it through a file
+    handle. Each lookup then slices the records out of the mapped file,
+    avoiding a system call (and refilling the handle's buffer) each time:
+
+    >>> records = SeqIO.index("Quality/example.fastq", "fastq", mmap=True)
+    >>> print records.get_raw("EAS54_6_R1_2_1_413_324").decode()
+    @EAS54_6_R1_2_1_413_324
+    CCCTTCTTGTCTTCAGCGTTTCTCC
+    +
+    ;;3;;;;;;;;;;;;7;;;;;;;88
+    <BLANKLINE>
+    >>> records.close()
+
+    This is ignored for BGZF compressed files, and needs a 64 bit Python
+    for files over 2GB. Binary SFF files are still read record by record
+    (from the mapped file), rather than sliced.
+
+    For GenBank, EMBL and IMGT files, each lookup normally parses the whole
+    record, including every feature and the full sequence. With lazy=True
+    you get a SeqRecord where each part is only parsed when first used,
+    so looking up just the description or sequence of a large genome
+    record is quick. The features list is filled in one feature at a time
+    as the features are accessed:
+
+    >>> records = SeqIO.index("GenBank/NC_005816.gb", "gb", lazy=True)
+    >>> record = records["NC_005816.1"]
+    >>> print record.description
+    Yersinia pestis biovar Microtus str. 91001 plasmid pPCP1, complete sequence.
+    >>> print len(record.features), record.features[3].type
+    41 CDS
+    >>> records.close()
+
     See also: Bio.SeqIO.index_db() and Bio.SeqIO.to_dict()
     """
     #Try and give helpful error messages:
@@ -795,21 +976,75 @@ def index(filename, format, alphabet=None, key_function=None):
                                      isinstance(alphabet, AlphabetEncoder)):
         raise ValueError("Invalid alphabet, %s" % repr(alphabet))
 
+    if cache is not None and not isinstance(cache, (bool, basestring)):
+        raise TypeError("Need True or a filename for the index cache")
+
     #Map the file format to a sequence iterator:
-    from _index import _FormatToRandomAccess # Lazy import
-    from Bio.File import _IndexedSeqFileDict
+    from _index import _FormatToRandomAccess, _FormatToLazyRandomAccess # Lazy import
+    from Bio.File import _IndexedSeqFileDict, _OffsetTableCache
     try:
         proxy_class = _FormatToRandomAccess[format]
     except KeyError:
         raise ValueError("Unsupported format %r" % format)
+    if lazy:
+        try:
+            proxy_class = _FormatToLazyRandomAccess[format]
+        except KeyError:
+            raise ValueError("Lazy parsing is not supported for format %r"
+                             % format)
     repr = "SeqIO.index(%r, %r, alphabet=%r, key_function=%r)" \
         % (filename, format, alphabet, key_function)
-    return _IndexedSeqFileDict(proxy_class(filename, format, alphabet),
-                               key_function, repr, "SeqRecord")
+    if compact:
+        repr = repr[:-1] + ", compact=True)"
+    if mmap:
+        repr = repr[:-1] + ", mmap=True)"
+    if lazy:
+        repr = repr[:-1] + ", lazy=True)"
+    if cache:
+        if cache is True:
+            cache = filename + ".idxcache"
+        repr = repr[:-1] + ", cache=%r)" % cache
+        if key_function:
+            label = _key_function_label(key_function)
+        else:
+            label = ""
+        cache = _OffsetTableCache(cache, filename, format, label)
+    else:
+        cache = None
+    return _IndexedSeqFileDict(proxy_class(filename, format, alphabet, mmap),
+                               key_function, repr, "SeqRecord", compact,
+                               cache)
+
+
+def _key_function_label(key_function):
+    """Label identifying a key_function for the index cache (PRIVATE).
+
+    This is the module and name of the function, plus (for Python functions)
+    a hash of its byte code, names and constants, so that changing the body
+    of the function invalidates the cache. Anonymous functions (lambdas) are
+    refused, since they all share the same name.
+    """
+    name = getattr(key_function, "__name__", None)
+    if not name or name == "<lambda>":
+        raise ValueError("The index cache needs a named key_function "
+                         "(not a lambda), defined with def")
+    label = "%s.%s" % (getattr(key_function, "__module__", None), name)
+    try:
+        code = key_function.func_code
+    except AttributeError:
+        #e.g. a built in function or method
+        return label
+    import hashlib
+    from Bio._py3k import _as_bytes
+    #Nested code objects have a repr including their memory address
+    consts = [c for c in code.co_consts if not hasattr(c, "co_code")]
+    fingerprint = hashlib.md5(code.co_code)
+    fingerprint.update(_as_bytes(repr((code.co_names, consts))))
+    return "%s:%s" % (label, fingerprint.hexdigest())
 
 
 def index_db(index_filename, filenames=None, format=None, alphabet=None,
-             key_function=None):
+             key_function=None, processes=1, refresh=False):
     """Index several sequence files and return a dictionary like object.
 
     The index is stored in an SQLite database rather than in memory (as in the
@@ -827,6 +1062,12 @@ def index_db(index_filename, filenames=None, format=None, alphabet=None,
      - key_function - Optional callback function which when given a
                   SeqRecord identifier string should return a unique
                   key for the dictionary.
+     - processes - Optional integer, number of processes to use to scan
+                  the files in parallel when creating a new index (default
+                  one, meaning no extra processes). Requires Python 2.6+.
+     - refresh  - Optional boolean, default False. If True, an existing index
+                  is updated to match the given filenames, re-scanning only
+                  new or modified files, and dropping any removed files.
 
     This indexing function will return a dictionary like object, giving the
     SeqRecord objects as values:
@@ -850,6 +1091,25 @@ def index_db(index_filename, filenames=None, format=None, alphabet=None,
 
     In this example the two files contain 85 and 10 records respectively.
 
+    When indexing many files, the slow step is usually scanning the files,
+    which can be done in parallel using several processes. The offsets
+    found are then loaded into the SQLite database in bulk:
+
+    >>> records = SeqIO.index_db(idx_name, files, "fasta", generic_protein,
+    ...                          get_gi, processes=2)
+    >>> len(records)
+    95
+
+    The size and modification time of each file is recorded in the index.
+    Normally when reusing an existing index, the filenames must match those
+    used to create it. If you use refresh=True, then the index is updated to
+    match the given filenames instead. Any files no longer listed are removed
+    from the index, and any new files or files which have been modified since
+    they were indexed are (re)scanned. Files which have not changed are not
+    scanned again, so adding a new file to a large index is quick. With
+    refresh=True and no filenames, the files already in the index are checked,
+    and any which have been deleted are removed from the index.
+
     BGZF compressed files are supported, and detected automatically. Ordinary
     GZIP compressed files are not supported.
 
@@ -874,21 +1134,137 @@ def index_db(index_filename, filenames=None, format=None, alphabet=None,
         raise ValueError("Invalid alphabet, %s" % repr(alphabet))
 
     #Map the file format to a sequence iterator:
-    from _index import _FormatToRandomAccess  # Lazy import
+    from _index import _ProxyFactory  # Lazy import
     from Bio.File import _SQLiteManySeqFilesDict
     repr = "SeqIO.index_db(%r, filenames=%r, format=%r, alphabet=%r, key_function=%r)" \
                % (index_filename, filenames, format, alphabet, key_function)
 
-    def proxy_factory(format, filename=None):
-        """Given a filename returns proxy object, else boolean if format OK."""
-        if filename:
-            return _FormatToRandomAccess[format](filename, format, alphabet)
-        else:
-            return format in _FormatToRandomAccess
-
     return _SQLiteManySeqFilesDict(index_filename, filenames,
-                                   proxy_factory, format,
-                                   key_function, repr)
+                                   _ProxyFactory(alphabet), format,
+                                   key_function, repr, processes=processes,
+                                   refresh=refresh)
+
+
+def faidx(filename, alphabet=None, fai_filename=None, gzi_filename=None):
+    """Indexes a FASTA file like samtools faidx, for fetching regions.
+
+     - filename - string giving name of the FASTA file to be indexed
+     - alphabet - optional Alphabet object for the sequences
+     - fai_filename - optional name of the samtools style .fai index,
+                  default is the FASTA filename plus ".fai"
+     - gzi_filename - optional name of the samtools style .gzi index used
+                  with BGZF compressed files, default is the FASTA filename
+                  plus ".gzi"
+
+    This is intended for pulling out small regions of large sequences,
+    such as chromosomes. If the .fai (and for BGZF files, the .gzi) index
+    files exist they are loaded, otherwise the FASTA file is scanned and
+    the index files written (compatible with samtools faidx). Every line
+    of each record except the last must have the same length.
+
+    This returns a read only dictionary like object using the record name
+    (the first word of the title line) as the key. It has a fetch method
+    taking the name, start and end (using Python slicing conventions, so
+    zero based), which seeks directly to the lines holding the region:
+
+    >>> from Bio import SeqIO
+    >>> genome = SeqIO.faidx("GenBank/NC_005816.fna")
+    >>> genome.keys()
+    ['gi|45478711|ref|NC_005816.1|']
+    >>> genome.get_length("gi|45478711|ref|NC_005816.1|")
+    9609
+    >>> print genome.fetch("gi|45478711|ref|NC_005816.1|", 65, 95)
+    TCTCCTGATTCAGGAGAGTTTATGGTCACT
+    >>> genome.close()
+
+    Note that samtools style regions are one based and include the end, so
+    "gi|45478711|ref|NC_005816.1|:66-95" is the same region as above.
+
+    Looking up a key gives a SeqRecord for the whole sequence, using the
+    name as the id and description (the rest of the title line is not in
+    the index).
+
+    BGZF compressed FASTA files are supported, and detected automatically.
+
+    See also: Bio.SeqIO.index() and Bio.SeqIO.index_db()
+    """
+    #Try and give helpful error messages:
+    if not isinstance(filename, basestring):
+        raise TypeError("Need a filename (not a handle)")
+    if alphabet is not None and not (isinstance(alphabet, Alphabet) or
+                                     isinstance(alphabet, AlphabetEncoder)):
+        raise ValueError("Invalid alphabet, %s" % repr(alphabet))
+    from _faidx import _FaidxDict # Lazy import
+    return _FaidxDict(filename, alphabet, fai_filename, gzi_filename)
+
+
+def parallel_map(filename, format, function, reduce=None, processes=None,
+                 chunk_size=16777216):
+    """Apply a function to every record of a FASTA or FASTQ file in parallel.
+
+     - filename - string giving name of the file (which can be BGZF
+                  compressed, but not plain GZIP compressed)
+     - format   - "fasta" or "fastq" (or one of the FASTQ variants)
+     - function - function to call on each record, given a tuple of
+                  strings as from SimpleFastaParser (title and sequence)
+                  or FastqGeneralIterator (title, sequence and quality)
+     - reduce   - optional function taking two values and combining them
+     - processes - optional integer, the number of processes to use
+                  (default the number of CPUs)
+     - chunk_size - optional integer, the size of the byte ranges the
+                  file is split into (default 16MB)
+
+    The file is split into byte ranges, each of which is parsed in a worker
+    process. Each range is aligned to the records, so every record is seen
+    exactly once. Without a reduce function, this returns an iterator giving
+    the result of the function for each record, in file order. With a reduce
+    function, it is used to combine the results, first within each range,
+    and then between ranges, and the final value is returned (or None if
+    there are no records). The reduce function should therefore be
+    associative (for example, adding numbers).
+
+    For example, counting the records and bases in a FASTQ file:
+
+    >>> from Bio import SeqIO
+    >>> def count(record):
+    ...     title, seq, qual = record
+    ...     return 1, len(seq)
+    >>> def add(a, b):
+    ...     return a[0] + b[0], a[1] + b[1]
+    >>> SeqIO.parallel_map("Quality/example.fastq", "fastq", count, add,
+    ...                    processes=1)
+    (3, 75)
+
+    Or the length of each sequence in a FASTA file:
+
+    >>> def length(record):
+    ...     title, seq = record
+    ...     return len(seq)
+    >>> list(SeqIO.parallel_map("Fasta/f002", "fasta", length, processes=1))
+    [633, 413, 471]
+
+    With more than one process, the function, reduce function and their
+    results are passed between processes using pickle, so the functions
+    must be defined at the top level of a module (and not within the
+    interactive prompt or a doctest like this one). This requires Python
+    2.6 or later for the multiprocessing module.
+
+    FASTQ files must use the usual four lines per record (no line wrapping)
+    when split into more than one byte range, as otherwise a few wrapped
+    quality lines could look like the start of a record. A ValueError is
+    raised for line wrapped FASTQ files unless the chunk_size is larger than
+    the file.
+    """
+    #Try and give helpful error messages:
+    if not isinstance(filename, basestring):
+        raise TypeError("Need a filename (not a handle)")
+    if processes is not None and processes < 1:
+        raise ValueError("Need at least one process")
+    if chunk_size < 1:
+        raise ValueError("Need a positive chunk size")
+    from _parallel import parallel_map as _parallel_map  # Lazy import
+    return _parallel_map(filename, format, function, reduce, processes,
+                         chunk_size)
 
 
 def convert(in_file, in_format, out_file, out_format, alphabet=None):
@@ -927,7 +1303,7 @@ def convert(in_file, in_format, out_file, out_format, alphabet=None):
         in_mode = 'rU'
 
     #Don't open the output file until we've checked the input is OK?
-    if out_format in ["sff", "sff_trim"]:
+    if out_format in _BinaryFormats:
         out_mode = 'wb'
     else:
         out_mode = 'w'
@@ -46,6 +46,171 @@ def _embl_convert_fasta(in_handle, out_handle, alphabet=None):
     return SeqIO.write(records, out_handle, "fasta")
 
 
+def _imgt_convert_fasta(in_handle, out_handle, alphabet=None):
+    """Fast IMGT to FASTA (PRIVATE)."""
+    #We don't need to parse the features...
+    from Bio.GenBank.Scanner import _ImgtScanner
+    records = _ImgtScanner().parse_records(in_handle, do_features=False)
+    #For FASTA output we can ignore the alphabet too
+    return SeqIO.write(records, out_handle, "fasta")
+
+
+def _genbank_convert_tab(in_handle, out_handle, alphabet=None):
+    """Fast GenBank to simple tabbed conversion (PRIVATE)."""
+    #We don't need to parse the features...
+    from Bio.GenBank.Scanner import GenBankScanner
+    records = GenBankScanner().parse_records(in_handle, do_features=False)
+    #For tab output we can ignore the alphabet too
+    return SeqIO.write(records, out_handle, "tab")
+
+
+def _embl_convert_tab(in_handle, out_handle, alphabet=None):
+    """Fast EMBL to simple tabbed conversion (PRIVATE)."""
+    #We don't need to parse the features...
+    from Bio.GenBank.Scanner import EmblScanner
+    records = EmblScanner().parse_records(in_handle, do_features=False)
+    #For tab output we can ignore the alphabet too
+    return SeqIO.write(records, out_handle, "tab")
+
+
+def _imgt_convert_tab(in_handle, out_handle, alphabet=None):
+    """Fast IMGT to simple tabbed conversion (PRIVATE)."""
+    #We don't need to parse the features...
+    from Bio.GenBank.Scanner import _ImgtScanner
+    records = _ImgtScanner().parse_records(in_handle, do_features=False)
+    #For tab output we can ignore the alphabet too
+    return SeqIO.write(records, out_handle, "tab")
+
+
+def _clean(text):
+    """Remove new lines etc as done by the SeqIO writers (PRIVATE)."""
+    return text.replace("\n", " ").replace("\r", " ").replace("  ", " ")
+
+
+def _write_fasta(out_handle, id, description, seq):
+    """Write a FASTA record as the FastaWriter would (PRIVATE)."""
+    id = _clean(id)
+    description = _clean(description)
+    if description and description.split(None, 1)[0] == id:
+        #The description includes the id at the start
+        title = description
+    elif description:
+        title = "%s %s" % (id, description)
+    else:
+        title = id
+    out_handle.write(">%s\n" % title)
+    #Do line wrapping
+    for i in range(0, len(seq), 60):
+        out_handle.write(seq[i:i + 60] + "\n")
+
+
+def _write_tab(out_handle, id, seq):
+    """Write a record line as the TabWriter would (PRIVATE)."""
+    id = _clean(id)
+    assert "\t" not in id
+    assert "\t" not in seq
+    out_handle.write("%s\t%s\n" % (id, seq))
+
+
+def _swiss_records(handle):
+    """Scan a SwissProt file for just the id, description and sequence (PRIVATE).
+
+    Yields tuples of strings giving the same record.id, record.description
+    and sequence as the SwissIterator, but without parsing any of the other
+    lines (such as the references, comments, cross references and features).
+    """
+    accessions = None
+    for line in handle:
+        key = line[:2]
+        if key == "ID":
+            accessions = []
+            description = []
+            seq_lines = []
+        elif key == "AC":
+            accessions.extend(line[5:].rstrip().rstrip(";").split("; "))
+        elif key == "DE":
+            description.append(line[5:].strip())
+        elif key == "  ":
+            seq_lines.append(line[5:].replace(" ", "").rstrip())
+        elif key == "//":
+            if not accessions:
+                raise ValueError("No accession found in SwissProt record")
+            yield accessions[0], " ".join(description), "".join(seq_lines)
+            accessions = None
+    if accessions is not None:
+        raise ValueError("Unexpected end of stream.")
+
+
+def _swiss_convert_fasta(in_handle, out_handle, alphabet=None):
+    """Fast SwissProt to FASTA conversion (PRIVATE).
+
+    Only the ID, AC, DE and sequence lines are looked at, so unlike the
+    SwissIterator this does NOT check the other lines are valid!
+    """
+    count = 0
+    for id, description, seq in _swiss_records(in_handle):
+        count += 1
+        _write_fasta(out_handle, id, description, seq)
+    return count
+
+
+def _swiss_convert_tab(in_handle, out_handle, alphabet=None):
+    """Fast SwissProt to simple tabbed conversion (PRIVATE).
+
+    Only the ID, AC and sequence lines are looked at, so unlike the
+    SwissIterator this does NOT check the other lines are valid!
+    """
+    count = 0
+    for id, description, seq in _swiss_records(in_handle):
+        count += 1
+        _write_tab(out_handle, id, seq)
+    return count
+
+
+def _fasta_convert_fasta(in_handle, out_handle, alphabet=None):
+    """Fast FASTA to FASTA conversion, re-wrapping the sequences (PRIVATE)."""
+    from Bio.SeqIO.FastaIO import SimpleFastaParser
+    #For real speed, don't even make SeqRecord and Seq objects!
+    count = 0
+    for title, seq in SimpleFastaParser(in_handle):
+        count += 1
+        #The FastaIterator would use the title as the description
+        words = title.split(None, 1)
+        _write_fasta(out_handle, words and words[0] or "", title, seq)
+    return count
+
+
+def _fasta_convert_tab(in_handle, out_handle, alphabet=None):
+    """Fast FASTA to simple tabbed conversion (PRIVATE)."""
+    from Bio.SeqIO.FastaIO import SimpleFastaParser
+    #For real speed, don't even make SeqRecord and Seq objects!
+    count = 0
+    for title, seq in SimpleFastaParser(in_handle):
+        count += 1
+        words = title.split(None, 1)
+        _write_tab(out_handle, words and words[0] or "", seq)
+    return count
+
+
+def _tab_convert_fasta(in_handle, out_handle, alphabet=None):
+    """Fast simple tabbed to FASTA conversion (PRIVATE)."""
+    #For real speed, don't even make SeqRecord and Seq objects!
+    count = 0
+    for line in in_handle:
+        try:
+            title, seq = line.split("\t")  # will fail if more than one tab!
+        except ValueError:
+            if line.strip() == "":
+                #It's a blank line, ignore it
+                continue
+            raise ValueError("Each line should have one tab separating the" +
+                             " title and sequence, this line has %i tabs: %s"
+                             % (line.count("\t"), repr(line)))
+        count += 1
+        _write_fasta(out_handle, title.strip(), "", seq.strip())
+    return count
+
+
 def _fastq_generic(in_handle, out_handle, mapping):
     """FASTQ helper function where can't have data loss by truncation (PRIVATE)."""
     from Bio.SeqIO.QualityIO import FastqGeneralIterator
@@ -331,6 +496,16 @@ _converter = {
     ("genbank", "fasta"): _genbank_convert_fasta,
     ("gb", "fasta"): _genbank_convert_fasta,
     ("embl", "fasta"): _embl_convert_fasta,
+    ("imgt", "fasta"): _imgt_convert_fasta,
+    ("genbank", "tab"): _genbank_convert_tab,
+    ("gb", "tab"): _genbank_convert_tab,
+    ("embl", "tab"): _embl_convert_tab,
+    ("imgt", "tab"): _imgt_convert_tab,
+    ("swiss", "fasta"): _swiss_convert_fasta,
+    ("swiss", "tab"): _swiss_convert_tab,
+    ("fasta", "fasta"): _fasta_convert_fasta,
+    ("fasta", "tab"): _fasta_convert_tab,
+    ("tab", "fasta"): _tab_convert_fasta,
     ("fastq", "fasta"): _fastq_convert_fasta,
     ("fastq-sanger", "fasta"): _fastq_convert_fasta,
     ("fastq-solexa", "fasta"): _fastq_convert_fasta,
@@ -0,0 +1,291 @@
+# Copyright 2013 by Peter Cock.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+"""Demultiplexing FASTQ files by barcode (PRIVATE).
+
+You are not expected to access this module, or any of its code, directly. This
+is all handled internally by the Bio.SeqIO.QualityIO.demultiplex_fastq(...)
+function which is the public interface for this functionality.
+
+Rather than comparing each read's barcode to every sample's barcode, all the
+sequences within the allowed number of mismatches of each sample's barcode
+are put into a dictionary up front. Matching a read is then a single
+dictionary lookup. Where a sequence is equally close to two samples' barcodes
+it is left out of the table, so such reads are treated as unmatched.
+
+The output is collected in memory for each sample, and only written out
+once a sample has a reasonable amount of data. As there may be hundreds of
+samples, only a limited number of output files are kept open at once (the
+least recently written file is closed when another is needed, and reopened
+in append mode later on).
+"""
+
+import itertools
+
+from Bio import bgzf
+from Bio.SeqIO.QualityIO import FastqGeneralIterator
+
+_barcode_letters = "ACGTN"
+
+
+def _barcode_variants(barcode, mismatches, start=0):
+    """Yields (sequence, mismatch count) for sequences close to a barcode (PRIVATE).
+
+    Only the letters A, C, G, T and N are changed (so the "+" in a dual
+    index barcode like "ACGT+TTGA" is left alone), and each is replaced by
+    one of the other letters in ACGTN. Only positions from start onwards
+    are changed, which is used in the recursion for multiple mismatches.
+    """
+    if not start:
+        yield barcode, 0
+    if not mismatches:
+        return
+    for i in range(start, len(barcode)):
+        if barcode[i] not in _barcode_letters:
+            continue
+        for letter in _barcode_letters:
+            if letter == barcode[i]:
+                continue
+            variant = barcode[:i] + letter + barcode[i + 1:]
+            yield variant, 1
+            for more, count in _barcode_variants(variant, mismatches - 1,
+                                                 i + 1):
+                yield more, count + 1
+
+
+def _barcode_table(barcodes, mismatches):
+    """Dictionary mapping sequences to sample names (PRIVATE).
+
+    The barcodes argument is a dictionary mapping sample names to their
+    barcode sequences. Sequences which are equally close to the barcodes
+    of two different samples are left out.
+    """
+    seen = {}
+    for sample, barcode in barcodes.items():
+        barcode = barcode.upper()
+        if barcode in seen:
+            raise ValueError("Samples %r and %r have the same barcode %s"
+                             % (seen[barcode], sample, barcode))
+        seen[barcode] = sample
+    best = {}
+    ambiguous = set()
+    for barcode, sample in seen.items():
+        for variant, count in _barcode_variants(barcode, mismatches):
+            try:
+                old_count, old_sample = best[variant]
+            except KeyError:
+                best[variant] = count, sample
+                continue
+            if count < old_count:
+                best[variant] = count, sample
+                ambiguous.discard(variant)
+            elif count == old_count:
+                ambiguous.add(variant)
+    return dict((variant, sample) for variant, (count, sample) in best.items()
+                if variant not in ambiguous)
+
+
+def _demux_records(records, table, location, length):
+    """Assign FASTQ records to samples, returns formatted text (PRIVATE).
+
+    The records are (title, sequence, quality) tuples as from the
+    FastqGeneralIterator. Returns a dictionary mapping each sample name
+    (or None for unmatched reads) to a list of the records as FASTQ text.
+    When the barcode is at the start of the reads, it is removed.
+    """
+    output = {}
+    if location == "title":
+        for title, seq, qual in records:
+            sample = table.get(title.rsplit(":", 1)[-1].upper())
+            try:
+                output[sample].append("@%s\n%s\n+\n%s\n" % (title, seq, qual))
+            except KeyError:
+                output[sample] = ["@%s\n%s\n+\n%s\n" % (title, seq, qual)]
+    else:
+        for title, seq, qual in records:
+            sample = table.get(seq[:length].upper())
+            if sample is not None:
+                seq = seq[length:]
+                qual = qual[length:]
+            try:
+                output[sample].append("@%s\n%s\n+\n%s\n" % (title, seq, qual))
+            except KeyError:
+                output[sample] = ["@%s\n%s\n+\n%s\n" % (title, seq, qual)]
+    return output
+
+
+#Set in each worker process by _init_worker
+_worker_args = None
+
+
+def _init_worker(table, location, length):
+    """Store the lookup table etc in a worker process (PRIVATE)."""
+    global _worker_args
+    _worker_args = table, location, length
+
+
+def _demux_task(records):
+    """Run _demux_records in a worker process (PRIVATE).
+
+    The text for each sample is joined into a single string, which is
+    cheaper to send back to the main process than a list of strings.
+    """
+    output = _demux_records(records, *_worker_args)
+    return dict((sample, ("".join(texts), len(texts)))
+                for sample, texts in output.items())
+
+
+class _WriterPool(object):
+    """Buffered output files, with a limit on how many are open (PRIVATE).
+
+    The text for each file is buffered in memory until there is at least
+    buffer_size characters, and then written out. At most max_open files
+    are open at once, closing the least recently written when needed. Files
+    are first opened in write mode, and if closed and reopened later on,
+    in append mode. With compress=True, BGZF compressed files are written.
+    """
+    def __init__(self, filenames, max_open=64, buffer_size=1048576,
+                 compress=False):
+        if max_open < 1:
+            raise ValueError("Need to allow at least one open file")
+        self._filenames = filenames
+        self._max_open = max_open
+        self._buffer_size = buffer_size
+        self._compress = compress
+        self._buffers = {}
+        self._sizes = {}
+        #Open handles, and the last time each was used
+        self._handles = {}
+        self._last_used = {}
+        self._clock = 0
+        self._started = set()
+
+    def add(self, key, text):
+        """Add the text for this file, writing it out if enough is buffered."""
+        try:
+            self._buffers[key].append(text)
+            self._sizes[key] += len(text)
+        except KeyError:
+            self._buffers[key] = [text]
+            self._sizes[key] = len(text)
+        if self._sizes[key] >= self._buffer_size:
+            self._flush(key)
+
+    def _flush(self, key):
+        handle = self._open(key)
+        handle.write("".join(self._buffers.pop(key)))
+        del self._sizes[key]
+
+    def _open(self, key):
+        self._clock += 1
+        self._last_used[key] = self._clock
+        try:
+            return self._handles[key]
+        except KeyError:
+            pass
+        if len(self._handles) >= self._max_open:
+            #Close the least recently used file
+            oldest = min(self._handles, key=self._last_used.__getitem__)
+            self._handles.pop(oldest).close()
+        if key in self._started:
+            mode = "a"
+        else:
+            mode = "w"
+            self._started.add(key)
+        if self._compress:
+            handle = bgzf.BgzfWriter(self._filenames[key], mode + "b")
+        else:
+            handle = open(self._filenames[key], mode)
+        self._handles[key] = handle
+        return handle
+
+    def close(self):
+        """Write out any buffered text, and close all the files.
+
+        Any files which were never written to are created (empty).
+        """
+        for key in list(self._buffers):
+            self._flush(key)
+        for key in self._filenames:
+            if key not in self._started:
+                self._open(key)
+        for handle in self._handles.values():
+            handle.close()
+        self._handles = {}
+
+
+def demultiplex_fastq(in_handle, barcodes, filenames, mismatches=1,
+                      location="title", unmatched=None, compress=False,
+                      max_open=64, buffer_size=1048576, processes=1,
+                      chunk_size=10000):
+    """Implements Bio.SeqIO.QualityIO.demultiplex_fastq (PRIVATE).
+
+    See that for details.
+    """
+    if location not in ("title", "start"):
+        raise ValueError("Barcode location should be 'title' or 'start', "
+                         "not %r" % location)
+    if mismatches < 0:
+        raise ValueError("Number of mismatches can't be negative")
+    if chunk_size < 1:
+        raise ValueError("Chunk size should be at least one")
+    if processes is not None and processes < 1:
+        raise ValueError("Need at least one process")
+    if isinstance(filenames, basestring):
+        filenames = dict((sample, filenames % sample) for sample in barcodes)
+    else:
+        filenames = dict(filenames)
+        missing = [sample for sample in barcodes if sample not in filenames]
+        if missing:
+            raise ValueError("No output filename for sample %r" % missing[0])
+    if None in filenames:
+        raise ValueError("Can't use None as a sample name")
+    if unmatched is not None:
+        filenames[None] = unmatched
+    length = 0
+    if location == "start" and barcodes:
+        lengths = set(len(barcode) for barcode in barcodes.values())
+        if len(lengths) != 1:
+            raise ValueError("Barcodes at the start of the reads must all "
+                             "be the same length")
+        length = lengths.pop()
+    table = _barcode_table(barcodes, mismatches)
+
+    if processes is None or processes > 1:
+        try:
+            import multiprocessing
+        except ImportError:
+            #Python 2.5
+            from Bio import MissingPythonDependencyError
+            raise MissingPythonDependencyError("Parallel demultiplexing "
+                                               "requires multiprocessing, "
+                                               "which is included in "
+                                               "Python 2.6+")
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+    records = FastqGeneralIterator(in_handle)
+    chunks = iter(lambda: list(itertools.islice(records, chunk_size)), [])
+    if processes > 1:
+        pool = multiprocessing.Pool(processes, _init_worker,
+                                    (table, location, length))
+        results = pool.imap(_demux_task, chunks)
+    else:
+        pool = None
+        _init_worker(table, location, length)
+        results = itertools.imap(_demux_task, chunks)
+
+    counts = dict((sample, 0) for sample in filenames)
+    counts[None] = 0
+    writers = _WriterPool(filenames, max_open, buffer_size, compress)
+    try:
+        for output in results:
+            for sample, (text, count) in output.items():
+                counts[sample] += count
+                if sample in filenames:
+                    writers.add(sample, text)
+    finally:
+        writers.close()
+        if pool is not None:
+            pool.terminate()
+    return counts
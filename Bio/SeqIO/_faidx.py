@@ -0,0 +1,317 @@
+# Copyright 2013 by Peter Cock.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+"""Region access to FASTA files using samtools style faidx indexes (PRIVATE).
+
+You are not expected to access this module, or any of its code, directly. This
+is all handled internally by the Bio.SeqIO.faidx(...) function which is the
+public interface for this functionality.
+
+The samtools faidx index (a .fai file) is a tab separated plain text file
+with one line per FASTA record, giving the record name (the first word of
+the title line), the sequence length, the offset of the first base, the
+number of bases per line, and the number of bytes per line (including the
+new line character or characters). Given this, and provided every line of
+a record except the last has the same length, the byte range holding any
+region of the sequence can be calculated directly.
+
+For BGZF compressed FASTA files, samtools also uses a .gzi file to map the
+uncompressed offsets in the .fai file to BGZF virtual offsets. This is a
+little endian binary file, giving the number of entries as an unsigned 64
+bit integer, followed by that many pairs of unsigned 64 bit integers for
+the raw (compressed) and uncompressed start offsets of each BGZF block
+(after the first block, which starts at zero in both).
+"""
+
+from __future__ import with_statement
+
+import bisect
+import os
+import struct
+import warnings
+
+from Bio._py3k import _as_bytes, _bytes_to_string
+from Bio import bgzf
+from Bio.Alphabet import single_letter_alphabet
+from Bio.File import _IndexedSeqFileDict, _IndexedSeqFileProxy
+from Bio.File import _open_for_random_access
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+
+def _build_fai(handle):
+    """Scan a FASTA file returning a list of .fai entries (PRIVATE).
+
+    Each entry is a tuple of name, length, offset, bases per line and bytes
+    per line. The handle can be a BgzfReader, in which case the offsets are
+    uncompressed offsets as in samtools (not BGZF virtual offsets).
+    """
+    entries = []
+    title_char = _as_bytes(">")
+    new_line_chars = _as_bytes("\r\n")
+    name = None
+    pos = 0
+    for line in handle:
+        width = len(line)
+        pos += width
+        if line.startswith(title_char):
+            if name is not None:
+                entries.append((name, length, offset, line_bases, line_width))
+            try:
+                name = _bytes_to_string(line[1:].split(None, 1)[0])
+            except IndexError:
+                raise ValueError("Missing name in FASTA title line %r" % line)
+            offset = pos
+            length = line_bases = line_width = 0
+            short = False
+            continue
+        bases = len(line.rstrip(new_line_chars))
+        if name is None:
+            if bases:
+                raise ValueError("Sequence data before first FASTA title")
+        elif not bases:
+            #Blank line, only allowed at the end of a record
+            short = True
+        elif short:
+            raise ValueError("Short or blank line in the middle of the "
+                             "sequence for %s" % name)
+        elif not line_bases:
+            line_bases = bases
+            line_width = width
+        elif bases > line_bases or \
+                (bases == line_bases and width != line_width):
+            raise ValueError("Different line length in sequence %s" % name)
+        elif bases < line_bases:
+            #Must be the final line of this record
+            short = True
+        length += bases
+    if name is not None:
+        entries.append((name, length, offset, line_bases, line_width))
+    return entries
+
+
+def _read_fai(handle):
+    """Load the entries from a samtools .fai index (PRIVATE)."""
+    entries = []
+    for line in handle:
+        #A FASTQ .fai file has an extra column, which we ignore
+        parts = line.rstrip("\r\n").split("\t")
+        if len(parts) < 5:
+            raise ValueError("Expected at least five tab separated columns "
+                             "in .fai line: %r" % line)
+        entries.append((parts[0],) + tuple(int(x) for x in parts[1:5]))
+    return entries
+
+
+def _write_fai(handle, entries):
+    """Save the entries as a samtools .fai index (PRIVATE)."""
+    for entry in entries:
+        handle.write("%s\t%i\t%i\t%i\t%i\n" % entry)
+
+
+def _build_gzi(handle):
+    """Scan a BGZF file giving the raw and uncompressed block starts (PRIVATE).
+
+    As in the samtools .gzi file, the first block (at zero) is omitted.
+    """
+    entries = []
+    for raw_start, raw_len, data_start, data_len in bgzf.BgzfBlocks(handle):
+        if raw_start and data_len:
+            entries.append((raw_start, data_start))
+    return entries
+
+
+def _read_gzi(handle):
+    """Load the raw and uncompressed block starts from a .gzi file (PRIVATE)."""
+    data = handle.read(8)
+    if len(data) != 8:
+        raise ValueError("Truncated .gzi file")
+    count = struct.unpack("<Q", data)[0]
+    data = handle.read(16 * count)
+    if len(data) != 16 * count:
+        raise ValueError("Truncated .gzi file, expected %i entries" % count)
+    values = struct.unpack("<%iQ" % (2 * count), data)
+    return zip(values[0::2], values[1::2])
+
+
+def _write_gzi(handle, entries):
+    """Save the raw and uncompressed block starts as a .gzi file (PRIVATE)."""
+    handle.write(struct.pack("<Q", len(entries)))
+    for raw_start, data_start in entries:
+        handle.write(struct.pack("<QQ", raw_start, data_start))
+
+
+def _save_index(index_filename, mode, writer, entries, label):
+    """Try to save a newly built index file, warning on failure (PRIVATE)."""
+    try:
+        with open(index_filename, "w" + mode) as handle:
+            writer(handle, entries)
+    except (IOError, OSError), err:
+        warnings.warn("Could not save %s index %s: %s"
+                      % (label, index_filename, err))
+
+
+def _index_is_current(index_filename, filename):
+    """Does this index file exist, and is it no older than the file (PRIVATE)?
+
+    As with the offset table cache used by Bio.SeqIO.index(...), an index
+    older than the file it describes is treated as stale (the file may have
+    been rewritten since) and should be rebuilt.
+    """
+    try:
+        index_mtime = os.path.getmtime(index_filename)
+    except OSError:
+        return False
+    return index_mtime >= os.path.getmtime(filename)
+
+
+class _FaidxProxy(_IndexedSeqFileProxy):
+    """Region access to a FASTA file given its .fai entries (PRIVATE).
+
+    Unlike the other proxies the "offset" of each record is its whole .fai
+    entry (name, length, offset, bases per line and bytes per line), which
+    is what is needed to work out where any region of the sequence is.
+    """
+    def __init__(self, handle, entries, gzi, alphabet):
+        self._handle = handle
+        self._entries = entries
+        self._gzi = gzi
+        self._alphabet = alphabet
+
+    def __iter__(self):
+        for entry in self._entries:
+            yield entry[0], entry, None
+
+    def get(self, entry):
+        """Returns SeqRecord for the whole sequence."""
+        name = entry[0]
+        return SeqRecord(self.fetch(entry), id=name, name=name,
+                         description=name)
+
+    def get_raw(self, entry):
+        """Would return the record as a raw string, but not implemented."""
+        raise NotImplementedError("The .fai index only records where the "
+                                  "sequence starts, use fetch instead.")
+
+    def fetch(self, entry, start=0, end=None):
+        """Return a region of the sequence as a Seq object."""
+        name, length, offset, line_bases, line_width = entry
+        start, end, step = slice(start, end).indices(length)
+        if end <= start:
+            return Seq("", self._alphabet)
+        first = offset + (start // line_bases) * line_width \
+            + start % line_bases
+        last = offset + ((end - 1) // line_bases) * line_width \
+            + (end - 1) % line_bases + 1
+        handle = self._handle
+        if self._gzi is None:
+            handle.seek(first)
+        else:
+            raw_starts, data_starts = self._gzi
+            i = bisect.bisect_right(data_starts, first) - 1
+            handle.seek(bgzf.make_virtual_offset(raw_starts[i],
+                                                 first - data_starts[i]))
+        data = handle.read(last - first)
+        if line_width - line_bases:
+            data = data.replace(_as_bytes("\n"), _as_bytes(""))
+            data = data.replace(_as_bytes("\r"), _as_bytes(""))
+        if len(data) != end - start:
+            raise ValueError("FASTA file does not match the .fai index, "
+                             "wanted %i bases for %s but got %i"
+                             % (end - start, name, len(data)))
+        return Seq(_bytes_to_string(data), self._alphabet)
+
+
+class _FaidxDict(_IndexedSeqFileDict):
+    """Read only dictionary interface to a FASTA file with a .fai index.
+
+    The keys are the record names (first word of the title line), and
+    the values are SeqRecord objects. The fetch method can be used to
+    get just a region of a sequence, reading only the lines holding it.
+
+    Existing .fai and .gzi files are used if they are at least as new as
+    the FASTA file, otherwise they are rebuilt (and saved if possible).
+    """
+    def __init__(self, filename, alphabet=None, fai_filename=None,
+                 gzi_filename=None):
+        if fai_filename is None:
+            fai_filename = filename + ".fai"
+        if alphabet is None:
+            alphabet = single_letter_alphabet
+        handle = _open_for_random_access(filename)
+        try:
+            gzi = None
+            if isinstance(handle, bgzf.BgzfReader):
+                if gzi_filename is None:
+                    gzi_filename = filename + ".gzi"
+                if _index_is_current(gzi_filename, filename):
+                    with open(gzi_filename, "rb") as gzi_handle:
+                        blocks = _read_gzi(gzi_handle)
+                else:
+                    with open(filename, "rb") as raw_handle:
+                        blocks = _build_gzi(raw_handle)
+                    _save_index(gzi_filename, "b", _write_gzi, blocks, "BGZF")
+                blocks = [(0, 0)] + list(blocks)
+                gzi = ([raw for raw, data in blocks],
+                       [data for raw, data in blocks])
+            if _index_is_current(fai_filename, filename):
+                with open(fai_filename) as fai_handle:
+                    entries = _read_fai(fai_handle)
+                built = False
+            else:
+                entries = _build_fai(handle)
+                built = True
+        except:
+            handle.close()
+            raise
+        proxy = _FaidxProxy(handle, entries, gzi, alphabet)
+        repr = "SeqIO.faidx(%r, alphabet=%r)" % (filename, alphabet)
+        #This closes the handle if there are duplicate names
+        _IndexedSeqFileDict.__init__(self, proxy, None, repr, "SeqRecord")
+        self._names = [entry[0] for entry in entries]
+        if built:
+            _save_index(fai_filename, "", _write_fai, entries, "FASTA")
+
+    def __iter__(self):
+        """Iterate over the keys (in file order)."""
+        return iter(self._names)
+
+    if hasattr(dict, "iteritems"):
+        def keys(self):
+            """Return a list of all the keys (in file order)."""
+            return self._names[:]
+
+    def get_raw_many(self, keys, keep_order=False):
+        """Would return the records as raw strings, but not implemented."""
+        raise NotImplementedError("The .fai index only records where the "
+                                  "sequence starts, use get_many instead.")
+
+    def _lookup_many(self, keys):
+        """List of (file, offset, length, index, key) for the keys (PRIVATE)."""
+        offsets = self._offsets
+        return [(0, offsets[key][2], None, index, key)
+                for index, key in enumerate(keys)]
+
+    def _get_at(self, file_number, offset, key):
+        """Return the record for this key (PRIVATE)."""
+        return self[key]
+
+    def get_length(self, key):
+        """Return the length of the sequence for the given key."""
+        return self._offsets[key][1]
+
+    def fetch(self, key, start=0, end=None):
+        """Return a region of the sequence as a Seq object.
+
+         - key   - the record name, as in the .fai index
+         - start - start of the region (zero based, default zero)
+         - end   - end of the region (default, the end of the sequence)
+
+        The start and end are interpreted as in Python slicing, so
+        fetch(key, start, end) is equivalent to record.seq[start:end]
+        but only the lines of the file holding this region are read.
+        Note that samtools style regions are one based and include the
+        end, so region "chr1:101-200" would be fetch("chr1", 100, 200).
+        """
+        return self._proxy.fetch(self._offsets[key], start, end)
@@ -35,8 +35,10 @@ from Bio.File import _IndexedSeqFileProxy, _open_for_random_access
 
 
 class SeqFileRandomAccess(_IndexedSeqFileProxy):
-    def __init__(self, filename, format, alphabet):
-        self._handle = _open_for_random_access(filename)
+    def __init__(self, filename, format, alphabet, mmap=False):
+        self._handle = _open_for_random_access(filename, mmap)
+        #If memory mapped, the handle can be sliced and searched directly
+        self._mapped = hasattr(self._handle, "find")
         self._alphabet = alphabet
         self._format = format
         #Load the parser class/function once an avoid the dict lookup in each
@@ -74,8 +76,8 @@ class SeqFileRandomAccess(_IndexedSeqFileProxy):
 # number of flows.
 class SffRandomAccess(SeqFileRandomAccess):
     """Random access to a Standard Flowgram Format (SFF) file."""
-    def __init__(self, filename, format, alphabet):
-        SeqFileRandomAccess.__init__(self, filename, format, alphabet)
+    def __init__(self, filename, format, alphabet, mmap=False):
+        SeqFileRandomAccess.__init__(self, filename, format, alphabet, mmap)
         header_length, index_offset, index_length, number_of_reads, \
             self._flows_per_read, self._flow_chars, self._key_sequence \
             = SeqIO.SffIO._sff_file_header(self._handle)
@@ -90,8 +92,10 @@ class SffRandomAccess(SeqFileRandomAccess):
         header_length, index_offset, index_length, number_of_reads, \
             self._flows_per_read, self._flow_chars, self._key_sequence \
             = SeqIO.SffIO._sff_file_header(handle)
-        if index_offset and index_length:
-            #There is an index provided, try this the fast way:
+        if index_offset and index_length \
+                and not isinstance(handle, bgzf.BgzfReader):
+            #There is an index provided, try this the fast way
+            #(not for BGZF, as the index holds uncompressed offsets):
             count = 0
             try:
                 for name, offset in SeqIO.SffIO._sff_read_roche_index(handle):
@@ -148,8 +152,8 @@ class SffTrimedRandomAccess(SffRandomAccess):
 ###################
 
 class SequentialSeqFileRandomAccess(SeqFileRandomAccess):
-    def __init__(self, filename, format, alphabet):
-        SeqFileRandomAccess.__init__(self, filename, format, alphabet)
+    def __init__(self, filename, format, alphabet, mmap=False):
+        SeqFileRandomAccess.__init__(self, filename, format, alphabet, mmap)
         marker = {"ace": "CO ",
                   "embl": "ID ",
                   "fasta": ">",
@@ -165,6 +169,7 @@ class SequentialSeqFileRandomAccess(SeqFileRandomAccess):
                   }[format]
         self._marker = marker
         self._marker_re = re.compile(_as_bytes("^%s" % marker))
+        self._next_marker_re = re.compile(_as_bytes("\n%s" % marker))
 
     def __iter__(self):
         """Returns (id,offset) tuples."""
@@ -200,6 +205,13 @@ class SequentialSeqFileRandomAccess(SeqFileRandomAccess):
         """Similar to the get method, but returns the record as a raw string."""
         #For non-trivial file formats this must be over-ridden in the subclass
         handle = self._handle
+        if self._mapped:
+            #Find the start of the next record in one go, then slice
+            match = self._next_marker_re.search(handle, offset)
+            if match:
+                return handle[offset:match.start() + 1]
+            else:
+                return handle[offset:]
         marker_re = self._marker_re
         handle.seek(offset)
         lines = [handle.readline()]
@@ -297,7 +309,6 @@ class EmblRandomAccess(SequentialSeqFileRandomAccess):
                 end_offset = handle.tell()
                 line = handle.readline()
                 if marker_re.match(line) or not line:
-                    end_offset = handle.tell() - len(line)
                     yield _bytes_to_string(key), start_offset, length
                     start_offset = end_offset
                     break
@@ -307,6 +318,24 @@ class EmblRandomAccess(SequentialSeqFileRandomAccess):
         assert not line, repr(line)
 
 
+class LazyGenBankRandomAccess(GenBankRandomAccess):
+    """Indexed dictionary like access to a GenBank file, parsing on demand."""
+    def get(self, offset):
+        """Returns SeqRecord, with each part parsed when first used."""
+        from _lazy import _LazyInsdcRecord  # Lazy import
+        return _LazyInsdcRecord(_bytes_to_string(self.get_raw(offset)),
+                                self._format, self._alphabet)
+
+
+class LazyEmblRandomAccess(EmblRandomAccess):
+    """Indexed dictionary like access to an EMBL file, parsing on demand."""
+    def get(self, offset):
+        """Returns SeqRecord, with each part parsed when first used."""
+        from _lazy import _LazyInsdcRecord  # Lazy import
+        return _LazyInsdcRecord(_bytes_to_string(self.get_raw(offset)),
+                                self._format, self._alphabet)
+
+
 class SwissRandomAccess(SequentialSeqFileRandomAccess):
     """Random access to a SwissProt file."""
     def __iter__(self):
@@ -371,8 +400,7 @@ class UniprotRandomAccess(SequentialSeqFileRandomAccess):
                         start_acc_marker) + 11:].split(less_than, 1)[0]
                     length += len(line)
                 elif end_entry_marker in line:
-                    end_offset = handle.tell() - len(line) \
-                        + line.find(end_entry_marker) + 8
+                    length += line.find(end_entry_marker) + 8
                     break
                 elif marker_re.match(line) or not line:
                     #Start of next record or end of file
@@ -380,8 +408,8 @@ class UniprotRandomAccess(SequentialSeqFileRandomAccess):
                 else:
                     length += len(line)
             if not key:
-                raise ValueError("Did not find <accession> line in bytes %i to %i"
-                                 % (start_offset, end_offset))
+                raise ValueError("Did not find <accession> line in record "
+                                 "starting at offset %i" % start_offset)
             yield _bytes_to_string(key), start_offset, length
             #Find start of next record
             while not marker_re.match(line) and line:
@@ -394,6 +422,14 @@ class UniprotRandomAccess(SequentialSeqFileRandomAccess):
         handle = self._handle
         marker_re = self._marker_re
         end_entry_marker = _as_bytes("</entry>")
+        if self._mapped:
+            #Find the end of the entry (after the first line), then slice
+            start = handle.find(_as_bytes("\n"), offset) + 1 or len(handle)
+            end = handle.find(end_entry_marker, start)
+            if end == -1 or self._next_marker_re.search(handle, start - 1,
+                                                        end):
+                raise ValueError("Didn't find end of record")
+            return handle[offset:end + 8]
         handle.seek(offset)
         data = [handle.readline()]
         while True:
@@ -426,8 +462,8 @@ class UniprotRandomAccess(SequentialSeqFileRandomAccess):
 
 class IntelliGeneticsRandomAccess(SeqFileRandomAccess):
     """Random access to a IntelliGenetics file."""
-    def __init__(self, filename, format, alphabet):
-        SeqFileRandomAccess.__init__(self, filename, format, alphabet)
+    def __init__(self, filename, format, alphabet, mmap=False):
+        SeqFileRandomAccess.__init__(self, filename, format, alphabet, mmap)
         self._marker_re = re.compile(_as_bytes("^;"))
 
     def __iter__(self):
@@ -435,27 +471,48 @@ class IntelliGeneticsRandomAccess(SeqFileRandomAccess):
         handle.seek(0)
         marker_re = self._marker_re
         semi_char = _as_bytes(";")
+        offset = handle.tell()
+        line = handle.readline()
         while True:
-            offset = handle.tell()
-            line = handle.readline()
-            length = len(line)
             if marker_re.match(line):
+                length = len(line)
                 #Now look for the first line which doesn't start ";"
                 while True:
                     line = handle.readline()
                     if line[0:1] != semi_char and line.strip():
                         key = line.split()[0]
-                        yield _bytes_to_string(key), offset, length
                         break
                     if not line:
                         raise ValueError("Premature end of file?")
                     length += len(line)
+                #Then the sequence lines, up to the next ";" line
+                while line and line[0:1] != semi_char:
+                    length += len(line)
+                    next_offset = handle.tell()
+                    line = handle.readline()
+                yield _bytes_to_string(key), offset, length
+                offset = next_offset
             elif not line:
                 #End of file
                 break
+            else:
+                offset = handle.tell()
+                line = handle.readline()
 
     def get_raw(self, offset):
         handle = self._handle
+        if self._mapped:
+            #Skip the ";" comment lines, then find the next one and slice
+            semi_char = _as_bytes(";")
+            new_line = _as_bytes("\n")
+            size = len(handle)
+            start = offset
+            while start < size and handle[start:start + 1] == semi_char:
+                start = handle.find(new_line, start) + 1 or size
+            end = handle.find(_as_bytes("\n;"), start)
+            if end == -1:
+                return handle[offset:]
+            return handle[offset:end + 1]
         handle.seek(offset)
         marker_re = self._marker_re
         lines = []
@@ -495,6 +552,11 @@ class TabRandomAccess(SeqFileRandomAccess):
     def get_raw(self, offset):
         """Like the get method, but returns the record as a raw string."""
         handle = self._handle
+        if self._mapped:
+            end = handle.find(_as_bytes("\n"), offset)
+            if end == -1:
+                return handle[offset:]
+            return handle[offset:end + 1]
         handle.seek(offset)
         return handle.readline()
 
@@ -562,6 +624,9 @@ class FastqRandomAccess(SeqFileRandomAccess):
         """Similar to the get method, but returns the record as a raw string."""
         #TODO - Refactor this and the __init__ method to reduce code duplication?
         handle = self._handle
+        if self._mapped:
+            #Find where the record ends, then slice it out in one go
+            return handle[offset:self._mapped_end(offset)]
         handle.seek(offset)
         line = handle.readline()
         data = line
@@ -597,9 +662,63 @@ class FastqRandomAccess(SeqFileRandomAccess):
             raise ValueError("Problem with quality section")
         return data
 
+    def _mapped_end(self, offset):
+        """Offset of the end of the record in the memory mapped file (PRIVATE).
+
+        This follows the same rules as get_raw, but works out where each line
+        ends using the find method rather than reading the lines one by one.
+        """
+        handle = self._handle
+        size = len(handle)
+        new_line = _as_bytes("\n")
+        at_char = _as_bytes("@")
+        plus_char = _as_bytes("+")
+        #Note find gives -1 if there is no new line, i.e. the last line
+        end = handle.find(new_line, offset) + 1 or size
+        if handle[offset:offset + 1] != at_char:
+            raise ValueError("Problem with FASTQ @ line:\n%s"
+                             % repr(handle[offset:end]))
+        #Find the seq line(s)
+        seq_len = 0
+        while True:
+            start = end
+            if start == size:
+                raise ValueError("Premature end of file in seq section")
+            end = handle.find(new_line, start) + 1 or size
+            if handle[start:start + 1] == plus_char:
+                break
+            seq_len += len(handle[start:end].strip())
+        #Find the qual line(s)
+        qual_len = 0
+        while qual_len < seq_len and end < size:
+            start = end
+            end = handle.find(new_line, start) + 1 or size
+            qual_len += len(handle[start:end].strip())
+        if seq_len != qual_len:
+            raise ValueError("Problem with quality section")
+        return end
+
 
 ###############################################################################
 
+class _ProxyFactory(object):
+    """Proxy factory used by Bio.SeqIO.index_db (PRIVATE).
+
+    This is a class rather than a closure so that it can be pickled,
+    which is needed to scan files in parallel using multiprocessing.
+    """
+    def __init__(self, alphabet):
+        self._alphabet = alphabet
+
+    def __call__(self, format, filename=None):
+        """Given a filename returns proxy object, else boolean if format OK."""
+        if filename:
+            return _FormatToRandomAccess[format](filename, format,
+                                                 self._alphabet)
+        else:
+            return format in _FormatToRandomAccess
+
+
 _FormatToRandomAccess = {"ace": SequentialSeqFileRandomAccess,
                          "embl": EmblRandomAccess,
                          "fasta": SequentialSeqFileRandomAccess,
@@ -620,3 +739,10 @@ _FormatToRandomAccess = {"ace": SequentialSeqFileRandomAccess,
                          "qual": SequentialSeqFileRandomAccess,
                          "uniprot-xml": UniprotRandomAccess,
                          }
+
+#Used by Bio.SeqIO.index(...) with lazy=True
+_FormatToLazyRandomAccess = {"embl": LazyEmblRandomAccess,
+                             "genbank": LazyGenBankRandomAccess,
+                             "gb": LazyGenBankRandomAccess,
+                             "imgt": LazyEmblRandomAccess,
+                             }
@@ -0,0 +1,298 @@
+# Copyright 2013 by Peter Cock.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+"""Lazy loading SeqRecord objects for indexed GenBank/EMBL files (PRIVATE).
+
+You are not expected to access this module, or any of its code, directly. This
+is all handled internally by the Bio.SeqIO.index(...) function when called
+with lazy=True, which is the public interface for this functionality.
+
+A GenBank or EMBL record has three sections, the header (everything before
+the feature table), the feature table, and the footer (which holds the
+sequence itself). On a large genome record, most of the time spent parsing
+goes on the features and the sequence. Here the raw text of the record is
+kept, and on first use it is split into these sections with a quick scan
+over the lines (only looking at the start of each line), noting where each
+feature starts.
+
+The header is only parsed when one of the id, name, description, dbxrefs or
+annotations attributes is first used. The sequence is only parsed when the
+seq or letter_annotations are first used. The features list is filled in
+one feature at a time, as each feature is accessed. The parsing itself is
+done with the usual scanner and consumer code, so the results match those
+from Bio.SeqIO.parse(...).
+"""
+
+import re
+from StringIO import StringIO
+
+from Bio import SeqIO
+from Bio.SeqRecord import SeqRecord
+from Bio.GenBank import _FeatureConsumer
+from Bio.GenBank.utils import FeatureValueCleaner
+from Bio.GenBank.Scanner import GenBankScanner, EmblScanner, _ImgtScanner
+
+#For each format, the scanner class, the start of any contig lines in the
+#footer (which are needed for the annotations), and a minimal footer without
+#any sequence (used when parsing just the header).
+_formats = {"genbank": (GenBankScanner, "CONTIG", "ORIGIN\n//\n"),
+            "gb": (GenBankScanner, "CONTIG", "ORIGIN\n//\n"),
+            "embl": (EmblScanner, "CO   ", "SQ   Sequence\n//\n"),
+            "imgt": (_ImgtScanner, "CO   ", "SQ   Sequence\n//\n"),
+            }
+
+_header_attributes = set(["id", "name", "description", "dbxrefs",
+                          "annotations"])
+_sequence_attributes = set(["_seq", "_per_letter_annotations"])
+
+
+def _split_record(text, scanner):
+    """Find the feature table in a record, returns a tuple of two offsets (PRIVATE).
+
+    Returns the offset of the first line after the feature table header
+    (the end of the header section), and the offset of the first line after
+    the feature table (the start of the footer). These are the same if there
+    is no feature table. This follows the logic of the scanner's parse_header
+    and parse_features methods, but within the feature table only looks at
+    lines which don't start like a feature line (e.g. "FT" for EMBL).
+    """
+    width = scanner.HEADER_WIDTH
+    markers = scanner.FEATURE_START_MARKERS
+    end_markers = scanner.FEATURE_END_MARKERS
+    sequence_headers = scanner.SEQUENCE_HEADERS
+
+    #The header is short, so just loop over the lines
+    handle = StringIO(text)
+    handle.readline()  # The ID/LOCUS line
+    while True:
+        offset = handle.tell()
+        line = handle.readline()
+        if not line:
+            raise ValueError("Premature end of line during sequence data")
+        line = line.rstrip()
+        if line in markers or line[:width].rstrip() in sequence_headers:
+            break
+        if line == "//":
+            raise ValueError("Premature end of sequence data marker '//' found")
+    if line not in markers:
+        #No feature table
+        return offset, offset
+    while line.rstrip() in markers:
+        offset = handle.tell()
+        line = handle.readline()
+    header_end = offset
+
+    #The feature table can be huge, so use a regular expression to find
+    #any lines not starting like a feature line, and check just those
+    other_line = re.compile("^(?!%s)" % re.escape(
+        scanner.FEATURE_QUALIFIER_SPACER[:2]), re.M)
+    while True:
+        offset = other_line.search(text, offset).start()
+        end = text.find("\n", offset) + 1 or len(text)
+        line = text[offset:end]
+        if not line:
+            raise ValueError("Premature end of line during features table")
+        if line[:width].rstrip() in sequence_headers \
+                or line.rstrip() in end_markers:
+            return header_end, offset
+        if line.rstrip() == "//":
+            raise ValueError("Premature end of features table, marker '//' found")
+        offset = end
+
+
+def _feature_starts(text, start, end, scanner):
+    """Returns a list of the offsets where each feature starts (PRIVATE).
+
+    The start and end offsets give the feature table, as found using the
+    _split_record function. Feature lines have the key in the columns up to
+    the qualifier indent, which are blank on the following lines.
+    """
+    indent = scanner.FEATURE_QUALIFIER_INDENT
+    feature_start = re.compile(r"^[^\n]{2}[^\S\n]{0,%i}\S" % (indent - 3),
+                               re.M)
+    starts = []
+    for match in feature_start.finditer(text, start, end):
+        offset = match.start()
+        #As in parse_features, ignore lines too short to hold a feature
+        if len(text[offset:text.find("\n", offset)].rstrip()) >= indent:
+            starts.append(offset)
+    return starts
+
+
+class _LazyFeatureList(list):
+    """List of SeqFeature objects, each parsed when first accessed (PRIVATE).
+
+    Until then, the list holds None as a place holder for each feature.
+    Indexing and iterating only parse the features needed. Anything else,
+    such as slicing, modifying the list, or comparing it to another list,
+    first parses all the remaining features. Copies are plain lists.
+    """
+    def __init__(self, record, starts, end):
+        list.__init__(self, [None] * len(starts))
+        self._record = record
+        self._bounds = zip(starts, starts[1:] + [end])
+
+    def _feature(self, index):
+        feature = list.__getitem__(self, index)
+        if feature is None and self._record is not None:
+            start, end = self._bounds[index]
+            feature = self._record._parse_feature(start, end)
+            list.__setitem__(self, index, feature)
+        return feature
+
+    def _parse_all(self):
+        if self._record is not None:
+            for index in range(len(self)):
+                self._feature(index)
+            self._record = None
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, long)):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("list index out of range")
+            return self._feature(index)
+        self._parse_all()
+        return list.__getitem__(self, index)
+
+    def __getslice__(self, i, j):
+        self._parse_all()
+        return list.__getslice__(self, i, j)
+
+    def __iter__(self):
+        if self._record is None:
+            return list.__iter__(self)
+        return (self._feature(index) for index in range(len(self)))
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def __reduce_ex__(self, protocol):
+        return self.__reduce__()
+
+
+def _parse_all_first(name):
+    """Wraps a list method to parse all the features first (PRIVATE)."""
+    method = getattr(list, name)
+
+    def wrapper(self, *args):
+        self._parse_all()
+        return method(self, *args)
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+for _name in ["__add__", "__contains__", "__delitem__", "__delslice__",
+              "__eq__", "__ge__", "__gt__", "__iadd__", "__imul__", "__le__",
+              "__lt__", "__mul__", "__ne__", "__repr__", "__reversed__",
+              "__rmul__", "__setitem__", "__setslice__", "append", "count",
+              "extend", "index", "insert", "pop", "remove", "reverse",
+              "sort"]:
+    setattr(_LazyFeatureList, _name, _parse_all_first(_name))
+del _name
+
+
+class _LazyInsdcRecord(SeqRecord):
+    """SeqRecord for a GenBank/EMBL entry, parsed as needed (PRIVATE).
+
+    Created from the raw text of the record. The attributes are filled in
+    by __getattr__ when they are first used, so they can be replaced or
+    modified as with any other SeqRecord.
+    """
+    def __init__(self, text, format, alphabet=None):
+        #Deliberately not calling SeqRecord.__init__
+        self._text = text
+        self._format = format
+        self._alphabet = alphabet
+        self._scanner = _formats[format][0](debug=0)
+        self._offsets = None
+        #Sequence length and type from the header, needed for the features
+        self._feature_state = None
+
+    def __getattr__(self, name):
+        #Only called for attributes which have not been set yet
+        if name in _header_attributes:
+            self._parse_header()
+        elif name in _sequence_attributes:
+            self._parse_sequence()
+        elif name == "features":
+            header_end, footer_start = self._split()
+            if self._feature_state is None:
+                self._parse_header()
+            starts = _feature_starts(self._text, header_end, footer_start,
+                                     self._scanner)
+            self.features = _LazyFeatureList(self, starts, footer_start)
+        else:
+            raise AttributeError(name)
+        return self.__dict__[name]
+
+    def __getitem__(self, index):
+        """Returns a sub-sequence or an individual letter.
+
+        Slicing gives a plain SeqRecord (with all the features parsed).
+        """
+        if isinstance(index, int):
+            return self.seq[index]
+        #The base class would try to create another _LazyInsdcRecord
+        record = SeqRecord(self.seq, self.id, self.name, self.description,
+                           self.dbxrefs, list(self.features), self.annotations,
+                           self.letter_annotations)
+        return record[index]
+
+    def __repr__(self):
+        #Look like a normal SeqRecord, rather than using this class name
+        return "SeqRecord" + SeqRecord.__repr__(self)[len(self.__class__.__name__):]
+
+    def _split(self):
+        if self._offsets is None:
+            self._offsets = _split_record(self._text, self._scanner)
+        return self._offsets
+
+    def _consume(self, text):
+        """Parse the text with the scanner, returns the consumer (PRIVATE)."""
+        consumer = _FeatureConsumer(use_fuzziness=1,
+                                    feature_cleaner=FeatureValueCleaner())
+        if not self._scanner.feed(StringIO(text), consumer):
+            raise ValueError("Could not parse record")
+        return consumer
+
+    def _parse_header(self):
+        """Parse everything except the features and sequence (PRIVATE)."""
+        scanner, contig, no_sequence = _formats[self._format]
+        header_end, footer_start = self._split()
+        if self._text.find("\n" + contig, footer_start - 1) != -1:
+            #Contig records don't usually include the sequence anyway
+            no_sequence = self._text[footer_start:]
+        consumer = self._consume(self._text[:header_end] + no_sequence)
+        self._feature_state = consumer._expected_size, consumer._seq_type
+        record = consumer.data
+        for name in _header_attributes:
+            if name not in self.__dict__:
+                setattr(self, name, getattr(record, name))
+
+    def _parse_sequence(self):
+        """Parse the sequence, skipping the features (PRIVATE)."""
+        header_end, footer_start = self._split()
+        record = self._consume(self._text[:header_end] +
+                               self._text[footer_start:]).data
+        if self._alphabet is not None:
+            record = SeqIO._force_alphabet(iter([record]),
+                                           self._alphabet).next()
+        self._seq = record.seq
+        self._per_letter_annotations = record._per_letter_annotations
+
+    def _parse_feature(self, start, end):
+        """Parse one feature, given its offsets in the record (PRIVATE)."""
+        scanner = self._scanner
+        scanner.set_handle(StringIO(self._text[start:end] +
+                                    scanner.SEQUENCE_HEADERS[0] + "\n"))
+        scanner.line = scanner.FEATURE_START_MARKERS[0]
+        features = scanner.parse_features()
+        assert len(features) == 1, features
+        consumer = _FeatureConsumer(use_fuzziness=1,
+                                    feature_cleaner=FeatureValueCleaner())
+        consumer._expected_size, consumer._seq_type = self._feature_state
+        scanner._feed_feature_table(consumer, features)
+        return consumer.data.features[0]
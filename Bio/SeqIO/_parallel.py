@@ -0,0 +1,363 @@
+# Copyright 2013 by Peter Cock.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+"""Parallel parsing of FASTA and FASTQ files in byte ranges (PRIVATE).
+
+You are not expected to access this module, or any of its code, directly. This
+is all handled internally by the Bio.SeqIO.parallel_map(...) function which is
+the public interface for this functionality.
+
+The file is split into byte ranges, each of which is parsed in a separate
+process. A range starts and ends part way through a record, so each worker
+first has to find the first record starting in its range (and the first
+record starting in the next range, which is where it stops). The rule used
+is that a record belongs to the range holding the new line character just
+before its title line (and the first record to the first range). Given a
+range boundary, we can therefore skip to the end of the current line, and
+then look for the start of a record.
+
+For FASTA this just means the next line starting with ">", but with FASTQ
+a quality line can also start with "@", so the candidate record is checked
+by parsing it (including that the next line starts a record, or is the end
+of the file). This is only reliable for the usual four line FASTQ records,
+since a run of wrapped quality lines could look like a complete record.
+Therefore when a FASTQ file is split into more than one range, each range
+checks it had four lines per record, and raises a ValueError otherwise.
+
+For BGZF compressed files, the byte ranges are in the compressed file, and
+each boundary is moved forward to the start of a BGZF block. The records
+are then found in the decompressed data from that block on.
+"""
+
+import os
+import struct
+from StringIO import StringIO
+
+from Bio._py3k import _as_bytes, _bytes_to_string
+
+from Bio import bgzf
+from Bio.SeqIO.FastaIO import SimpleFastaParser
+from Bio.SeqIO.QualityIO import FastqGeneralIterator
+
+
+_parsers = {"fasta": SimpleFastaParser,
+            "fastq": FastqGeneralIterator,
+            "fastq-sanger": FastqGeneralIterator,
+            "fastq-solexa": FastqGeneralIterator,
+            "fastq-illumina": FastqGeneralIterator,
+            }
+
+_at_char = _as_bytes("@")
+_plus_char = _as_bytes("+")
+_gt_char = _as_bytes(">")
+_new_line = _as_bytes("\n")
+_gzip_magic = _as_bytes("\x1f\x8b")
+_bgzf_header = _as_bytes("\x1f\x8b\x08\x04")
+_bytes_BC = _as_bytes("BC")
+
+
+def _is_bgzf(filename):
+    """Does the file start with a BGZF block header (PRIVATE)?
+
+    Raises a ValueError for any other gzip file, which can't be split
+    into byte ranges.
+    """
+    handle = open(filename, "rb")
+    try:
+        data = handle.read(16)
+    finally:
+        handle.close()
+    if data[:4] == _bgzf_header and data[12:14] == _bytes_BC:
+        return True
+    if data[:2] == _gzip_magic:
+        raise ValueError("File %r is gzip compressed, but parallel_map "
+                         "requires BGZF compression (e.g. from bgzip)"
+                         % filename)
+    return False
+
+
+def _bgzf_block_at(data, i):
+    """Raw length of the BGZF block starting at data[i:], or None (PRIVATE).
+
+    Assumes the block header is the usual one written by samtools and
+    Biopython, with the BC field as the only extra field.
+    """
+    if data[i:i + 4] != _bgzf_header or data[i + 12:i + 14] != _bytes_BC \
+            or len(data) < i + 18:
+        return None
+    return struct.unpack("<H", data[i + 16:i + 18])[0] + 1
+
+
+def _bgzf_block_sync(handle, offset, size):
+    """Start of the first BGZF block at or after this raw offset (PRIVATE).
+
+    Returns the file size if there are no more blocks. As the header could
+    appear by chance in the compressed data, a candidate is only accepted
+    if it is followed by another block header (or the end of the file).
+    """
+    chunk = 1 << 17
+    while offset < size:
+        handle.seek(offset)
+        #Room for the next header after a maximum size block
+        data = handle.read(chunk + 65536 + 18)
+        i = 0
+        while True:
+            i = data.find(_bgzf_header, i)
+            if i == -1 or i >= chunk:
+                break
+            block_size = _bgzf_block_at(data, i)
+            if block_size:
+                if offset + i + block_size == size \
+                        or _bgzf_block_at(data, i + block_size):
+                    return offset + i
+            i += 1
+        offset += chunk
+    return size
+
+
+def _fastq_record_at(lines):
+    """Do these lines start with a complete FASTQ record (PRIVATE)?
+
+    The lines should be an iterator, returning an empty string at the end
+    of the file. This uses the same rules as FastqGeneralIterator, and
+    also checks the following line is the end of the file or starts with
+    "@" (and that no sequence line does).
+    """
+    line = lines.next()
+    if not line.startswith(_at_char):
+        return False
+    title = line[1:].rstrip()
+    line = lines.next()
+    if not line or line.startswith(_at_char):
+        return False
+    seq_len = len(line.rstrip())
+    while True:
+        line = lines.next()
+        if not line or line.startswith(_at_char):
+            return False
+        if line.startswith(_plus_char):
+            break
+        seq_len += len(line.rstrip())
+    second_title = line[1:].rstrip()
+    if second_title and second_title != title:
+        return False
+    qual_len = len(lines.next().rstrip())
+    while qual_len < seq_len:
+        line = lines.next()
+        if not line:
+            return False
+        qual_len += len(line.rstrip())
+    if qual_len != seq_len:
+        return False
+    line = lines.next()
+    return not line or line.startswith(_at_char)
+
+
+def _record_sync(handle, offset, format):
+    """Offset of the first record belonging to the range from here (PRIVATE).
+
+    The offset is a BGZF virtual offset if the handle is a BgzfReader.
+    Returns None if there are no more records in the file.
+    """
+    if not offset:
+        return 0
+    handle.seek(offset)
+    #Skip to the end of this line, the next line is the first candidate
+    handle.readline()
+    if format == "fasta":
+        while True:
+            start = handle.tell()
+            line = handle.readline()
+            if not line:
+                return None
+            if line.startswith(_gt_char):
+                return start
+    #FASTQ, need to look ahead so keep the lines and their offsets
+    window = []
+
+    def lines_from(i):
+        while True:
+            if i == len(window):
+                window.append((handle.tell(), handle.readline()))
+            yield window[i][1]
+            i += 1
+
+    i = 0
+    while True:
+        lines = lines_from(i)
+        line = lines.next()
+        if not line:
+            return None
+        if line.startswith(_at_char) and _fastq_record_at(lines_from(i)):
+            return window[i][0]
+        i += 1
+
+
+def _map_range(task):
+    """Parse the records in one byte range, applying function (PRIVATE).
+
+    This is run in the worker processes. The task is a tuple of filename,
+    format, BGZF flag, start and end offsets, the function to apply to
+    each record, and the optional reduce function. If there is no reduce
+    function, returns a list of the function's results. Otherwise returns
+    a tuple of the reduced value and a count of the records.
+    """
+    filename, format, is_bgzf, start, end, function, reduce = task
+    size = os.path.getsize(filename)
+    if is_bgzf:
+        raw = open(filename, "rb")
+        try:
+            start = _bgzf_block_sync(raw, start, size)
+            end = _bgzf_block_sync(raw, end, size)
+        finally:
+            raw.close()
+        if start == end:
+            return _reduce_records([], function, reduce)
+        handle = bgzf.BgzfReader(filename, "rb")
+        #Block boundaries as virtual offsets
+        start = start << 16
+        if end < size:
+            end = end << 16
+        else:
+            end = None
+    else:
+        handle = open(filename, "rb")
+        if end >= size:
+            end = None
+    try:
+        first = _record_sync(handle, start, format)
+        if first is None:
+            return _reduce_records([], function, reduce)
+        if end is not None:
+            end = _record_sync(handle, end, format)
+        handle.seek(first)
+        if not is_bgzf:
+            if end is None:
+                data = handle.read()
+            else:
+                data = handle.read(end - first)
+        else:
+            #Can't subtract virtual offsets, read up to the end line by line
+            lines = []
+            while end is None or handle.tell() < end:
+                line = handle.readline()
+                if not line:
+                    break
+                lines.append(line)
+            data = _as_bytes("").join(lines)
+    finally:
+        handle.close()
+    records = _parsers[format](StringIO(_bytes_to_string(data)))
+    if format != "fasta" and (start or end is not None):
+        #Only part of the file, so we relied on finding the record starts
+        records = _check_four_line_fastq(records, data)
+    return _reduce_records(records, function, reduce)
+
+
+def _check_four_line_fastq(records, data):
+    """Pass on FASTQ records, checking there were four lines each (PRIVATE).
+
+    Raises a ValueError at the end if the number of lines in the data is not
+    four times the number of records (i.e. the FASTQ was line wrapped), as
+    in that case the start of the range could have been misidentified.
+    """
+    count = 0
+    for record in records:
+        count += 1
+        yield record
+    #Ignore any trailing blank lines at the end of the file
+    data = data.rstrip()
+    if data:
+        lines = data.count(_new_line) + 1
+    else:
+        lines = 0
+    if lines != 4 * count:
+        raise ValueError("Line wrapped FASTQ files can't be split into byte "
+                         "ranges (found %i records in %i lines), use a "
+                         "chunk_size larger than the file" % (count, lines))
+
+
+def _reduce_records(records, function, reduce):
+    """Apply the function to the records, and reduce if needed (PRIVATE)."""
+    if reduce is None:
+        return [function(record) for record in records]
+    count = 0
+    value = None
+    for record in records:
+        if count:
+            value = reduce(value, function(record))
+        else:
+            value = function(record)
+        count += 1
+    return value, count
+
+
+def _tasks(filename, format, function, reduce, chunk_size):
+    """Split the file into byte ranges, returning the worker tasks (PRIVATE)."""
+    size = os.path.getsize(filename)
+    is_bgzf = _is_bgzf(filename)
+    starts = range(0, size, chunk_size) or [0]
+    ends = starts[1:] + [size]
+    return [(filename, format, is_bgzf, start, end, function, reduce)
+            for start, end in zip(starts, ends)]
+
+
+def parallel_map(filename, format, function, reduce=None, processes=None,
+                 chunk_size=16777216):
+    """Implements Bio.SeqIO.parallel_map (PRIVATE), see that for details."""
+    if format not in _parsers:
+        raise ValueError("Unsupported format %r, parallel_map only works with "
+                         "FASTA and FASTQ files" % format)
+    tasks = _tasks(filename, format, function, reduce, chunk_size)
+    if processes is None or processes > 1:
+        try:
+            import multiprocessing
+        except ImportError:
+            #Python 2.5
+            from Bio import MissingPythonDependencyError
+            raise MissingPythonDependencyError("Parallel parsing requires "
+                                               "multiprocessing, which is "
+                                               "included in Python 2.6+")
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+    if processes > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(min(processes, len(tasks)))
+        results = pool.imap(_map_range, tasks)
+    else:
+        pool = None
+        results = (_map_range(task) for task in tasks)
+    if reduce is None:
+        #The generator will shut down the pool when done
+        return _flatten(pool, results)
+    try:
+        return _reduce_results(results, reduce)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def _flatten(pool, results):
+    """Generator giving the function's results in file order (PRIVATE)."""
+    try:
+        for values in results:
+            for value in values:
+                yield value
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def _reduce_results(results, reduce):
+    """Combine the reduced values from each range (PRIVATE)."""
+    count = 0
+    value = None
+    for range_value, range_count in results:
+        if not range_count:
+            continue
+        if count:
+            value = reduce(value, range_value)
+        else:
+            value = range_value
+        count += range_count
+    return value
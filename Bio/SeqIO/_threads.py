@@ -0,0 +1,73 @@
+# Copyright 2013 by Peter Cock.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+"""Reading records in a background thread (PRIVATE).
+
+You are not expected to access this module, or any of its code, directly.
+This is used internally by Bio.SeqIO.parse(...) with the prefetch argument,
+and by the Bio.SeqIO.QualityIO.PairedFastqIterator function.
+"""
+
+import sys
+
+
+def _reraise(exc_info):
+    """Raise an exception again, with its original traceback (PRIVATE).
+
+    Takes the tuple from sys.exc_info(), e.g. saved in another thread.
+    """
+    if sys.version_info[0] >= 3:
+        #The exception object holds its own traceback
+        raise exc_info[1]
+    raise exc_info[0], exc_info[1], exc_info[2]
+
+
+class _ChunkReader(object):
+    """Reads chunks of records from an iterator in a background thread (PRIVATE).
+
+    The chunks (lists of records, or FastqBatch objects) are put on a
+    bounded queue, followed by None at the end of the file. Any exception
+    from the iterator is passed on to the consumer via the get method.
+    """
+    def __init__(self, chunks, queue_size):
+        import threading
+        from Queue import Queue
+        self._chunks = chunks
+        self._queue = Queue(queue_size)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def _put(self, item):
+        from Queue import Full
+        while not self._stop.isSet():
+            try:
+                self._queue.put(item, True, 0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def _run(self):
+        try:
+            for chunk in self._chunks:
+                if not self._put((chunk, None)):
+                    return
+        except Exception:
+            self._put((None, sys.exc_info()))
+        else:
+            self._put((None, None))
+
+    def get(self):
+        """Returns the next chunk, or None at the end of the file."""
+        chunk, exc_info = self._queue.get()
+        if exc_info is not None:
+            _reraise(exc_info)
+        return chunk
+
+    def close(self):
+        """Stop the background thread."""
+        self._stop.set()
+        self._thread.join()
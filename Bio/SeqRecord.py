@@ -830,7 +830,13 @@ class SeqRecord(object):
         #Can append matching per-letter-annotation
         for k, v in self.letter_annotations.iteritems():
             if k in other.letter_annotations:
-                answer.letter_annotations[k] = v + other.letter_annotations[k]
+                w = other.letter_annotations[k]
+                if hasattr(v, "dtype") or hasattr(w, "dtype"):
+                    #NumPy arrays would be added element by element
+                    import numpy
+                    answer.letter_annotations[k] = numpy.concatenate([v, w])
+                else:
+                    answer.letter_annotations[k] = v + w
         return answer
 
     def __radd__(self, other):
@@ -221,8 +221,12 @@ NC_000932.1
 
 """
 
+from __future__ import with_statement
+
+import sys
 import zlib
 import struct
+import threading
 import __builtin__  # to access the usual open function
 
 from Bio._py3k import _as_bytes, _as_string
@@ -239,12 +243,16 @@ _empty_bytes_string = _as_bytes("")
 _bytes_newline = _as_bytes("\n")
 
 
-def open(filename, mode="rb"):
-    """Open a BGZF file for reading, writing or appending."""
+def open(filename, mode="rb", threads=1):
+    """Open a BGZF file for reading, writing or appending.
+
+    The optional threads argument is passed to the BgzfReader or the
+    BgzfWriter, to decompress or compress the blocks in parallel.
+    """
     if "r" in mode.lower():
-        return BgzfReader(filename, mode)
+        return BgzfReader(filename, mode, threads=threads)
     elif "w" in mode.lower() or "a" in mode.lower():
-        return BgzfWriter(filename, mode)
+        return BgzfWriter(filename, mode, threads=threads)
     else:
         raise ValueError("Bad mode %r" % mode)
 
@@ -390,6 +398,19 @@ def BgzfBlocks(handle):
 
 def _load_bgzf_block(handle, text_mode=False):
     """Internal function to load the next BGZF function (PRIVATE)."""
+    block_size, deflated, expected_crc, expected_size = \
+        _read_bgzf_block(handle)
+    return block_size, _inflate_bgzf_block(deflated, expected_crc,
+                                           expected_size, text_mode)
+
+
+def _read_bgzf_block(handle):
+    """Internal function to read the next raw BGZF block (PRIVATE).
+
+    Returns the raw block length, the deflated data, the CRC and the size
+    of the uncompressed data, leaving the decompression (which is the
+    slow part) to the _inflate_bgzf_block function.
+    """
     magic = handle.read(4)
     if not magic:
         #End of file
@@ -416,10 +437,17 @@ def _load_bgzf_block(handle, text_mode=False):
     assert block_size is not None, "Missing BC, this isn't a BGZF file!"
     #Now comes the compressed data, CRC, and length of uncompressed data.
     deflate_size = block_size - 1 - extra_len - 19
-    d = zlib.decompressobj(-15)  # Negative window size means no headers
-    data = d.decompress(handle.read(deflate_size)) + d.flush()
+    deflated = handle.read(deflate_size)
     expected_crc = handle.read(4)
     expected_size = struct.unpack("<I", handle.read(4))[0]
+    return block_size, deflated, expected_crc, expected_size
+
+
+def _inflate_bgzf_block(deflated, expected_crc, expected_size,
+                        text_mode=False):
+    """Internal function to decompress and check a raw BGZF block (PRIVATE)."""
+    d = zlib.decompressobj(-15)  # Negative window size means no headers
+    data = d.decompress(deflated) + d.flush()
     assert expected_size == len(data), \
            "Decompressed to %i, not %i" % (len(data), expected_size)
     #Should cope with a mix of Python platforms...
@@ -431,9 +459,209 @@ def _load_bgzf_block(handle, text_mode=False):
     assert expected_crc == crc, \
            "CRC is %s, not %s" % (crc, expected_crc)
     if text_mode:
-        return block_size, _as_string(data)
+        return _as_string(data)
     else:
-        return block_size, data
+        return data
+
+
+class _BlockCache(object):
+    """Least recently used cache of decompressed BGZF blocks (PRIVATE).
+
+    Keyed on the raw block start offset, the values are tuples of the
+    decompressed data and the raw block length. A dictionary is used to
+    look up the nodes of a circular doubly linked list, which holds the
+    blocks from least to most recently used.
+    """
+    def __init__(self):
+        self._map = {}
+        #Each node is a list [previous, next, key, value]
+        self._root = root = []
+        root[:] = [root, root, None, None]
+        self.size = 0
+
+    def __len__(self):
+        return len(self._map)
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def get(self, key):
+        """Returns the value (marking it as most recently used), or None."""
+        node = self._map.get(key)
+        if node is None:
+            return None
+        #Unlink it, and put it back at the most recently used end
+        prev, next = node[0], node[1]
+        prev[1] = next
+        next[0] = prev
+        root = self._root
+        last = root[0]
+        node[0], node[1] = last, root
+        last[1] = root[0] = node
+        return node[3]
+
+    def put(self, key, value):
+        """Adds a new value as the most recently used."""
+        assert key not in self._map
+        root = self._root
+        last = root[0]
+        last[1] = root[0] = self._map[key] = [last, root, key, value]
+        self.size += len(value[0])
+
+    def shrink(self, max_blocks, max_size=None):
+        """Drops least recently used blocks (but never the latest block)."""
+        root = self._root
+        while len(self._map) > 1 and (len(self._map) > max_blocks or
+                                      (max_size and self.size > max_size)):
+            node = root[1]
+            root[1] = node[1]
+            node[1][0] = root
+            del self._map[node[2]]
+            self.size -= len(node[3][0])
+
+
+class _BlockReadAhead(object):
+    """Decompresses the next few BGZF blocks in background threads (PRIVATE).
+
+    The threads work through the blocks following the offset given to
+    start_from, keeping up to count of them which the reader can then
+    collect using get. This lets the reader's own processing (e.g. parsing
+    records) overlap with the decompression, which is done in zlib without
+    holding the GIL.
+
+    Each thread has its own handle to the file. Only one thread at a time
+    reads a raw block (which is needed to find where the next block starts),
+    but any number of them can be decompressing the blocks already read.
+    The reader always collects the blocks in order.
+    """
+    def __init__(self, filename, count, text_mode=False, threads=1):
+        self.count = count
+        self._text = text_mode
+        self._cond = threading.Condition()
+        self._blocks = {}
+        #Blocks being decompressed, offset to raw length
+        self._busy = {}
+        #Block being read from disk, offset of next block not yet known
+        self._reading = None
+        self._from = None
+        self._eof = None
+        self._closed = False
+        self._threads = []
+        for i in range(threads):
+            handle = __builtin__.open(filename, "rb")
+            thread = threading.Thread(target=self._run, args=(handle,))
+            thread.setDaemon(True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _window(self):
+        """Yields the offsets of the wanted blocks, in order (PRIVATE).
+
+        Stops at the first block not yet read (or being read), so the
+        last offset is the next block to read unless it is in hand.
+        Assumes the condition's lock is held.
+        """
+        offset = self._from
+        blocks = self._blocks
+        busy = self._busy
+        for i in range(self.count):
+            if offset is None or offset == self._eof:
+                return
+            yield offset
+            if offset in blocks:
+                offset += blocks[offset][1]
+            elif offset in busy:
+                offset += busy[offset]
+            else:
+                return
+
+    def _next_wanted(self):
+        """Offset of the next block to read, or None (PRIVATE).
+
+        Assumes the condition's lock is held.
+        """
+        if self._reading is not None:
+            #Must wait to find out where the following block starts
+            return None
+        for offset in self._window():
+            if offset not in self._blocks and offset not in self._busy:
+                return offset
+        return None
+
+    def _run(self, handle):
+        cond = self._cond
+        try:
+            while True:
+                with cond:
+                    while True:
+                        if self._closed:
+                            return
+                        offset = self._next_wanted()
+                        if offset is not None:
+                            break
+                        cond.wait()
+                    self._reading = offset
+                try:
+                    handle.seek(offset)
+                    raw = _read_bgzf_block(handle)
+                except Exception:
+                    #EOF (StopIteration), or leave any error for the reader
+                    #to run into (and report) itself
+                    raw = None
+                with cond:
+                    self._reading = None
+                    if raw is None:
+                        self._eof = offset
+                    else:
+                        self._busy[offset] = raw[0]
+                    cond.notify_all()
+                if raw is None:
+                    continue
+                try:
+                    data = _inflate_bgzf_block(raw[1], raw[2], raw[3],
+                                               self._text)
+                except Exception:
+                    data = None
+                with cond:
+                    del self._busy[offset]
+                    if data is None:
+                        #Don't read beyond the bad block
+                        self._eof = offset
+                    elif offset in self._window():
+                        self._blocks[offset] = data, raw[0]
+                    cond.notify_all()
+        finally:
+            handle.close()
+
+    def start_from(self, offset):
+        """Read ahead from this offset, dropping blocks no longer wanted."""
+        with self._cond:
+            if offset == self._from:
+                return
+            self._from = offset
+            old = self._blocks
+            self._blocks = blocks = {}
+            while offset in old and len(blocks) < self.count:
+                blocks[offset] = old[offset]
+                offset += old[offset][1]
+            self._cond.notify_all()
+
+    def get(self, offset):
+        """Returns the data and raw length of this block if ready, or None.
+
+        If this block is currently being read or decompressed, waits for it.
+        """
+        with self._cond:
+            while self._reading == offset or offset in self._busy:
+                self._cond.wait()
+            return self._blocks.pop(offset, None)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
 
 
 class BgzfReader(object):
@@ -497,15 +725,51 @@ class BgzfReader(object):
     Note that you can use the max_cache argument to limit the number of
     BGZF blocks cached in memory. The default is 100, and since each
     block can be up to 64kb, the default cache could take up to 6MB of
-    RAM. The cache is not important for reading through the file in one
-    pass, but is important for improving performance of random access.
+    RAM. You can also limit the total size of the decompressed data held
+    in the cache with the max_cache_size argument (in bytes). When full,
+    the least recently used block is dropped. The cache is not important
+    for reading through the file in one pass, but is important for
+    improving performance of random access. The cache_hits and
+    cache_misses attributes count how often a block was found in memory,
+    or had to be read from disk and decompressed:
+
+    >>> handle = BgzfReader("SamBam/ex1.bam", "rb", max_cache=2)
+    >>> for start in [0, 18239, 0, 36462, 0]:
+    ...     offset = handle.seek(make_virtual_offset(start, 0))
+    >>> print handle.cache_hits, handle.cache_misses
+    2 3
+    >>> handle.close()
+
+    For reading through a file in one pass, the read_ahead argument can
+    be used to have a background thread decompress up to this many of
+    the following blocks, while you process the current block. This
+    needs the filename (or a handle to a file on disk) so that the
+    thread can open its own handle. Please close the reader when done
+    to stop the background thread.
+
+    On a machine with several cores, reading through the file can be
+    limited by the speed of decompressing one block at a time. The
+    threads argument gives a pool of that many background threads to
+    decompress the following blocks in parallel (while still returning
+    the data in order). If read_ahead is not given, it defaults to four
+    times the number of threads, e.g.
+
+    >>> handle = BgzfReader("SamBam/ex1.bam", "rb", threads=2)
+    >>> print len(handle.read(100000))
+    100000
+    >>> handle.close()
     """
 
-    def __init__(self, filename=None, mode="r", fileobj=None, max_cache=100):
+    def __init__(self, filename=None, mode="r", fileobj=None, max_cache=100,
+                 max_cache_size=None, read_ahead=0, threads=1):
         #TODO - Assuming we can seek, check for 28 bytes EOF empty block
         #and if missing warn about possible truncation (as in samtools)?
         if max_cache < 1:
             raise ValueError("Use max_cache with a minimum of 1")
+        if threads < 1:
+            raise ValueError("Use threads with a minimum of 1")
+        if threads > 1 and not read_ahead:
+            read_ahead = 4 * threads
         #Must open the BGZF file in binary mode, but we may want to
         #treat the contents as either text or binary (unicode or
         #bytes under Python 3)
@@ -525,9 +789,21 @@ class BgzfReader(object):
             self._newline = _bytes_newline
         self._handle = handle
         self.max_cache = max_cache
-        self._buffers = {}
+        self.max_cache_size = max_cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._buffers = _BlockCache()
         self._block_start_offset = None
         self._block_raw_length = None
+        if read_ahead:
+            try:
+                name = handle.name
+            except AttributeError:
+                raise ValueError("Using read_ahead needs a file on disk")
+            self._read_ahead = _BlockReadAhead(name, read_ahead, self._text,
+                                               threads)
+        else:
+            self._read_ahead = None
         self._load_block(handle.tell())
 
     def _load_block(self, start_offset=None):
@@ -539,34 +815,36 @@ class BgzfReader(object):
         if start_offset == self._block_start_offset:
             self._within_block_offset = 0
             return
-        elif start_offset in self._buffers:
+        block = self._buffers.get(start_offset)
+        if block is not None:
             #Already in cache
-            self._buffer, self._block_raw_length = self._buffers[start_offset]
-            self._within_block_offset = 0
-            self._block_start_offset = start_offset
-            return
-        #Must hit the disk... first check cache limits,
-        while len(self._buffers) >= self.max_cache:
-            #TODO - Implemente LRU cache removal?
-            self._buffers.popitem()
-        #Now load the block
-        handle = self._handle
-        if start_offset is not None:
-            handle.seek(start_offset)
-        self._block_start_offset = handle.tell()
-        try:
-            block_size, self._buffer = _load_bgzf_block(handle, self._text)
-        except StopIteration:
-            #EOF
-            block_size = 0
-            if self._text:
-                self._buffer = ""
+            self.cache_hits += 1
+        else:
+            if self._read_ahead is not None:
+                block = self._read_ahead.get(start_offset)
+            if block is not None:
+                self.cache_hits += 1
             else:
-                self._buffer = _empty_bytes_string
+                #Must hit the disk...
+                self.cache_misses += 1
+                handle = self._handle
+                handle.seek(start_offset)
+                try:
+                    block = _load_bgzf_block(handle, self._text)[::-1]
+                except StopIteration:
+                    #EOF
+                    if self._text:
+                        block = "", 0
+                    else:
+                        block = _empty_bytes_string, 0
+            #Save the block in our cache, dropping old blocks if needed
+            self._buffers.put(start_offset, block)
+            self._buffers.shrink(self.max_cache, self.max_cache_size)
+        self._buffer, self._block_raw_length = block
+        self._block_start_offset = start_offset
         self._within_block_offset = 0
-        self._block_raw_length = block_size
-        #Finally save the block in our cache,
-        self._buffers[self._block_start_offset] = self._buffer, block_size
+        if self._read_ahead is not None:
+            self._read_ahead.start_from(start_offset + self._block_raw_length)
 
     def tell(self):
         """Returns a 64-bit unsigned BGZF virtual offset."""
@@ -620,46 +898,56 @@ class BgzfReader(object):
             self._within_block_offset += size
             assert data  # Must be at least 1 byte
             return data
-        else:
+        #Spans several blocks, loop rather than recurse as a long read
+        #of a file with many small blocks could hit the recursion limit
+        chunks = []
+        while True:
             data = self._buffer[self._within_block_offset:]
             size -= len(data)
+            chunks.append(data)
             self._load_block()  # will reset offsets
             #TODO - Test with corner case of an empty block followed by
             #a non-empty block
-            if not self._buffer:
-                return data  # EOF
-            elif size:
-                #TODO - Avoid recursion
-                return data + self.read(size)
-            else:
-                #Only needed the end of the last block
-                return data
+            if not self._buffer or not size:
+                #EOF, or only needed the end of the last block
+                break
+            elif size <= len(self._buffer):
+                chunks.append(self._buffer[:size])
+                self._within_block_offset = size
+                break
+        return self._join(chunks)
 
     def readline(self):
-        i = self._buffer.find(self._newline, self._within_block_offset)
-        #Three cases to consider,
-        if i==-1:
-            #No newline, need to read in more data
-            data = self._buffer[self._within_block_offset:]
-            self._load_block()  # will reset offsets
-            if not self._buffer:
-                return data  # EOF
+        chunks = []
+        while True:
+            i = self._buffer.find(self._newline, self._within_block_offset)
+            #Three cases to consider,
+            if i==-1:
+                #No newline, need to read in more data
+                chunks.append(self._buffer[self._within_block_offset:])
+                self._load_block()  # will reset offsets
+                if not self._buffer:
+                    break  # EOF
+            elif i + 1 == len(self._buffer):
+                #Found new line, but right at end of block (SPECIAL)
+                chunks.append(self._buffer[self._within_block_offset:])
+                #Must now load the next block to ensure tell() works
+                self._load_block()  # will reset offsets
+                break
             else:
-                #TODO - Avoid recursion
-                return data + self.readline()
-        elif i + 1 == len(self._buffer):
-            #Found new line, but right at end of block (SPECIAL)
-            data = self._buffer[self._within_block_offset:]
-            #Must now load the next block to ensure tell() works
-            self._load_block()  # will reset offsets
-            assert data
-            return data
+                #Found new line, not at end of block (easy case, no IO)
+                chunks.append(self._buffer[self._within_block_offset:i+1])
+                self._within_block_offset = i + 1
+                break
+        if len(chunks) == 1:
+            return chunks[0]
+        return self._join(chunks)
+
+    def _join(self, chunks):
+        if self._text:
+            return "".join(chunks)
         else:
-            #Found new line, not at end of block (easy case, no IO)
-            data = self._buffer[self._within_block_offset:i+1]
-            self._within_block_offset = i + 1
-            #assert data.endswith(self._newline)
-            return data
+            return _empty_bytes_string.join(chunks)
 
     def next(self):
         line = self.readline()
@@ -671,6 +959,9 @@ class BgzfReader(object):
         return self
 
     def close(self):
+        if self._read_ahead is not None:
+            self._read_ahead.close()
+            self._read_ahead = None
         self._handle.close()
         self._buffer = None
         self._block_start_offset = None
@@ -686,9 +977,123 @@ class BgzfReader(object):
         return self._handle.fileno()
 
 
+def _make_bgzf_block(block, compresslevel=6):
+    """Compress the data (at most 64kb) into a BGZF block (PRIVATE)."""
+    assert len(block) <= 65536
+    #Giving a negative window bits means no gzip/zlib headers, -15 used in samtools
+    c = zlib.compressobj(compresslevel,
+                         zlib.DEFLATED,
+                         -15,
+                         zlib.DEF_MEM_LEVEL,
+                         0)
+    compressed = c.compress(block) + c.flush()
+    del c
+    assert len(compressed) < 65536, "TODO - Didn't compress enough, try less data in this block"
+    bsize = struct.pack("<H", len(compressed)+25)  # includes -1
+    crc = struct.pack("<I", zlib.crc32(block) & 0xffffffffL)
+    uncompressed_length = struct.pack("<I", len(block))
+    #Fixed 16 bytes,
+    # gzip magic bytes (4) mod time (4),
+    # gzip flag (1), os (1), extra length which is six (2),
+    # sub field which is BC (2), sub field length of two (2),
+    #Variable data,
+    #2 bytes: block length as BC sub field (2)
+    #X bytes: the data
+    #8 bytes: crc (4), uncompressed data length (4)
+    return _bgzf_header + bsize + compressed + crc + uncompressed_length
+
+
+class _BlockCompressor(object):
+    """Compresses BGZF blocks in a pool of threads, keeping the order (PRIVATE).
+
+    Blocks are numbered as they are submitted, and collect returns the
+    compressed blocks which are ready in that order (so the caller can
+    write them out). This works because zlib releases the GIL while
+    compressing.
+    """
+    def __init__(self, threads):
+        self._cond = threading.Condition()
+        self._todo = []
+        self._done = {}
+        self._submitted = 0
+        self._collected = 0
+        self._error = None
+        self._closed = False
+        self._threads = []
+        for i in range(threads):
+            thread = threading.Thread(target=self._run)
+            thread.setDaemon(True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        cond = self._cond
+        while True:
+            with cond:
+                while not self._todo and not self._closed:
+                    cond.wait()
+                if not self._todo:
+                    return
+                index, block, compresslevel = self._todo.pop(0)
+            try:
+                data = _make_bgzf_block(block, compresslevel)
+                exc_info = None
+            except Exception:
+                data = None
+                #Keep the traceback from this thread for collect
+                exc_info = sys.exc_info()
+            with cond:
+                self._done[index] = data
+                if exc_info is not None:
+                    self._error = exc_info
+                cond.notify_all()
+
+    def submit(self, block, compresslevel):
+        with self._cond:
+            self._todo.append((self._submitted, block, compresslevel))
+            self._submitted += 1
+            self._cond.notify_all()
+
+    def collect(self, max_pending=0):
+        """Returns a list of the compressed blocks ready, in order.
+
+        Waits until no more than max_pending blocks are outstanding (by
+        default, waits for all the blocks submitted so far).
+        """
+        blocks = []
+        with self._cond:
+            while True:
+                while self._collected in self._done:
+                    blocks.append(self._done.pop(self._collected))
+                    self._collected += 1
+                if self._error is not None:
+                    from Bio.SeqIO._threads import _reraise
+                    _reraise(self._error)
+                if self._submitted - self._collected <= max_pending:
+                    return blocks
+                self._cond.wait()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+
 class BgzfWriter(object):
+    """BGZF writer, acts like a write only handle but tell differs.
+
+    The data is compressed in blocks of up to 64kb. Using threads greater
+    than one, these blocks are compressed in a pool of background threads
+    (but still written out in order). Calling the tell method has to wait
+    for any outstanding blocks to be written, so for the best performance
+    avoid calling tell more often than needed. Please close the writer
+    when done, which also stops the threads.
+    """
 
-    def __init__(self, filename=None, mode="w", fileobj=None, compresslevel=6):
+    def __init__(self, filename=None, mode="w", fileobj=None, compresslevel=6,
+                 threads=1):
         if fileobj:
             assert filename is None
             handle = fileobj
@@ -704,39 +1109,32 @@ class BgzfWriter(object):
         self._handle = handle
         self._buffer = _empty_bytes_string
         self.compresslevel = compresslevel
+        if threads < 1:
+            raise ValueError("Use threads with a minimum of 1")
+        elif threads > 1:
+            self._compressor = _BlockCompressor(threads)
+            #Limit how many uncompressed blocks can be queued up
+            self._max_pending = 4 * threads
+        else:
+            self._compressor = None
 
     def _write_block(self, block):
         #print "Saving %i bytes" % len(block)
-        start_offset = self._handle.tell()
-        assert len(block) <= 65536
-        #Giving a negative window bits means no gzip/zlib headers, -15 used in samtools
-        c = zlib.compressobj(self.compresslevel,
-                             zlib.DEFLATED,
-                             -15,
-                             zlib.DEF_MEM_LEVEL,
-                             0)
-        compressed = c.compress(block) + c.flush()
-        del c
-        assert len(compressed) < 65536, "TODO - Didn't compress enough, try less data in this block"
-        crc = zlib.crc32(block)
-        #Should cope with a mix of Python platforms...
-        if crc < 0:
-            crc = struct.pack("<i", crc)
-        else:
-            crc = struct.pack("<I", crc)
-        bsize = struct.pack("<H", len(compressed)+25)  # includes -1
-        crc = struct.pack("<I", zlib.crc32(block) & 0xffffffffL)
-        uncompressed_length = struct.pack("<I", len(block))
-        #Fixed 16 bytes,
-        # gzip magic bytes (4) mod time (4),
-        # gzip flag (1), os (1), extra length which is six (2),
-        # sub field which is BC (2), sub field length of two (2),
-        #Variable data,
-        #2 bytes: block length as BC sub field (2)
-        #X bytes: the data
-        #8 bytes: crc (4), uncompressed data length (4)
-        data = _bgzf_header + bsize + compressed + crc + uncompressed_length
-        self._handle.write(data)
+        compressor = self._compressor
+        if compressor is None:
+            self._handle.write(_make_bgzf_block(block, self.compresslevel))
+            return
+        compressor.submit(block, self.compresslevel)
+        #Write any blocks which are ready, waiting if too many outstanding
+        for data in compressor.collect(self._max_pending):
+            self._handle.write(data)
+
+    def _write_pending(self):
+        """Waits for all the queued blocks to be compressed and written."""
+        compressor = self._compressor
+        if compressor is not None:
+            for data in compressor.collect():
+                self._handle.write(data)
 
     def write(self, data):
         #TODO - Check bytes vs unicode
@@ -760,12 +1158,17 @@ class BgzfWriter(object):
             self._buffer = self._buffer[65535:]
         self._write_block(self._buffer)
         self._buffer = _empty_bytes_string
+        self._write_pending()
         self._handle.flush()
 
     def close(self):
         """Flush data, write 28 bytes empty BGZF EOF marker, and close the BGZF file."""
         if self._buffer:
             self.flush()
+        if self._compressor is not None:
+            self._write_pending()
+            self._compressor.close()
+            self._compressor = None
         #samtools will look for a magic EOF marker, just a 28 byte empty BGZF block,
         #and if it is missing warns the BAM file may be truncated. In addition to
         #samtools writing this block, so too does bgzip - so we should too.
@@ -775,6 +1178,7 @@ class BgzfWriter(object):
 
     def tell(self):
         """Returns a BGZF 64-bit virtual offset."""
+        self._write_pending()
         return make_virtual_offset(self._handle.tell(), len(self._buffer))
 
     def seekable(self):
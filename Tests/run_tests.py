@@ -108,6 +108,8 @@ DOCTEST_MODULES = [
                    "Bio.SeqIO.PhdIO",
                    "Bio.SeqIO.QualityIO",
                    "Bio.SeqIO.SffIO",
+                   "Bio.SeqIO.ColumnarIO",
+                   "Bio.SeqIO.UniprotIO",
                    "Bio.SeqFeature",
                    "Bio.SeqRecord",
                    "Bio.SeqUtils",
@@ -6,6 +6,7 @@
 
 import os
 import gzip
+import tempfile
 import unittest
 try:
     import sqlite3
@@ -13,6 +14,7 @@ except ImportError:
     sqlite3 = None
 
 from Bio import SearchIO
+from Bio import bgzf
 from Bio._py3k import _as_bytes
 from Bio.SeqRecord import SeqRecord
 
@@ -81,7 +83,26 @@ class CheckIndex(unittest.TestCase):
                 self.assertNotEqual(id(qres), id(dbidx_qres))
                 self.assertTrue(compare_search_obj(qres, dbidx_qres))
 
+        # fetching many at once, asking for them in reverse order
+        ids = [qres.id for qres in parsed][::-1]
+        dicts = [indexed]
+        if sqlite3 is not None:
+            dicts.append(db_indexed)
+        for rec_dict in dicts:
+            got = list(rec_dict.get_many(ids, keep_order=True))
+            self.assertEqual(ids, [key for key, qres in got])
+            for qres, (key, idx_qres) in zip(parsed[::-1], got):
+                self.assertTrue(compare_search_obj(qres, idx_qres))
+
         indexed.close()
+
+        # compare keys with the compact index
+        compact = SearchIO.index(filename, format, compact=True, **kwargs)
+        self.assertEqual([qres.id for qres in parsed], list(compact))
+        for qres in parsed:
+            self.assertTrue(compare_search_obj(qres, compact[qres.id]))
+        compact.close()
+
         if sqlite3 is not None:
             db_indexed.close()
             db_indexed._con.close()
@@ -90,6 +111,45 @@ class CheckIndex(unittest.TestCase):
             #Do the tests again with the BGZF compressed file
             print "[BONUS %s.bgz]" % filename
             self.check_index(filename + ".bgz", format, **kwargs)
+        elif not filename.endswith(".bgz"):
+            self.check_bgzf_blocks(filename, format, **kwargs)
+
+    def check_bgzf_blocks(self, filename, format, **kwargs):
+        """Index a BGZF copy made of many small blocks, compare get_raw."""
+        # small blocks so results span blocks, and offsets are virtual
+        handle = open(filename, "rb")
+        data = handle.read()
+        handle.close()
+        h, bgzf_tmp = tempfile.mkstemp("_search.bgz")
+        os.close(h)
+        writer = bgzf.BgzfWriter(bgzf_tmp, "wb")
+        for i in range(0, len(data), 97):
+            writer.write(data[i:i + 97])
+            writer.flush()
+        writer.close()
+
+        indexed = SearchIO.index(filename, format, **kwargs)
+        others = [SearchIO.index(bgzf_tmp, format, **kwargs)]
+        if sqlite3 is not None:
+            # the length based get_raw shortcut is used here
+            others.append(SearchIO.index_db(':memory:', [filename],
+                                            format, **kwargs))
+            others.append(SearchIO.index_db(':memory:', [bgzf_tmp],
+                                            format, **kwargs))
+        try:
+            for other in others:
+                self.assertEqual(sorted(indexed), sorted(other))
+                for key in indexed:
+                    self.assertEqual(key, other[key].id)
+                    try:
+                        raw = indexed.get_raw(key)
+                    except NotImplementedError:
+                        continue
+                    self.assertEqual(raw, other.get_raw(key))
+                other.close()
+        finally:
+            indexed.close()
+            os.remove(bgzf_tmp)
 
 def _num_difference(obj_a, obj_b):
     """Returns the number of instance attributes presence only in one object."""
@@ -0,0 +1,131 @@
+# Copyright 2013 by Peter Cock.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Tests for the "columnar" format in Bio.SeqIO.ColumnarIO."""
+
+import os
+import tempfile
+import unittest
+from io import BytesIO
+
+from Bio import SeqIO
+from Bio.Alphabet import generic_dna
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+from Bio.SeqIO.ColumnarIO import ColumnarFile
+
+
+class ColumnarTests(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp(suffix=".col")
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def check(self, filename, format, keys=()):
+        records = list(SeqIO.parse(filename, format))
+        self.assertEqual(len(records),
+                         SeqIO.write(records, self.filename, "columnar"))
+        columns = ColumnarFile(self.filename)
+        self.assertEqual(len(records), len(columns))
+        for i, old in enumerate(records):
+            for new in [columns[i], columns[i - len(records)],
+                        columns[old.id]]:
+                self.assertEqual(old.id, new.id)
+                self.assertEqual(old.description, new.description)
+                self.assertEqual(str(old.seq), str(new.seq))
+                for key in keys:
+                    self.assertEqual(old.letter_annotations[key],
+                                     new.letter_annotations[key])
+            self.assertEqual(i, columns.index(old.id))
+            self.assertTrue(old.id in columns)
+        self.assertEqual([r.id for r in records], list(columns.ids()))
+        self.assertEqual([str(r.seq) for r in records],
+                         [str(r.seq) for r in columns])
+        columns.close()
+        parsed = list(SeqIO.parse(self.filename, "columnar"))
+        self.assertEqual([r.id for r in records], [r.id for r in parsed])
+
+    def test_fasta(self):
+        """Columnar file from FASTA."""
+        self.check("Fasta/f002", "fasta")
+
+    def test_fastq(self):
+        """Columnar file from FASTQ."""
+        self.check("Quality/example.fastq", "fastq", ["phred_quality"])
+        self.check("Quality/solexa_faked.fastq", "fastq-solexa",
+                   ["solexa_quality"])
+
+    def test_genbank(self):
+        """Columnar file from GenBank."""
+        self.check("GenBank/NC_005816.gb", "gb")
+        self.check("GenBank/cor6_6.gb", "gb")
+
+    def test_lookups(self):
+        """Columnar file lookups."""
+        records = [SeqRecord(Seq("ACGT" * i, generic_dna), id="r%i" % i,
+                             description="", letter_annotations={
+                                 "big": range(1000, 1000 + 4 * i),
+                                 "small": [-1] * (4 * i)})
+                   for i in range(100)]
+        SeqIO.write(records, self.filename, "columnar")
+        columns = ColumnarFile(self.filename, generic_dna)
+        self.assertEqual(100, len(columns))
+        self.assertEqual("ACGTACGT", str(columns["r2"].seq))
+        self.assertEqual(generic_dna, columns["r2"].seq.alphabet)
+        self.assertEqual("", str(columns[0].seq))
+        self.assertEqual(range(1000, 1000 + 4 * 99),
+                         columns[-1].letter_annotations["big"])
+        self.assertEqual([-1] * 8, columns[2].letter_annotations["small"])
+        self.assertEqual(None, columns.get("r100"))
+        self.assertFalse("r100" in columns)
+        self.assertRaises(KeyError, columns.__getitem__, "r100")
+        self.assertRaises(IndexError, columns.__getitem__, 100)
+        self.assertRaises(ValueError, columns.index, "r100")
+        columns.close()
+
+    def test_handles(self):
+        """Columnar files in memory."""
+        handle = BytesIO()
+        SeqIO.convert("Quality/example.fastq", "fastq", handle, "columnar")
+        handle.seek(0)
+        columns = ColumnarFile(handle)
+        self.assertEqual(3, len(columns))
+        self.assertEqual("EAS54_6_R1_2_1_443_348", columns[2].id)
+        #No records
+        handle = BytesIO()
+        self.assertEqual(0, SeqIO.write([], handle, "columnar"))
+        handle.seek(0)
+        self.assertEqual([], list(SeqIO.parse(handle, "columnar")))
+
+    def test_errors(self):
+        """Columnar file errors."""
+        records = [SeqRecord(Seq("ACGT"), id="a"),
+                   SeqRecord(Seq("ACGT"), id="a")]
+        self.assertRaises(ValueError, SeqIO.write, records, BytesIO(),
+                          "columnar")
+        records = [SeqRecord(Seq("ACGT"), id="a",
+                             letter_annotations={"q": [1, 2, 3, 4]}),
+                   SeqRecord(Seq("ACGT"), id="b")]
+        self.assertRaises(ValueError, SeqIO.write, records, BytesIO(),
+                          "columnar")
+        #Extra per-letter annotation on a later record
+        self.assertRaises(ValueError, SeqIO.write, records[::-1], BytesIO(),
+                          "columnar")
+        self.assertRaises(ValueError, ColumnarFile, BytesIO())
+        handle = open("Quality/example.fastq", "rb")
+        self.assertRaises(ValueError, ColumnarFile, handle)
+        handle.close()
+        handle = BytesIO()
+        SeqIO.write(records[:1], handle, "columnar")
+        self.assertRaises(ValueError, ColumnarFile,
+                          BytesIO(handle.getvalue()[:-8]))
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
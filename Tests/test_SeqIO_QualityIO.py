@@ -725,6 +725,53 @@ class MappingTests(unittest.TestCase):
                          expected_phred)
 
 
+class TestPairedFastq(unittest.TestCase):
+
+    def test_compressed(self):
+        """Paired FASTQ iterator with plain, gzip and BGZF files."""
+        for filename in ["Quality/example.fastq.gz",
+                         "Quality/example.fastq.bgz"]:
+            for batch_size in [1, 2, 1000]:
+                pairs = list(QualityIO.PairedFastqIterator(
+                    "Quality/example.fastq", filename,
+                    batch_size=batch_size))
+                self.assertEqual(3, len(pairs))
+                for read1, read2 in pairs:
+                    self.assertEqual(read1, read2)
+
+    def test_mate_names(self):
+        """Paired FASTQ iterator ignores /1 and /2 and descriptions."""
+        handle1 = StringIO("@A/1 1:N:0\nACGT\n+\nIIII\n"
+                           "@B/1 1:N:0\nACGT\n+\nIIII\n")
+        handle2 = StringIO("@A/2 2:N:0\nTTTT\n+\nIIII\n"
+                           "@B/2 2:N:0\nGGGG\n+\nIIII\n")
+        pairs = list(QualityIO.PairedFastqIterator(handle1, handle2))
+        self.assertEqual([("A/1 1:N:0", "ACGT", "IIII"),
+                          ("A/2 2:N:0", "TTTT", "IIII")], list(pairs[0]))
+        self.assertEqual("GGGG", pairs[1][1][1])
+
+    def test_errors(self):
+        """Paired FASTQ iterator checks the reads match."""
+        handle = open("Quality/example.fastq")
+        data = handle.read()
+        handle.close()
+        records = data.split("@")
+        shorter = "@".join(records[:-1])
+        renamed = data.replace("EAS54_6_R1_2_1_540_792", "XXX")
+        for batch_size in [1, 2, 1000]:
+            for data1, data2 in [(data, shorter), (shorter, data),
+                                 (data, renamed), (data, "")]:
+                iterator = QualityIO.PairedFastqIterator(
+                    StringIO(data1), StringIO(data2), batch_size=batch_size)
+                self.assertRaises(ValueError, list, iterator)
+        pairs = QualityIO.PairedFastqIterator(StringIO(data),
+                                              StringIO(renamed),
+                                              check_names=False)
+        self.assertEqual(3, len(list(pairs)))
+        pairs = QualityIO.PairedFastqIterator(
+            "Quality/example.fastq", "Quality/error_diff_ids.fastq")
+        self.assertRaises(ValueError, list, pairs)
+
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity = 2)
     unittest.main(testRunner=runner)
@@ -0,0 +1,347 @@
+# Copyright 2013 by Peter Cock.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Tests for the NumPy based code in Bio.SeqIO.QualityIO."""
+
+try:
+    import numpy
+except ImportError:
+    from Bio import MissingPythonDependencyError
+    raise MissingPythonDependencyError(
+        "Install NumPy if you want to use FastqBatchIterator.")
+
+import glob
+import os
+import unittest
+import warnings
+from StringIO import StringIO
+
+from Bio import BiopythonWarning
+from Bio import SeqIO
+from Bio.SeqIO.QualityIO import FastqBatchIterator
+from Bio.SeqIO.QualityIO import FastqPhredIterator, FastqSolexaIterator
+from Bio.SeqIO.QualityIO import FastqIlluminaIterator
+from Bio.SeqIO.QualityIO import trim_fastq, trim_fastq_batch
+from Bio.SeqIO.QualityIO import PairedFastqIterator
+
+_parsers = {"sanger": FastqPhredIterator,
+            "solexa": FastqSolexaIterator,
+            "illumina": FastqIlluminaIterator,
+            }
+
+
+class TestFastqBatch(unittest.TestCase):
+
+    def check(self, filename, variant, batch_sizes=(1, 2, 3, 10, 1000)):
+        handle = open(filename, "rU")
+        try:
+            records = list(SeqIO.parse(handle, "fastq-" + variant))
+        except ValueError:
+            #e.g. Sanger qualities out of range for Solexa
+            handle.close()
+            handle = open(filename, "rU")
+            self.assertRaises(ValueError, list,
+                              FastqBatchIterator(handle, 1000, variant))
+            handle.close()
+            return
+        handle.close()
+        if variant == "solexa":
+            key = "solexa_quality"
+        else:
+            key = "phred_quality"
+        for batch_size in batch_sizes:
+            handle = open(filename, "rU")
+            batches = list(FastqBatchIterator(handle, batch_size, variant))
+            handle.close()
+            self.assertEqual(len(records), sum(len(b) for b in batches))
+            for b in batches[:-1]:
+                self.assertEqual(batch_size, len(b))
+            i = 0
+            for batch in batches:
+                self.assertEqual([len(r) for r in records[i:i + len(batch)]],
+                                 list(batch.lengths()))
+                for j in range(len(batch)):
+                    record = records[i + j]
+                    self.assertEqual(record.description, batch.title(j))
+                    self.assertEqual(str(record.seq), batch.seq(j))
+                    self.assertEqual(record.letter_annotations[key],
+                                     list(batch.qual(j)))
+                i += len(batch)
+
+    def test_reference_files(self):
+        """FastqBatchIterator matches the SeqRecord parsers."""
+        for filename in glob.glob("Quality/*.fastq"):
+            name = os.path.basename(filename)
+            if name.startswith("error_"):
+                continue
+            for variant in ["sanger", "solexa", "illumina"]:
+                self.check(filename, variant)
+
+    def test_windows_new_lines(self):
+        """FastqBatchIterator with Windows style new lines."""
+        data = open("Quality/example.fastq").read().replace("\n", "\r\n")
+        batches = list(FastqBatchIterator(StringIO(data), 2))
+        self.assertEqual([2, 1], [len(b) for b in batches])
+        self.assertEqual("GTTGCTTCTGGCGTGGGTGGGGGGG", batches[1].seq(0))
+
+    def test_dtypes(self):
+        """FastqBatchIterator gives signed Solexa scores."""
+        handle = open("Quality/solexa_faked.fastq")
+        batch = FastqBatchIterator(handle, variant="solexa").next()
+        handle.close()
+        self.assertEqual(numpy.int8, batch.qualities.dtype)
+        self.assertEqual(-5, batch.qualities.min())
+        handle = open("Quality/example.fastq")
+        batch = FastqBatchIterator(handle).next()
+        handle.close()
+        self.assertEqual(numpy.uint8, batch.qualities.dtype)
+        self.assertEqual(numpy.uint8, batch.seq_bytes.dtype)
+        self.assertEqual([0, 25, 50, 75], list(batch.offsets))
+
+    def test_empty(self):
+        """FastqBatchIterator on an empty file."""
+        self.assertEqual([], list(FastqBatchIterator(StringIO(""))))
+        self.assertEqual([], list(FastqBatchIterator(StringIO("\n\n"))))
+
+    def test_errors(self):
+        """FastqBatchIterator rejects invalid files."""
+        for filename in glob.glob("Quality/error_*.fastq"):
+            for variant in ["sanger", "solexa", "illumina"]:
+                handle = open(filename, "rU")
+                self.assertRaises(ValueError, list,
+                                  FastqBatchIterator(handle, 1000, variant))
+                handle.close()
+        self.assertRaises(ValueError, FastqBatchIterator(StringIO(""),
+                                                         variant="dummy").next)
+
+
+class TestQualityArrays(unittest.TestCase):
+
+    def write(self, records, format):
+        handle = StringIO()
+        warnings.simplefilter("ignore")
+        try:
+            SeqIO.write(records, handle, format)
+        finally:
+            warnings.resetwarnings()
+        return handle.getvalue()
+
+    def check(self, filename, variant):
+        parser = _parsers[variant]
+        handle = open(filename, "rU")
+        try:
+            records = list(parser(handle))
+        except ValueError:
+            handle.close()
+            handle = open(filename, "rU")
+            self.assertRaises(ValueError, list,
+                              parser(handle, quality_array=True))
+            handle.close()
+            return
+        handle.close()
+        handle = open(filename, "rU")
+        arrays = list(parser(handle, quality_array=True))
+        handle.close()
+        if variant == "solexa":
+            key, dtype = "solexa_quality", numpy.int8
+        else:
+            key, dtype = "phred_quality", numpy.uint8
+        self.assertEqual(len(records), len(arrays))
+        for old, new in zip(records, arrays):
+            self.assertEqual(str(old.seq), str(new.seq))
+            self.assertEqual(dtype, new.letter_annotations[key].dtype)
+            self.assertEqual(old.letter_annotations[key],
+                             list(new.letter_annotations[key]))
+        for format in ["fastq", "fastq-solexa", "fastq-illumina", "qual"]:
+            self.assertEqual(self.write(records, format),
+                             self.write(arrays, format),
+                             "%s as %s to %s" % (filename, variant, format))
+
+    def test_reference_files(self):
+        """Quality arrays give the same output as lists."""
+        for filename in glob.glob("Quality/*.fastq"):
+            for variant in ["sanger", "solexa", "illumina"]:
+                self.check(filename, variant)
+
+    def test_record_methods(self):
+        """Slicing, adding and reversing records with quality arrays."""
+        handle = open("Quality/example.fastq")
+        record = FastqPhredIterator(handle, quality_array=True).next()
+        handle.close()
+        qualities = record.letter_annotations["phred_quality"]
+        sub = record[5:10]
+        self.assertEqual(list(qualities[5:10]),
+                         list(sub.letter_annotations["phred_quality"]))
+        #A view of the same array, not a copy
+        self.assertTrue(sub.letter_annotations["phred_quality"].base
+                        is qualities.base)
+        both = sub + record[:3]
+        self.assertEqual(list(qualities[5:10]) + list(qualities[:3]),
+                         list(both.letter_annotations["phred_quality"]))
+        self.assertEqual(list(qualities[::-1]),
+                         list(record.reverse_complement(
+                         letter_annotations=True).letter_annotations[
+                         "phred_quality"]))
+
+    def test_high_scores(self):
+        """Quality arrays too high for the output format give warnings."""
+        handle = open("Quality/sanger_93.fastq")
+        record = FastqPhredIterator(handle, quality_array=True).next()
+        handle.close()
+        warnings.simplefilter("error")
+        try:
+            self.assertRaises(BiopythonWarning, record.format,
+                              "fastq-illumina")
+        finally:
+            warnings.resetwarnings()
+
+
+class TestTrimming(unittest.TestCase):
+
+    def trim(self, record, window_size=None, min_quality=20, min_length=0,
+             max_expected_errors=None, max_n=None):
+        """Simple pure Python version of trim_fastq_batch for one record."""
+        qualities = record.letter_annotations["phred_quality"]
+        end = len(record)
+        if window_size:
+            for start in range(len(record) - window_size + 1):
+                window = qualities[start:start + window_size]
+                if sum(window) < min_quality * window_size:
+                    end = start
+                    break
+        record = record[:end]
+        qualities = qualities[:end]
+        if len(record) < min_length:
+            return None
+        if max_expected_errors is not None and \
+                sum(10 ** (q / -10.0) for q in qualities) \
+                > max_expected_errors:
+            return None
+        if max_n is not None and str(record.seq).upper().count("N") > max_n:
+            return None
+        return record
+
+    def check(self, filename, **kwargs):
+        handle = open(filename, "rU")
+        records = list(SeqIO.parse(handle, "fastq"))
+        handle.close()
+        expected = [r for r in (self.trim(r, **kwargs) for r in records) if r]
+        for batch_size in [1, 3, 1000]:
+            handle = open(filename, "rU")
+            out_handle = StringIO()
+            warnings.simplefilter("ignore")
+            try:
+                counts = trim_fastq(handle, out_handle,
+                                    batch_size=batch_size, **kwargs)
+            finally:
+                warnings.resetwarnings()
+            handle.close()
+            self.assertEqual((len(records), len(expected)), counts)
+            out_handle.seek(0)
+            trimmed = list(SeqIO.parse(out_handle, "fastq"))
+            self.assertEqual(len(expected), len(trimmed))
+            for old, new in zip(expected, trimmed):
+                self.assertEqual(old.description, new.description)
+                self.assertEqual(str(old.seq), str(new.seq))
+                self.assertEqual(old.letter_annotations["phred_quality"],
+                                 new.letter_annotations["phred_quality"])
+
+    def test_reference_files(self):
+        """Trimming and filtering matches a simple per record version."""
+        options = [dict(),
+                   dict(window_size=4, min_quality=20),
+                   dict(window_size=1, min_quality=30, min_length=10),
+                   dict(max_expected_errors=0.5),
+                   dict(window_size=5, max_expected_errors=1.0, max_n=0),
+                   dict(max_n=2, min_length=1),
+                   ]
+        for filename in ["Quality/example.fastq",
+                         "Quality/longreads_original_sanger.fastq",
+                         "Quality/misc_dna_original_sanger.fastq",
+                         "Quality/sanger_full_range_original_sanger.fastq",
+                         "Quality/tricky.fastq",
+                         "Quality/wrapping_original_sanger.fastq"]:
+            for kwargs in options:
+                self.check(filename, **kwargs)
+
+    def test_write(self):
+        """Writing a batch matches the SeqRecord FASTQ writers."""
+        for variant in ["sanger", "solexa", "illumina"]:
+            handle = open("Quality/%s_faked.fastq" % variant, "rU")
+            batch = FastqBatchIterator(handle, variant=variant).next()
+            handle.close()
+            handle = open("Quality/%s_faked.fastq" % variant, "rU")
+            records = list(SeqIO.parse(handle, "fastq-" + variant))
+            handle.close()
+            for format in ["sanger", "solexa", "illumina"]:
+                out_handle = StringIO()
+                warnings.simplefilter("ignore")
+                try:
+                    self.assertEqual(1, batch.write(out_handle, format))
+                    expected = records[0].format("fastq-" + format)
+                finally:
+                    warnings.resetwarnings()
+                self.assertEqual(expected, out_handle.getvalue())
+        out_handle = StringIO()
+        self.assertRaises(ValueError, batch.write, out_handle, "dummy")
+
+    def test_solexa(self):
+        """Trimming Solexa scores uses the equivalent PHRED scores."""
+        handle = open("Quality/solexa_faked.fastq")
+        batch = FastqBatchIterator(handle, variant="solexa").next()
+        handle.close()
+        trimmed = trim_fastq_batch(batch, window_size=1, min_quality=10)
+        #Solexa 10 is about PHRED 10.4, Solexa 9 is about PHRED 9.5
+        self.assertEqual([len(batch.qual(0)) - 15], list(trimmed.lengths()))
+        self.assertEqual(numpy.int8, trimmed.qualities.dtype)
+
+    def test_empty(self):
+        """Filtering out all the reads gives an empty batch."""
+        handle = open("Quality/example.fastq")
+        batch = FastqBatchIterator(handle).next()
+        handle.close()
+        trimmed = trim_fastq_batch(batch, min_length=100)
+        self.assertEqual(0, len(trimmed))
+        out_handle = StringIO()
+        self.assertEqual(0, trimmed.write(out_handle))
+        self.assertEqual("", out_handle.getvalue())
+        self.assertTrue(trim_fastq_batch(batch) is batch)
+
+
+class TestPairedBatches(unittest.TestCase):
+
+    def test_batches(self):
+        """Paired FASTQ iterator giving pairs of batches."""
+        for batch_size in [1, 2, 1000]:
+            pairs = list(PairedFastqIterator("Quality/example.fastq",
+                                             "Quality/example.fastq.bgz",
+                                             batch_size=batch_size,
+                                             batches=True))
+            self.assertEqual(3, sum(len(b1) for b1, b2 in pairs))
+            for batch1, batch2 in pairs:
+                self.assertEqual(list(batch1.seq_bytes),
+                                 list(batch2.seq_bytes))
+
+    def test_mate_names(self):
+        """Paired FASTQ batches ignore /1 and /2 and descriptions."""
+        data1 = "@A/1 1:N:0\nACGT\n+\nIIII\n@B/1\nACGT\n+\nIIII\n" \
+                "@\nACGT\n+\nIIII\n@/1\nACGT\n+\nIIII\n"
+        data2 = "@A/2\tx\nTTTT\n+\nIIII\n@B\nACGT\n+\nIIII\n" \
+                "@ y\nACGT\n+\nIIII\n@\nACGT\n+\nIIII\n"
+        pairs = list(PairedFastqIterator(StringIO(data1), StringIO(data2),
+                                         batches=True))
+        self.assertEqual(1, len(pairs))
+        self.assertEqual("A/1 1:N:0", pairs[0][0].title(0))
+        for data in [data2.replace("@B", "@C"), data2.replace("@A", "@AA"),
+                     data2.replace("@B", "@B/3")]:
+            pairs = PairedFastqIterator(StringIO(data1), StringIO(data),
+                                        batches=True)
+            self.assertRaises(ValueError, list, pairs)
+
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,136 @@
+# Copyright 2013 by Peter Cock.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Unit tests for Bio.SeqIO.QualityIO.demultiplex_fastq(...)."""
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+
+try:
+    import multiprocessing
+except ImportError:
+    #Python 2.5
+    multiprocessing = None
+
+from Bio.SeqIO.QualityIO import FastqGeneralIterator, demultiplex_fastq
+from Bio.SeqIO._demux import _barcode_table
+
+_barcodes = {"s1": "ACGTAC", "s2": "TTGACA", "s3": "GGCCTT"}
+
+
+def _make_reads(count):
+    """Illumina style reads, cycling through the barcodes with errors."""
+    reads = []
+    variants = ["ACGTAC", "ACGTAA", "TTGACA", "TTGACN", "GGCCTT",
+                "GGCTTA", "CCCCCC"]
+    for i in range(count):
+        barcode = variants[i % len(variants)]
+        reads.append("@read%i 1:N:0:%s\n%sACGT\n+\n%sIIII\n"
+                     % (i, barcode, barcode, "I" * len(barcode)))
+    return "".join(reads)
+
+
+class DemultiplexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def read(self, name, compressed=False):
+        filename = os.path.join(self.temp_dir, name)
+        if compressed:
+            handle = gzip.open(filename)
+        else:
+            handle = open(filename)
+        records = list(FastqGeneralIterator(handle))
+        handle.close()
+        return records
+
+    def test_table(self):
+        """Barcode lookup table with mismatches."""
+        table = _barcode_table({"a": "AAAA", "b": "AAAT", "c": "GGGG"}, 1)
+        self.assertEqual("a", table["AAAA"])
+        self.assertEqual("b", table["AAAT"])
+        self.assertEqual("c", table["GGNG"])
+        #One mismatch from both a and b
+        self.assertFalse("AAAC" in table)
+        self.assertEqual(1 + 4 * 4, len([k for k, v in table.items()
+                                         if v == "c"]))
+        self.assertEqual(1, len(_barcode_table({"a": "AAAA"}, 0)))
+        self.assertEqual("a", _barcode_table({"a": "AC+GT"}, 1)["AC+GA"])
+        self.assertRaises(ValueError, _barcode_table,
+                          {"a": "AAAA", "b": "aaaa"}, 1)
+
+    def check(self, **kwargs):
+        template = os.path.join(self.temp_dir, "%s.fastq")
+        counts = demultiplex_fastq(StringIO(_make_reads(70)), _barcodes,
+                                   template, chunk_size=3,
+                                   unmatched=template % "unknown", **kwargs)
+        self.assertEqual({"s1": 20, "s2": 20, "s3": 10, None: 20}, counts)
+        compressed = kwargs.get("compress", False)
+        s1 = self.read("s1.fastq", compressed)
+        self.assertEqual(20, len(s1))
+        self.assertEqual(["read0 1:N:0:ACGTAC", "read1 1:N:0:ACGTAA"],
+                         [title for title, seq, qual in s1[:2]])
+        self.assertEqual(10, len(self.read("s3.fastq", compressed)))
+        unknown = self.read("unknown.fastq", compressed)
+        self.assertEqual(["read5 1:N:0:GGCTTA", "read6 1:N:0:CCCCCC"],
+                         [title for title, seq, qual in unknown[:2]])
+        return s1
+
+    def test_title(self):
+        """Demultiplex using barcodes in the titles."""
+        s1 = self.check()
+        self.assertEqual(("read0 1:N:0:ACGTAC", "ACGTACACGT", "IIIIIIIIII"),
+                         s1[0])
+
+    def test_start(self):
+        """Demultiplex using barcodes at the start of the reads."""
+        s1 = self.check(location="start")
+        self.assertEqual(("read0 1:N:0:ACGTAC", "ACGT", "IIII"), s1[0])
+
+    def test_few_handles(self):
+        """Demultiplex with small buffers and one open file at a time."""
+        self.check(max_open=1, buffer_size=10)
+
+    def test_compressed(self):
+        """Demultiplex into BGZF files."""
+        self.check(compress=True, max_open=2, buffer_size=100)
+
+    def test_empty(self):
+        """Demultiplex creates files for samples without any reads."""
+        filenames = dict((sample, os.path.join(self.temp_dir, sample))
+                         for sample in _barcodes)
+        counts = demultiplex_fastq(StringIO(""), _barcodes, filenames)
+        self.assertEqual({"s1": 0, "s2": 0, "s3": 0, None: 0}, counts)
+        for sample in _barcodes:
+            self.assertEqual([], self.read(sample))
+
+    def test_errors(self):
+        """Demultiplex rejects bad arguments."""
+        template = os.path.join(self.temp_dir, "%s.fastq")
+        self.assertRaises(ValueError, demultiplex_fastq, StringIO(""),
+                          _barcodes, template, location="end")
+        self.assertRaises(ValueError, demultiplex_fastq, StringIO(""),
+                          _barcodes, {"s1": template % "s1"})
+        self.assertRaises(ValueError, demultiplex_fastq, StringIO(""),
+                          {"a": "ACGT", "b": "ACG"}, template,
+                          location="start")
+
+    if multiprocessing:
+        def test_processes(self):
+            """Demultiplex using several processes."""
+            self.check(processes=2)
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
@@ -169,6 +169,18 @@ class ConvertTests(unittest.TestCase):
     def failure_check(self, filename, in_format, out_format, alphabet):
         check_convert_fails(filename, in_format, out_format, alphabet)
 
+    def test_tab_to_fasta(self):
+        """Convert simple tabbed to FASTA."""
+        data = "Alpha\tAAAAAAA\n\nBeta  two\t%s\n" % ("C" * 70)
+        handle = StringIO()
+        SeqIO.write(SeqIO.parse(StringIO(data), "tab"), handle, "fasta")
+        handle2 = StringIO()
+        self.assertEqual(2, SeqIO.convert(StringIO(data), "tab",
+                                          handle2, "fasta"))
+        self.assertEqual(handle.getvalue(), handle2.getvalue())
+        self.assertRaises(ValueError, SeqIO.convert, StringIO("A\tB\tC\n"),
+                          "tab", StringIO(), "fasta")
+
 tests = [
     ("Quality/example.fastq", "fastq", None),
     ("Quality/example.fastq", "fastq-sanger", generic_dna),
@@ -181,6 +193,13 @@ tests = [
     ("EMBL/TRBG361.embl", "embl", None),
     ("GenBank/NC_005816.gb", "gb", None),
     ("GenBank/cor6_6.gb", "genbank", None),
+    ("EMBL/A04195.imgt", "imgt", None),
+    ("SwissProt/sp001", "swiss", None),
+    ("SwissProt/sp016", "swiss", None),
+    ("SwissProt/multi_ex.txt", "swiss", None),
+    ("Fasta/f002", "fasta", None),
+    ("Fasta/fa01", "fasta", generic_protein),
+    ("Fasta/dups.fasta", "fasta", None),
     ]
 for filename, format, alphabet in tests:
     for (in_format, out_format) in converter_dict:
@@ -0,0 +1,179 @@
+# Copyright 2013 by Peter Cock.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Unit tests for Bio.SeqIO.faidx(...) samtools style FASTA indexing."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from Bio._py3k import _as_bytes
+from Bio import bgzf
+from Bio import SeqIO
+from Bio.Alphabet import generic_dna
+from Bio.SeqIO._faidx import _read_gzi, _build_gzi
+
+
+def _regions(length):
+    """Some awkward regions, including the line ends (70 and 60 bases)."""
+    values = [0, 1, 59, 60, 61, 69, 70, 71, 139, 140, 141, length // 2,
+              length - 71, length - 70, length - 1, length]
+    values = sorted(set([v for v in values if 0 <= v <= length]))
+    for start in values:
+        for end in values:
+            yield start, end
+
+
+class FaidxTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def copy(self, filename, new_line="\n", block=None):
+        """Make a copy of the file to index (optionally as BGZF)."""
+        h = open(filename, "rU")
+        data = h.read().replace("\n", new_line)
+        h.close()
+        data = _as_bytes(data)
+        new_filename = os.path.join(self.temp_dir, os.path.basename(filename))
+        if block:
+            #Small blocks so that regions span blocks
+            new_filename += ".bgz"
+            w = bgzf.BgzfWriter(new_filename, "wb")
+            for i in range(0, len(data), block):
+                w.write(data[i:i + block])
+                w.flush()
+            w.close()
+        else:
+            h = open(new_filename, "wb")
+            h.write(data)
+            h.close()
+        return new_filename
+
+    def check(self, filename, new_line="\n", block=None):
+        records = list(SeqIO.parse(filename, "fasta"))
+        filename = self.copy(filename, new_line, block)
+        for reload in [False, True]:
+            self.assertEqual(reload, os.path.isfile(filename + ".fai"))
+            if block:
+                self.assertEqual(reload, os.path.isfile(filename + ".gzi"))
+            genome = SeqIO.faidx(filename, generic_dna)
+            self.assertEqual(len(records), len(genome))
+            self.assertEqual([r.id for r in records], genome.keys())
+            for record in records:
+                seq = str(record.seq)
+                self.assertEqual(len(seq), genome.get_length(record.id))
+                self.assertEqual(seq, str(genome[record.id].seq))
+                for start, end in _regions(len(seq)):
+                    self.assertEqual(seq[start:end],
+                                     str(genome.fetch(record.id, start, end)))
+                self.assertEqual(seq[-10:],
+                                 str(genome.fetch(record.id, -10)))
+            self.assertRaises(KeyError, genome.fetch, "missing", 0, 10)
+            got = list(genome.get_many(genome.keys()[::-1], keep_order=True))
+            self.assertEqual([r.id for r in records][::-1],
+                             [key for key, record in got])
+            self.assertEqual([str(r.seq) for r in records][::-1],
+                             [str(record.seq) for key, record in got])
+            genome.close()
+        if block:
+            h = open(filename + ".gzi", "rb")
+            gzi = _read_gzi(h)
+            h.close()
+            h = open(filename, "rb")
+            self.assertEqual(gzi, _build_gzi(h))
+            h.close()
+        return filename
+
+    def test_samtools_fai(self):
+        """Check .fai file matches that from samtools faidx."""
+        filename = self.check("GenBank/NC_005816.fna")
+        h = open(filename + ".fai")
+        new = h.read()
+        h.close()
+        h = open("GenBank/NC_005816.fna.fai")
+        old = h.read()
+        h.close()
+        self.assertEqual(old, new)
+
+    def test_multiple(self):
+        """Index FASTA files with several records."""
+        self.check("GenBank/NC_005816.ffn")
+        self.check("GenBank/NC_000932.faa")
+        self.check("Fasta/f002")
+
+    def test_windows_new_lines(self):
+        """Index FASTA file with Windows style new lines."""
+        filename = self.check("GenBank/NC_005816.ffn", "\r\n")
+        h = open(filename + ".fai")
+        line = h.readline()
+        h.close()
+        self.assertEqual(line.rstrip("\n").split("\t")[3:], ["70", "72"])
+
+    def test_bgzf(self):
+        """Index BGZF compressed FASTA file, regions spanning blocks."""
+        self.check("GenBank/NC_005816.ffn", block=997)
+        self.check("GenBank/NC_005816.fna", block=100)
+
+    def test_stale(self):
+        """Rebuild a .fai index older than the FASTA file."""
+        filename = os.path.join(self.temp_dir, "stale.fasta")
+        h = open(filename, "w")
+        h.write(">alpha\nACGT\nACGT\n>beta\nTTTT\n")
+        h.close()
+        genome = SeqIO.faidx(filename)
+        self.assertEqual("ACGTACGT", str(genome["alpha"].seq))
+        genome.close()
+        #Same line layout and lengths, so the old index would still "work"
+        h = open(filename, "w")
+        h.write(">beta\nTTTT\n>alpha\nGGCC\nGGCC\n")
+        h.close()
+        mtime = os.path.getmtime(filename)
+        os.utime(filename + ".fai", (mtime - 10, mtime - 10))
+        genome = SeqIO.faidx(filename)
+        self.assertEqual(["beta", "alpha"], genome.keys())
+        self.assertEqual("GGCCGGCC", str(genome["alpha"].seq))
+        genome.close()
+        self.assertTrue(os.path.getmtime(filename + ".fai") >= mtime)
+
+    def test_dict_methods(self):
+        """Check the methods inherited from the SeqIO.index dictionary."""
+        filename = self.copy("Fasta/f002")
+        genome = SeqIO.faidx(filename)
+        key = genome.keys()[0]
+        self.assertTrue(key in genome)
+        self.assertFalse("missing" in genome)
+        self.assertEqual(3, len(genome))
+        self.assertEqual(key, genome.get(key).id)
+        self.assertEqual(None, genome.get("missing"))
+        self.assertEqual("{%r : SeqRecord(...), ...}" % key, str(genome))
+        self.assertRaises(NotImplementedError, genome.get_raw, key)
+        genome.close()
+
+    def test_ragged(self):
+        """Index FASTA file with varying line lengths."""
+        filename = os.path.join(self.temp_dir, "ragged.fasta")
+        h = open(filename, "w")
+        h.write(">good\nACGT\nACGT\nAC\n>bad\nACGT\nAC\nACGT\n")
+        h.close()
+        self.assertRaises(ValueError, SeqIO.faidx, filename)
+
+    def test_duplicates(self):
+        """Index FASTA file with duplicate names."""
+        filename = os.path.join(self.temp_dir, "dups.fasta")
+        h = open(filename, "w")
+        h.write(">alpha one\nACGT\n>beta\nACGT\n>alpha two\nACGT\n")
+        h.close()
+        self.assertRaises(ValueError, SeqIO.faidx, filename)
+        self.assertFalse(os.path.isfile(filename + ".fai"))
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
@@ -1200,6 +1200,64 @@ class TestWriteRead(unittest.TestCase):
         write_read(os.path.join("EMBL", "U87107.embl"), "embl")
 
 
+class FeatureFiltering(unittest.TestCase):
+    """Test only parsing selected features."""
+    def check(self, filename, format, feature_types=None,
+              feature_qualifiers=None):
+        full = list(SeqIO.parse(filename, format))
+        some = list(SeqIO.parse(filename, format, feature_types=feature_types,
+                                feature_qualifiers=feature_qualifiers))
+        self.assertEqual(len(full), len(some))
+        for old, new in zip(full, some):
+            self.assertEqual(old.id, new.id)
+            self.assertEqual(str(old.seq), str(new.seq))
+            self.assertEqual(sorted(old.annotations), sorted(new.annotations))
+            wanted = [f for f in old.features
+                      if (feature_types is None or f.type in feature_types)
+                      and all(q in f.qualifiers
+                              for q in (feature_qualifiers or []))]
+            self.assertEqual(len(wanted), len(new.features))
+            for f1, f2 in zip(wanted, new.features):
+                self.assertEqual(f1.type, f2.type)
+                self.assertEqual(str(f1.location), str(f2.location))
+                self.assertEqual(f1.qualifiers, f2.qualifiers)
+        return some
+
+    def test_genbank_types(self):
+        """Only parse CDS and tRNA features from NC_000932.gb"""
+        records = self.check(os.path.join("GenBank", "NC_000932.gb"), "gb",
+                             ["CDS", "tRNA"])
+        self.assertEqual(set(["CDS", "tRNA"]),
+                         set(f.type for f in records[0].features))
+
+    def test_genbank_qualifiers(self):
+        """Only parse features with a translation from NC_005816.gb"""
+        records = self.check(os.path.join("GenBank", "NC_005816.gb"), "gb",
+                             feature_qualifiers=["translation"])
+        self.assertEqual(10, len(records[0].features))
+
+    def test_genbank_both(self):
+        """Only parse gene features with a locus tag from cor6_6.gb"""
+        self.check(os.path.join("GenBank", "cor6_6.gb"), "gb",
+                   ["gene"], ["gene"])
+
+    def test_genbank_none(self):
+        """Skip all the features in NC_005816.gb"""
+        records = self.check(os.path.join("GenBank", "NC_005816.gb"), "gb",
+                             [])
+        self.assertEqual([], records[0].features)
+
+    def test_embl(self):
+        """Only parse CDS features from U87107.embl"""
+        self.check(os.path.join("EMBL", "U87107.embl"), "embl", ["CDS"])
+        self.check(os.path.join("EMBL", "AE017046.embl"), "embl",
+                   ["CDS"], ["protein_id", "translation"])
+
+    def test_imgt(self):
+        """Only parse L-REGION features from A04195.imgt"""
+        self.check(os.path.join("EMBL", "A04195.imgt"), "imgt", ["L-REGION"])
+
+
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity = 2)
     unittest.main(testRunner=runner)
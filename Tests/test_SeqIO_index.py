@@ -28,7 +28,8 @@ from Bio._py3k import _as_bytes, _bytes_to_string
 
 from Bio.SeqRecord import SeqRecord
 from Bio import SeqIO
-from Bio.SeqIO._index import _FormatToRandomAccess
+from Bio.SeqIO._index import _FormatToRandomAccess, _FormatToLazyRandomAccess
+from Bio.File import _MappedOffsetTable
 from Bio.Alphabet import generic_protein, generic_nucleotide, generic_dna
 
 from seq_tests_common import compare_record
@@ -36,7 +37,7 @@ from seq_tests_common import compare_record
 from Bio import MissingPythonDependencyError
 try:
     from test_bgzf import _have_bug17666
-    do_bgzf = _have_bug17666()
+    do_bgzf = not _have_bug17666()
 except MissingPythonDependencyError:
     do_bgzf = False
 
@@ -123,6 +124,53 @@ class IndexDictTests(unittest.TestCase):
         rec_dict.close()
         del rec_dict
 
+        #Using the compact array based offset table,
+        rec_dict = SeqIO.index(filename, format, alphabet, compact=True)
+        self.check_dict_methods(rec_dict, id_list, id_list)
+        rec_dict.close()
+        del rec_dict
+
+        #Using a memory mapped file,
+        rec_dict = SeqIO.index(filename, format, alphabet, mmap=True)
+        self.check_dict_methods(rec_dict, id_list, id_list)
+        rec_dict.close()
+        del rec_dict
+
+        if format in _FormatToLazyRandomAccess:
+            #Parsing the records on demand should give the same results
+            rec_dict = SeqIO.index(filename, format, alphabet, lazy=True)
+            self.check_dict_methods(rec_dict, id_list, id_list)
+            if comp:
+                h = gzip_open(filename, format)
+            else:
+                h = open(filename, "rU")
+            for old in SeqIO.parse(h, format, alphabet):
+                new = rec_dict[old.id]
+                #Try the features first, so they are parsed one by one
+                self.assertEqual(len(old.features), len(new.features))
+                if old.features:
+                    self.assertEqual(str(old.features[-1].location),
+                                     str(new.features[-1].location))
+                self.assertEqual(True, compare_record(old, new))
+                self.assertEqual(True, compare_record(old[1:], new[1:]))
+            h.close()
+            rec_dict.close()
+            del rec_dict
+
+        #Using a sidecar cache file, first call creates it, second uses it
+        index_tmp = self.index_tmp
+        if os.path.isfile(index_tmp):
+            os.remove(index_tmp)
+        for cached in [False, True]:
+            rec_dict = SeqIO.index(filename, format, alphabet,
+                                   cache=index_tmp)
+            self.assertEqual(cached,
+                             isinstance(rec_dict._offsets, _MappedOffsetTable))
+            self.check_dict_methods(rec_dict, id_list, id_list)
+            rec_dict.close()
+            del rec_dict
+        os.remove(index_tmp)
+
         if not sqlite3:
             return
 
@@ -186,6 +234,12 @@ class IndexDictTests(unittest.TestCase):
         rec_dict.close()
         del rec_dict
 
+        rec_dict = SeqIO.index(filename, format, alphabet, add_prefix,
+                               compact=True)
+        self.check_dict_methods(rec_dict, key_list, id_list)
+        rec_dict.close()
+        del rec_dict
+
         if not sqlite3:
             return
 
@@ -251,6 +305,19 @@ class IndexDictTests(unittest.TestCase):
             pass
         self.assertEqual(rec_dict.get(chr(0)), None)
         self.assertEqual(rec_dict.get(chr(0), chr(1)), chr(1))
+        #Fetching many at once, in file order or as requested
+        key_to_id = dict(zip(keys, ids))
+        wanted = list(keys)[::-1] + list(keys)[:1]
+        got = list(rec_dict.get_many(wanted))
+        self.assertEqual(sorted(wanted), sorted(key for key, rec in got))
+        for key, rec in got:
+            self.assertEqual(key_to_id[key], rec.id)
+        got = list(rec_dict.get_many(wanted, keep_order=True))
+        self.assertEqual(wanted, [key for key, rec in got])
+        self.assertEqual([key_to_id[key] for key in wanted],
+                         [rec.id for key, rec in got])
+        self.assertRaises(KeyError, list,
+                          rec_dict.get_many(list(keys)[:1] + [chr(0)]))
         if hasattr(dict, "iteritems"):
             #Python 2.x
             for key, rec in rec_dict.iteritems():
@@ -298,6 +365,9 @@ class IndexDictTests(unittest.TestCase):
                        SeqIO.parse(filename, format, alphabet)]
         rec_dict = SeqIO.index(filename, format, alphabet,
                                key_function = lambda x : x.lower())
+        mapped_dict = SeqIO.index(filename, format, alphabet,
+                                  key_function = lambda x : x.lower(),
+                                  mmap=True)
         self.assertEqual(set(id_list), set(rec_dict.keys()))
         self.assertEqual(len(id_list), len(rec_dict))
         for key in id_list:
@@ -307,6 +377,7 @@ class IndexDictTests(unittest.TestCase):
             raw = rec_dict.get_raw(key)
             self.assertTrue(raw.strip())
             self.assertTrue(raw in raw_file)
+            self.assertEqual(raw, mapped_dict.get_raw(key))
             rec1 = rec_dict[key]
             #Following isn't very elegant, but it lets me test the
             #__getitem__ SFF code is working.
@@ -346,19 +417,220 @@ class IndexDictTests(unittest.TestCase):
             else:
                 rec2 = SeqIO.read(handle, format, alphabet)
             self.assertEqual(True, compare_record(rec1, rec2))
+            self.assertEqual(True, compare_record(rec1, mapped_dict[key]))
         rec_dict.close()
+        mapped_dict.close()
         del rec_dict
 
+    def bgzf_check(self, filename, format, alphabet):
+        """Check indexing a BGZF copy made of many small blocks."""
+        from Bio import bgzf
+        #Small blocks so records span blocks, and offsets are virtual
+        h = open(filename, "rb")
+        data = h.read()
+        h.close()
+        bgzf_tmp = self.index_tmp + ".bgz"
+        w = bgzf.BgzfWriter(bgzf_tmp, "wb")
+        for i in range(0, len(data), 97):
+            w.write(data[i:i + 97])
+            w.flush()
+        w.close()
+
+        id_list = [rec.id for rec in SeqIO.parse(filename, format, alphabet)]
+        plain_dict = SeqIO.index(filename, format, alphabet)
+        dicts = [SeqIO.index(bgzf_tmp, format, alphabet),
+                 SeqIO.index(bgzf_tmp, format, alphabet, compact=True)]
+        if sqlite3:
+            #The length based get_raw shortcut is used here
+            dicts.append(SeqIO.index_db(":memory:", [filename], format,
+                                        alphabet))
+            dicts.append(SeqIO.index_db(":memory:", [bgzf_tmp], format,
+                                        alphabet))
+        try:
+            for rec_dict in dicts:
+                raw = None
+                self.assertEqual(set(id_list), set(rec_dict))
+                for key in id_list:
+                    self.assertEqual(key, rec_dict[key].id)
+                    try:
+                        raw = plain_dict.get_raw(key)
+                    except NotImplementedError:
+                        continue
+                    self.assertEqual(raw, rec_dict.get_raw(key))
+                if raw is not None:
+                    raws = list(rec_dict.get_raw_many(id_list[::-1],
+                                                      keep_order=True))
+                    self.assertEqual(id_list[::-1], [k for k, r in raws])
+                    self.assertEqual([plain_dict.get_raw(k)
+                                      for k in id_list[::-1]],
+                                     [r for k, r in raws])
+                rec_dict.close()
+        finally:
+            plain_dict.close()
+            os.remove(bgzf_tmp)
+
     if sqlite3:
         def test_duplicates_index_db(self):
             """Index file with duplicate identifers with Bio.SeqIO.index_db()"""
             self.assertRaises(ValueError, SeqIO.index_db, ":memory:",
                               ["Fasta/dups.fasta"], "fasta")
 
+        def test_parallel_index_db(self):
+            """Index several files in parallel with Bio.SeqIO.index_db()"""
+            files = ["GenBank/NC_000932.faa", "GenBank/NC_005816.faa",
+                     "GenBank/NC_005816.ffn", "Fasta/sweetpea.nu"]
+            id_list = [rec.id for f in files for rec in SeqIO.parse(f, "fasta")]
+            key_list = [add_prefix(id) for id in id_list]
+            os.remove(self.index_tmp)
+            rec_dict = SeqIO.index_db(self.index_tmp, files, "fasta",
+                                      key_function=add_prefix, processes=2)
+            self.check_dict_methods(rec_dict, key_list, id_list)
+            rec_dict.close()
+            rec_dict._con.close()  # hack for PyPy
+            #Now reload it...
+            rec_dict = SeqIO.index_db(self.index_tmp, files, "fasta",
+                                      key_function=add_prefix)
+            self.check_dict_methods(rec_dict, key_list, id_list)
+            rec_dict.close()
+            rec_dict._con.close()  # hack for PyPy
+
+        def test_refresh_index_db(self):
+            """Refresh an index after adding, modifying or removing files"""
+            os.remove(self.index_tmp)
+            temp_dir = tempfile.mkdtemp()
+            names = [os.path.join(temp_dir, name)
+                     for name in ["a.fasta", "b.fasta", "c.fasta"]]
+
+            def write_fasta(filename, ids):
+                handle = open(filename, "w")
+                for id in ids:
+                    handle.write(">%s\nACGT\n" % id)
+                handle.close()
+
+            def check(filenames, ids):
+                rec_dict = SeqIO.index_db(self.index_tmp, filenames, "fasta",
+                                          refresh=True)
+                self.check_dict_methods(rec_dict, ids, ids)
+                rec_dict.close()
+                rec_dict._con.close()  # hack for PyPy
+                #Reloading without refresh should now accept these files
+                rec_dict = SeqIO.index_db(self.index_tmp, filenames)
+                self.assertEqual(set(ids), set(rec_dict))
+                rec_dict.close()
+                rec_dict._con.close()  # hack for PyPy
+
+            try:
+                write_fasta(names[0], ["a1", "a2"])
+                write_fasta(names[1], ["b1"])
+                write_fasta(names[2], ["c1", "c2", "c3"])
+                check(names[:2], ["a1", "a2", "b1"])
+                #Adding a file
+                check(names, ["a1", "a2", "b1", "c1", "c2", "c3"])
+                #Removing a file (renumbers the later files)
+                check(names[1:], ["b1", "c1", "c2", "c3"])
+                #Modifying a file, and reordering the files
+                write_fasta(names[2], ["c4", "c5"])
+                os.utime(names[2], (0, 0))
+                check([names[2], names[1]], ["b1", "c4", "c5"])
+                #A duplicate key leaves the index unchanged
+                write_fasta(names[0], ["b1"])
+                self.assertRaises(ValueError, SeqIO.index_db, self.index_tmp,
+                                  names, "fasta", refresh=True)
+                check([names[2], names[1]], ["b1", "c4", "c5"])
+                #Without refresh, the filenames must match
+                self.assertRaises(ValueError, SeqIO.index_db,
+                                  self.index_tmp, names[1:], "fasta")
+                #Without filenames, deleted files are dropped
+                os.remove(names[1])
+                check(None, ["c4", "c5"])
+            finally:
+                for name in names:
+                    if os.path.isfile(name):
+                        os.remove(name)
+                os.rmdir(temp_dir)
+
+        def test_parallel_duplicates_index_db(self):
+            """Index files with duplicate identifers in parallel"""
+            self.assertRaises(ValueError, SeqIO.index_db, ":memory:",
+                              ["Fasta/dups.fasta", "Fasta/dups.fasta"],
+                              "fasta", processes=2)
+
     def test_duplicates_index(self):
         """Index file with duplicate identifers with Bio.SeqIO.index()"""
         self.assertRaises(ValueError, SeqIO.index, "Fasta/dups.fasta", "fasta")
 
+    def test_lazy_unsupported(self):
+        """Lazy Bio.SeqIO.index() is only for GenBank, EMBL and IMGT"""
+        self.assertRaises(ValueError, SeqIO.index, "Fasta/dups.fasta",
+                          "fasta", lazy=True)
+
+    def test_duplicates_index_compact(self):
+        """Index file with duplicate identifers with compact Bio.SeqIO.index()"""
+        self.assertRaises(ValueError, SeqIO.index, "Fasta/dups.fasta", "fasta",
+                          compact=True)
+
+    def test_compact_non_string_keys(self):
+        """Compact Bio.SeqIO.index() requires string keys"""
+        self.assertRaises(TypeError, SeqIO.index, "Quality/example.fastq",
+                          "fastq", key_function=lambda x: (x,), compact=True)
+
+    def test_cache_key_function(self):
+        """Index cache records which key_function was used"""
+        filename = "Fasta/f002"
+        self.assertRaises(ValueError, SeqIO.index, filename, "fasta",
+                          key_function=lambda x: x.upper(),
+                          cache=self.index_tmp)
+
+        def key(identifier):
+            return identifier.upper()
+        rec_dict = SeqIO.index(filename, "fasta", key_function=key,
+                               cache=self.index_tmp)
+        keys = set(rec_dict)
+        rec_dict.close()
+        rec_dict = SeqIO.index(filename, "fasta", key_function=key,
+                               cache=self.index_tmp)
+        self.assertTrue(isinstance(rec_dict._offsets, _MappedOffsetTable))
+        self.assertEqual(keys, set(rec_dict))
+        rec_dict.close()
+
+        #Same name, different code, so the cache must not be reused
+        def key(identifier):
+            return identifier.lower()
+        rec_dict = SeqIO.index(filename, "fasta", key_function=key,
+                               cache=self.index_tmp)
+        self.assertFalse(isinstance(rec_dict._offsets, _MappedOffsetTable))
+        self.assertEqual(set(k.lower() for k in keys), set(rec_dict))
+        rec_dict.close()
+
+    def test_cache_stale(self):
+        """Index cache is ignored and replaced if the file changes"""
+        filename = tempfile.mktemp(".fasta")
+        try:
+            handle = open(filename, "w")
+            handle.write(">alpha\nACGT\n>beta\nGGCC\n")
+            handle.close()
+            rec_dict = SeqIO.index(filename, "fasta", cache=self.index_tmp)
+            self.assertEqual(["alpha", "beta"], list(rec_dict))
+            rec_dict.close()
+            #Change the file (and make sure the modification time changes)
+            handle = open(filename, "w")
+            handle.write(">gamma\nACGT\n")
+            handle.close()
+            os.utime(filename, (0, 0))
+            rec_dict = SeqIO.index(filename, "fasta", cache=self.index_tmp)
+            self.assertFalse(isinstance(rec_dict._offsets, _MappedOffsetTable))
+            self.assertEqual(["gamma"], list(rec_dict))
+            self.assertEqual("ACGT", str(rec_dict["gamma"].seq))
+            rec_dict.close()
+            rec_dict = SeqIO.index(filename, "fasta", cache=self.index_tmp)
+            self.assertTrue(isinstance(rec_dict._offsets, _MappedOffsetTable))
+            self.assertEqual(["gamma"], list(rec_dict))
+            self.assertFalse("alpha" in rec_dict)
+            rec_dict.close()
+        finally:
+            if os.path.isfile(filename):
+                os.remove(filename)
+
     def test_duplicates_to_dict(self):
         """Index file with duplicate identifers with Bio.SeqIO.to_dict()"""
         handle = open("Fasta/dups.fasta", "rU")
@@ -423,6 +695,16 @@ for filename, format, alphabet in tests:
     tasks = [(filename, None)]
     if do_bgzf and os.path.isfile(filename + ".bgz"):
         tasks.append((filename + ".bgz","bgzf"))
+    if do_bgzf:
+        def funct(fn,fmt,alpha):
+            f = lambda x : x.bgzf_check(fn, fmt, alpha)
+            f.__doc__ = "Index %s file %s as small block BGZF" % (fmt, fn)
+            return f
+        setattr(IndexDictTests, "test_%s_%s_bgzf_blocks"
+                    % (format, filename.replace("/","_").replace(".","_")),
+                funct(filename, format, alphabet))
+        del funct
+
     for filename, comp in tasks:
 
         def funct(fn,fmt,alpha,c):
@@ -0,0 +1,213 @@
+# Copyright 2013 by Peter Cock.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Unit tests for Bio.SeqIO.parallel_map(...) and parse(..., prefetch=N)."""
+
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import traceback
+import unittest
+from StringIO import StringIO
+
+try:
+    import multiprocessing
+except ImportError:
+    #Python 2.5
+    multiprocessing = None
+
+from Bio._py3k import _as_bytes
+from Bio import bgzf
+from Bio import SeqIO
+from Bio.SeqIO.FastaIO import SimpleFastaParser
+from Bio.SeqIO.QualityIO import FastqGeneralIterator
+
+
+#These must be top level functions so they can be pickled
+def identity(record):
+    return record
+
+
+def count_bases(record):
+    return 1, len(record[1])
+
+
+def add_pairs(a, b):
+    return a[0] + b[0], a[1] + b[1]
+
+
+class ParallelMapTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def bgzf_copy(self, filename, block):
+        """Make a BGZF copy of the file, using small blocks."""
+        h = open(filename, "rb")
+        data = h.read()
+        h.close()
+        new_filename = os.path.join(self.temp_dir,
+                                    os.path.basename(filename) + ".bgz")
+        w = bgzf.BgzfWriter(new_filename, "wb")
+        for i in range(0, len(data), block):
+            w.write(data[i:i + block])
+            w.flush()
+        w.close()
+        return new_filename
+
+    def check(self, filename, format, chunk_sizes, processes=1):
+        if format == "fasta":
+            parser = SimpleFastaParser
+        else:
+            parser = FastqGeneralIterator
+        h = open(filename)
+        expected = list(parser(h))
+        h.close()
+        counts = (len(expected), sum(len(r[1]) for r in expected))
+        for name in [filename, self.bgzf_copy(filename, 53)]:
+            for chunk_size in chunk_sizes:
+                records = list(SeqIO.parallel_map(name, format, identity,
+                                                  processes=processes,
+                                                  chunk_size=chunk_size))
+                self.assertEqual(expected, records,
+                                 "%s chunk size %i" % (name, chunk_size))
+                self.assertEqual(counts,
+                                 SeqIO.parallel_map(name, format,
+                                                    count_bases, add_pairs,
+                                                    processes=processes,
+                                                    chunk_size=chunk_size))
+
+    def test_fasta(self):
+        """Parallel map over FASTA files."""
+        for filename in ["Fasta/f002", "GenBank/NC_005816.ffn",
+                         "Fasta/dups.fasta"]:
+            self.check(filename, "fasta", [1, 7, 50, 1000, 100000])
+
+    def test_fastq(self):
+        """Parallel map over FASTQ files, including @ starting qualities."""
+        for filename in ["Quality/example.fastq",
+                         "Quality/misc_dna_as_illumina.fastq",
+                         "Quality/sanger_faked.fastq"]:
+            self.check(filename, "fastq", [1, 7, 50, 1000, 100000])
+
+    def test_fastq_wrapped(self):
+        """Parallel map over line wrapped FASTQ files needs one range."""
+        for filename in ["Quality/wrapping_original_sanger.fastq",
+                         "Quality/tricky.fastq"]:
+            self.check(filename, "fastq", [100000])
+            size = os.path.getsize(filename)
+            for name in [filename, self.bgzf_copy(filename, 53)]:
+                for chunk_size in [1, 7, 50, size // 2]:
+                    results = SeqIO.parallel_map(name, "fastq", identity,
+                                                 processes=1,
+                                                 chunk_size=chunk_size)
+                    self.assertRaises(ValueError, list, results)
+                    self.assertRaises(ValueError, SeqIO.parallel_map, name,
+                                      "fastq", count_bases, add_pairs,
+                                      processes=1, chunk_size=chunk_size)
+
+    def test_empty(self):
+        """Parallel map over an empty file."""
+        filename = os.path.join(self.temp_dir, "empty.fasta")
+        open(filename, "w").close()
+        self.assertEqual([], list(SeqIO.parallel_map(filename, "fasta",
+                                                     identity, processes=1)))
+        self.assertEqual(None, SeqIO.parallel_map(filename, "fasta",
+                                                  count_bases, add_pairs,
+                                                  processes=1))
+
+    def test_gzip(self):
+        """Parallel map rejects gzip files which are not BGZF."""
+        filename = os.path.join(self.temp_dir, "f002.fasta.gz")
+        h = open("Fasta/f002", "rb")
+        data = h.read()
+        h.close()
+        w = gzip.open(filename, "wb")
+        w.write(data)
+        w.close()
+        self.assertRaises(ValueError, SeqIO.parallel_map, filename, "fasta",
+                          identity, processes=1)
+
+    def test_bad_format(self):
+        """Parallel map only supports FASTA and FASTQ."""
+        self.assertRaises(ValueError, SeqIO.parallel_map,
+                          "GenBank/NC_005816.gb", "genbank", identity)
+
+    if multiprocessing:
+        def test_processes(self):
+            """Parallel map using several processes."""
+            self.check("GenBank/NC_005816.ffn", "fasta", [100, 1000], 3)
+            self.check("Quality/misc_dna_as_illumina.fastq", "fastq", [50], 2)
+
+
+class PrefetchTests(unittest.TestCase):
+
+    def check(self, filename, format, mode="rU"):
+        expected = [(r.id, str(r.seq)) for r in SeqIO.parse(filename, format)]
+        for prefetch in [1, 3, 100, 1000]:
+            handle = open(filename, mode)
+            records = [(r.id, str(r.seq)) for r in
+                       SeqIO.parse(handle, format, prefetch=prefetch)]
+            handle.close()
+            self.assertEqual(expected, records)
+
+    def test_formats(self):
+        """Parsing with prefetch gives the same records."""
+        self.check("Fasta/f002", "fasta")
+        self.check("Quality/example.fastq", "fastq")
+        self.check("GenBank/cor6_6.gb", "genbank")
+        self.check("Roche/E3MFGYR02_random_10_reads.sff", "sff", "rb")
+
+    def test_gzip(self):
+        """Parsing a gzip compressed file with prefetch."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(temp_dir, "example.fastq.gz")
+            handle = gzip.open(filename, "wb")
+            handle.write(open("Quality/example.fastq", "rb").read() * 50)
+            handle.close()
+            handle = gzip.open(filename)
+            records = list(SeqIO.parse(handle, "fastq", prefetch=10))
+            handle.close()
+            self.assertEqual(150, len(records))
+            self.assertEqual("EAS54_6_R1_2_1_443_348", records[-1].id)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_error(self):
+        """Errors with prefetch are raised after the good records."""
+        data = "@a\nACGT\n+\nIIII\n@b\nACGT\n+\nIII\n"
+        records = SeqIO.parse(StringIO(data), "fastq", prefetch=10)
+        self.assertEqual("a", records.next().id)
+        try:
+            records.next()
+            self.fail("Expected a ValueError")
+        except ValueError:
+            #The traceback should end in the parser, not the prefetch code
+            function = traceback.extract_tb(sys.exc_info()[2])[-1][2]
+            self.assertEqual("FastqGeneralIterator", function)
+        self.assertRaises(ValueError, SeqIO.parse(StringIO(""), "fasta",
+                                                  prefetch=-1).next)
+
+    def test_stop_early(self):
+        """Stopping part way through stops the background thread."""
+        threads = threading.activeCount()
+        records = SeqIO.parse("GenBank/NC_005816.ffn", "fasta", prefetch=2)
+        self.assertEqual("ref|NC_005816.1|:87-1109",
+                         records.next().id)
+        self.assertEqual(threads + 1, threading.activeCount())
+        records.close()
+        self.assertEqual(threads, threading.activeCount())
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,147 @@
+# Copyright 2013 by Peter Cock.  All rights reserved.
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Tests for the NumPy based code in Bio.SeqIO.SffIO."""
+
+try:
+    import numpy
+except ImportError:
+    from Bio import MissingPythonDependencyError
+    raise MissingPythonDependencyError(
+        "Install NumPy if you want to use SffBatchIterator.")
+
+import glob
+import unittest
+from StringIO import StringIO
+
+from Bio import SeqIO
+from Bio.SeqIO.SffIO import SffBatchIterator, _sff_file_header
+from Bio.SeqIO.SffIO import _sff_raw_batches
+
+
+class TestSffBatch(unittest.TestCase):
+
+    def check(self, filename, trim, batch_sizes=(1, 3, 1000)):
+        if trim:
+            records = list(SeqIO.parse(filename, "sff-trim"))
+        else:
+            records = list(SeqIO.parse(filename, "sff"))
+        for batch_size in batch_sizes:
+            handle = open(filename, "rb")
+            batches = list(SffBatchIterator(handle, batch_size, trim))
+            handle.close()
+            self.assertEqual(len(records), sum(len(b) for b in batches))
+            for b in batches[:-1]:
+                self.assertEqual(batch_size, len(b))
+            i = 0
+            for batch in batches:
+                self.assertEqual([len(r) for r in records[i:i + len(batch)]],
+                                 list(batch.lengths()))
+                for j in range(len(batch)):
+                    record = records[i + j]
+                    self.assertEqual(record.id, batch.name(j))
+                    self.assertEqual(str(record.seq).upper(), batch.seq(j))
+                    self.assertEqual(
+                        record.letter_annotations["phred_quality"],
+                        list(batch.qual(j)))
+                    if not trim:
+                        self.check_flows(record, batch, j)
+                i += len(batch)
+
+    def check_flows(self, record, batch, index):
+        annotations = record.annotations
+        self.assertEqual(annotations["flow_chars"], batch.flow_chars)
+        self.assertEqual(annotations["flow_key"], batch.key_sequence)
+        self.assertEqual(list(annotations["flow_values"]),
+                         list(batch.flowgrams[index]))
+        start, end = batch.offsets[index:index + 2]
+        self.assertEqual(list(numpy.cumsum(annotations["flow_index"]) - 1),
+                         list(batch.flow_positions[start:end]))
+        for field in ["clip_qual_left", "clip_qual_right",
+                      "clip_adapter_left", "clip_adapter_right"]:
+            self.assertEqual(annotations[field], batch.headers[field][index])
+        #The trimmed region is the upper case part of the sequence
+        starts, ends = batch.clip_positions()
+        seq = str(record.seq)
+        self.assertEqual(seq[:starts[index]].lower(), seq[:starts[index]])
+        self.assertEqual(seq[starts[index]:ends[index]].upper(),
+                         seq[starts[index]:ends[index]])
+        self.assertEqual(seq[ends[index]:].lower(), seq[ends[index]:])
+
+    def test_reference_files(self):
+        """SffBatchIterator matches SffIterator."""
+        for filename in glob.glob("Roche/*.sff"):
+            self.check(filename, False)
+            self.check(filename, True)
+
+    def test_flowgrams(self):
+        """SffBatchIterator flowgram matrix."""
+        handle = open("Roche/greek.sff", "rb")
+        batch = list(SffBatchIterator(handle))[0]
+        handle.close()
+        self.assertEqual(24, len(batch))
+        self.assertEqual((24, 800), batch.flowgrams.shape)
+        self.assertEqual(numpy.uint16, batch.flowgrams.dtype)
+        self.assertEqual(800, len(batch.flow_chars))
+        #Each base (other than N) comes from a flow of the same letter
+        flow_chars = numpy.fromstring(batch.flow_chars, numpy.uint8)
+        bases = numpy.fromstring(batch.seq_bytes.tostring().upper(),
+                                 numpy.uint8)
+        called = bases != ord("N")
+        self.assertTrue(called.any())
+        self.assertTrue((flow_chars[batch.flow_positions][called]
+                         == bases[called]).all())
+
+    def test_trim(self):
+        """SffBatch trimming matches the sff-trim format."""
+        handle = open("Roche/E3MFGYR02_random_10_reads.sff", "rb")
+        batch = list(SffBatchIterator(handle))[0]
+        handle.close()
+        trimmed = batch.trim()
+        self.assertEqual([260, 265, 292, 295, 277, 256, 271, 150, 221, 130],
+                         list(trimmed.lengths()))
+        self.assertEqual("GGTCTACATGTTGGTTAACC", trimmed.seq(0)[:20])
+        #Flow positions still refer to the untrimmed flowgrams
+        self.assertEqual(list(batch.flow_positions[4:264]),
+                         list(trimmed.flow_positions[:260]))
+        #Over clipped reads become empty
+        batch.headers["clip_qual_left"][0] = 300
+        self.assertEqual(0, batch.trim().lengths()[0])
+
+    def test_block_sizes(self):
+        """Reading the reads in blocks, skipping the index."""
+        for filename in glob.glob("Roche/*.sff"):
+            handle = open(filename, "rb")
+            data = handle.read()
+            handle.close()
+            expected = None
+            for block_size in (1, 7, 100, 1000, 1048576):
+                handle = StringIO(data)
+                header_length, index_offset, index_length, \
+                    number_of_reads, number_of_flows_per_read, \
+                    flow_chars, key_sequence = _sff_file_header(handle)
+                raw = [r for r, starts in _sff_raw_batches(
+                    handle, 3, index_offset, index_length, number_of_reads,
+                    number_of_flows_per_read, block_size)]
+                self.assertEqual("", handle.read(1))
+                if expected is None:
+                    expected = raw
+                self.assertEqual(expected, raw)
+
+    def test_errors(self):
+        """SffBatchIterator rejects bad files."""
+        handle = open("Roche/E3MFGYR02_alt_index_at_start.sff", "rb")
+        data = handle.read()
+        handle.close()
+        for bad in [data[:3000], data + "\0" * 8]:
+            self.assertRaises(ValueError, list,
+                              SffBatchIterator(StringIO(bad)))
+        self.assertRaises(ValueError, list,
+                          SffBatchIterator(StringIO(data), 0))
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner(verbosity = 2)
+    unittest.main(testRunner=runner)
@@ -344,6 +344,31 @@ class TestUniprot(unittest.TestCase):
         txt_index.close()
         xml_index.close()
 
+    def test_multi_ex_fields(self):
+        """Parse uniprot XML versions of several examples, selecting fields."""
+        full = list(SeqIO.parse("SwissProt/multi_ex.xml", "uniprot-xml"))
+        some = list(SeqIO.parse("SwissProt/multi_ex.xml", "uniprot-xml",
+                                fields=["sequence", "dbReference"]))
+        least = list(SeqIO.parse("SwissProt/multi_ex.xml", "uniprot-xml",
+                                 fields=["sequence"]))
+        self.assertEqual(len(full), len(some))
+        self.assertEqual(len(full), len(least))
+        for old, new, seq_only in zip(full, some, least):
+            for record in (new, seq_only):
+                self.assertEqual(old.id, record.id)
+                self.assertEqual(old.name, record.name)
+                self.assertEqual(str(old.seq), str(record.seq))
+                self.assertEqual([], record.features)
+                self.assertFalse("references" in record.annotations)
+                self.assertEqual(old.annotations["accessions"],
+                                 record.annotations["accessions"])
+            #Some of the dbxrefs come from the references
+            self.assertTrue(set(new.dbxrefs) <= set(old.dbxrefs))
+            self.assertTrue(set(seq_only.dbxrefs) < set(new.dbxrefs))
+        self.assertRaises(ValueError, list,
+                          SeqIO.parse("SwissProt/multi_ex.xml", "uniprot-xml",
+                                      fields=["sequences"]))
+
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity = 2)
     unittest.main(testRunner=runner)
@@ -11,6 +11,8 @@ See also the doctests in bgzf.py which are called via run_tests.py
 import unittest
 import gzip
 import os
+import sys
+import traceback
 from random import shuffle
 
 from Bio._py3k import _as_bytes, _as_string
@@ -116,8 +118,10 @@ class BgzfTests(unittest.TestCase):
                 old = _as_string(old)
             h.close()
 
-            for cache in [1,10]:
-                h = bgzf.BgzfReader(new_file, mode, max_cache=cache)
+            for cache, read_ahead, threads in [(1, 0, 1), (10, 0, 1),
+                                               (1, 3, 1), (1, 0, 3)]:
+                h = bgzf.BgzfReader(new_file, mode, max_cache=cache,
+                                    read_ahead=read_ahead, threads=threads)
                 if "b" in mode:
                     new = _empty_bytes_string.join(line for line in h)
                 else:
@@ -144,8 +148,10 @@ class BgzfTests(unittest.TestCase):
                 old = _as_string(old)
             h.close()
 
-            for cache in [1,10]:
-                h = bgzf.BgzfReader(new_file, mode, max_cache=cache)
+            for cache, read_ahead, threads in [(1, 0, 1), (10, 0, 1),
+                                               (1, 3, 1), (1, 0, 3)]:
+                h = bgzf.BgzfReader(new_file, mode, max_cache=cache,
+                                    read_ahead=read_ahead, threads=threads)
                 temp = []
                 while True:
                     char = h.read(1)
@@ -193,9 +199,9 @@ class BgzfTests(unittest.TestCase):
         self.assertEqual(len(old), len(new))
         self.assertEqual(old, new)
 
-        #Reverse
+        #Reverse (where reading ahead is a waste of time, but must work)
         new = _empty_bytes_string
-        h = bgzf.BgzfReader(filename, "rb")
+        h = bgzf.BgzfReader(filename, "rb", read_ahead=2)
         for start, raw_len, data_start, data_len in blocks[::-1]:
             #print start, raw_len, data_start, data_len
             h.seek(bgzf.make_virtual_offset(start,0))
@@ -253,6 +259,71 @@ class BgzfTests(unittest.TestCase):
             self.assertEqual(h.tell(), voffset)
         h.close()
 
+    def test_lru_cache(self):
+        """Check BGZF block cache drops the least recently used block"""
+        h = open("SamBam/ex1.bam", "rb")
+        blocks = list(bgzf.BgzfBlocks(h))
+        h.close()
+        starts = [values[0] for values in blocks[:4]]
+        h = bgzf.BgzfReader("SamBam/ex1.bam", "rb", max_cache=3)
+        self.assertEqual((0, 1), (h.cache_hits, h.cache_misses))
+        for start in starts[1:3] + starts[:1] + starts[3:]:
+            h.seek(bgzf.make_virtual_offset(start, 0))
+        #Block 0 was used more recently than block 1, so was kept
+        self.assertEqual((1, 4), (h.cache_hits, h.cache_misses))
+        self.assertTrue(starts[0] in h._buffers)
+        self.assertFalse(starts[1] in h._buffers)
+        h.seek(bgzf.make_virtual_offset(starts[2], 0))
+        self.assertEqual((2, 4), (h.cache_hits, h.cache_misses))
+        h.close()
+
+    def test_cache_size(self):
+        """Check BGZF block cache limited by size of decompressed data"""
+        h = open("SamBam/ex1.bam", "rb")
+        blocks = list(bgzf.BgzfBlocks(h))
+        h.close()
+        h = bgzf.BgzfReader("SamBam/ex1.bam", "rb", max_cache_size=150000)
+        for start, raw_len, data_start, data_len in blocks:
+            h.seek(bgzf.make_virtual_offset(start, 0))
+            self.assertTrue(h._buffers.size <= 150000)
+        self.assertEqual((0, len(blocks)), (h.cache_hits, h.cache_misses))
+        self.assertFalse(blocks[0][0] in h._buffers)
+        h.close()
+
+    def test_read_ahead(self):
+        """Check BGZF reading ahead in a background thread"""
+        h = gzip.open("SamBam/ex1.bam", "rb")
+        old = h.read()
+        h.close()
+        h = bgzf.BgzfReader("SamBam/ex1.bam", "rb", read_ahead=3)
+        new = h.read(len(old) + 100)
+        h.close()
+        self.assertEqual(old, new)
+        self.assertEqual(None, h._read_ahead)
+        #The thread opens its own handle using the file object's name
+        h = bgzf.BgzfReader(fileobj=open("SamBam/ex1.bam", "rb"),
+                            read_ahead=3)
+        self.assertEqual(old[:100000], h.read(100000))
+        h.close()
+
+    def test_read_threads(self):
+        """Check BGZF decompression in a pool of background threads"""
+        h = gzip.open("SamBam/ex1.bam", "rb")
+        old = h.read()
+        h.close()
+        handles = [bgzf.open("SamBam/ex1.bam", "rb", threads=3)]
+        for read_ahead in [1, 2, 10]:
+            handles.append(bgzf.BgzfReader("SamBam/ex1.bam", "rb",
+                                           read_ahead=read_ahead, threads=3))
+        for h in handles:
+            self.assertEqual(old, h.read(len(old) + 100))
+            #Jumping back to the start should still work
+            h.seek(0)
+            self.assertEqual(old[:1000], h.read(1000))
+            h.close()
+        self.assertRaises(ValueError, bgzf.BgzfReader, "SamBam/ex1.bam",
+                          threads=0)
+
     def test_random_bam_ex1(self):
         """Check random access to SamBam/ex1.bam"""
         self.check_random("SamBam/ex1.bam")
@@ -400,6 +471,48 @@ class BgzfTests(unittest.TestCase):
 
         h.close()
 
+    def test_write_threads(self):
+        """Check BGZF writing with compression in several threads"""
+        h = gzip.open("SamBam/ex1.bam", "rb")
+        data = h.read()
+        h.close()
+        outputs = []
+        for threads in [1, 3]:
+            h = bgzf.BgzfWriter(self.temp_file, "wb", threads=threads)
+            offsets = []
+            for i in range(0, len(data), 5000):
+                if i % 50000 == 0:
+                    offsets.append((h.tell(), i))
+                h.write(data[i:i + 5000])
+            h.close()
+            h = open(self.temp_file, "rb")
+            outputs.append(h.read())
+            h.close()
+            #Check the virtual offsets from tell
+            h = bgzf.BgzfReader(self.temp_file, "rb")
+            for voffset, i in offsets:
+                h.seek(voffset)
+                self.assertEqual(data[i:i + 100], h.read(100))
+            h.close()
+        #Should be exactly the same blocks, just compressed in parallel
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertRaises(ValueError, bgzf.BgzfWriter, self.temp_file,
+                          "wb", threads=0)
+
+    def test_write_threads_error(self):
+        """Check BGZF compression errors keep the worker thread's traceback"""
+        compressor = bgzf._BlockCompressor(2)
+        compressor.submit(_as_bytes("ACGT"), 99)
+        try:
+            compressor.collect()
+        except ValueError:
+            #Last frame should be where the error happened in the worker
+            frame = traceback.extract_tb(sys.exc_info()[2])[-1]
+            self.assertEqual("_make_bgzf_block", frame[2])
+        else:
+            self.fail("Invalid compression level should fail")
+        compressor.close()
+
 
 if __name__ == "__main__":
     runner = unittest.TextTestRunner(verbosity = 2)